@@ -0,0 +1,334 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+from depth_index import box_centers, get_valid_depth_in_bbox
+from depth_stats import box_depth_stats
+from frame_buffers import FrameBuffers
+from frame_source import open_frame_source
+from metrics import summarize
+from overlay import OverlayRenderer, class_color
+from size_estimation import PAPPUS, PINHOLE, POINT_CLOUD, SizeEstimator, calculate_box_dimensions
+
+
+class StageTimer:
+    """이름별 처리 시간 샘플을 모으는 타이머."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.enabled = True
+
+    def time(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        if self.enabled:
+            self.samples[name].append(time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        return {name: summarize(samples) for name, samples in self.samples.items()}
+
+
+# ---------------------------------------------------------------------------
+# 탐지기: YOLO 모델 또는 모델 없이 합성 소스의 정답 박스를 사용하는 스텁
+# ---------------------------------------------------------------------------
+
+def make_detector(model_path, frame_source, backend="auto"):
+    """
+    벤치마크용 탐지 함수 생성.
+
+    Args:
+    - model_path: YOLO 모델 경로. "none"이면 모델 없이 합성 소스의 정답 박스(없으면 고정 격자)를 사용.
+    - frame_source: 프레임 소스.
+    - backend: 추론 백엔드 (runtime_backend.load_model 참고).
+
+    Returns:
+    - (detect, model_names). detect(bgr)는 (boxes (N, 4) int32, classes (N,), results 또는 None)을 반환.
+    """
+    if model_path == "none":
+        def detect(bgr):
+            boxes = getattr(frame_source, "objects", None)
+            if boxes is None:
+                h, w = bgr.shape[:2]
+                xs, ys = np.meshgrid(np.linspace(0.1, 0.8, 4) * w, np.linspace(0.3, 0.8, 3) * h)
+                boxes = np.stack([xs.ravel(), ys.ravel(), xs.ravel() + 0.1 * w, ys.ravel() + 0.1 * h], axis=1)
+            boxes = np.asarray(boxes, dtype=np.int32)
+            return boxes, np.zeros(len(boxes), dtype=np.int64), None
+        return detect, {0: "stone"}
+
+    from runtime_backend import load_model
+    model = load_model(model_path, backend)
+
+    def detect(bgr):
+        results = model(bgr, verbose=False)
+        boxes = results[0].boxes.xyxy.cpu().numpy().astype(np.int32)
+        classes = results[0].boxes.cls.cpu().numpy().astype(np.int64)
+        return boxes, classes, results
+
+    return detect, model.names
+
+
+# ---------------------------------------------------------------------------
+# 측정 방식 (Depth 조회 + 크기 추정). 모두 (depth_values, widths, heights) 반환
+# ---------------------------------------------------------------------------
+
+def measure_spiral(depth_np, boxes, context, calibration):
+    """기존 나선형 탐색(get_valid_depth_in_bbox) 중심 Depth + 핀홀 크기."""
+    grid_boxes, centers = context.to_grid_boxes(boxes), context.to_grid(box_centers(boxes))
+    depth_values = np.array([get_valid_depth_in_bbox(depth_np, cx, cy, x1, x2, y1, y2)
+                             for (x1, y1, x2, y2), (cx, cy) in zip(grid_boxes.tolist(), centers.tolist())],
+                            dtype=np.float32)
+    widths, heights = calculate_box_dimensions(boxes[:, 0], boxes[:, 2], boxes[:, 1], boxes[:, 3],
+                                               depth_values, calibration.fx, calibration.fy)
+    return depth_values, widths, heights
+
+
+def _size_engine_variant(names, doc):
+    """
+    size_estimation.SizeEstimator를 측정 방식 함수로 감쌈 (초점 거리별 추정기를 재사용).
+    여러 방식을 주면 모두 계산하고 첫 번째 방식의 크기를 반환.
+    """
+    estimators = {}
+
+    def measure(depth_np, boxes, context, calibration):
+        key = (calibration.fx, calibration.fy)
+        if key not in estimators:
+            estimators[key] = SizeEstimator(calibration.fx, calibration.fy, names)
+        depth_values, sizes = estimators[key].estimate(boxes, context)
+        return depth_values, sizes[:, 0, 0], sizes[:, 0, 1]
+
+    measure.__doc__ = doc
+    return measure
+
+
+measure_pinhole = _size_engine_variant((PINHOLE,), "최근접 유효 Depth 인덱스 중심 Depth + 핀홀 크기.")
+measure_pappus = _size_engine_variant((PAPPUS,), "중심/좌/우/상/하 Depth + 파푸스 중선정리 크기.")
+measure_point_cloud = _size_engine_variant((POINT_CLOUD,), "포인트 클라우드 좌상단/우하단 3D 좌표 차이로 크기 계산.")
+measure_all_sizes = _size_engine_variant((PINHOLE, PAPPUS, POINT_CLOUD),
+                                         "핀홀/파푸스/포인트 클라우드 크기를 한 번에 계산 (중심 Depth 공유).")
+
+
+def measure_box_mean(depth_np, boxes, context, calibration):
+    """적분 영상 기반 박스 평균 Depth + 핀홀 크기."""
+    depth_values, _, _ = box_depth_stats(context.depth_integrals(), context.to_grid_boxes(boxes))
+    widths, heights = calculate_box_dimensions(boxes[:, 0], boxes[:, 2], boxes[:, 1], boxes[:, 3],
+                                               depth_values, calibration.fx, calibration.fy)
+    return depth_values, widths, heights
+
+
+MEASUREMENT_VARIANTS = {
+    "spiral": measure_spiral,
+    "pinhole": measure_pinhole,
+    "box_mean": measure_box_mean,
+    "pappus": measure_pappus,
+    "point_cloud": measure_point_cloud,
+    "all_sizes": measure_all_sizes,
+}
+
+
+def annotate_legacy(bgr, boxes, classes, results, depth_values, widths, heights, model_names):
+    """탐지 결과와 측정값을 영상에 표시 (기존 스크립트의 plot() + 박스별 cv2.putText 방식)."""
+    if results is not None:
+        annotated_frame = results[0].plot()
+    else:
+        # 모델이 없으면 plot()과 같은 내용(클래스 색 박스, 배경을 채운 클래스 라벨)을 직접 그림
+        annotated_frame = bgr.copy()
+        for (x1, y1, x2, y2), cls in zip(boxes.tolist(), classes.tolist()):
+            color = class_color(cls)
+            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
+            (w, h), _ = cv2.getTextSize(model_names[cls], cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+            cv2.rectangle(annotated_frame, (x1, y1 - h - 6), (x1 + w + 2, y1), color, -1)
+            cv2.putText(annotated_frame, model_names[cls], (x1 + 1, y1 - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                        (255, 255, 255), 1)
+
+    for (cx, cy), cls, depth_value, width, height in zip(
+            box_centers(boxes).tolist(), classes.tolist(), depth_values, widths, heights):
+        cv2.putText(annotated_frame, f"{model_names[cls]} {depth_value:.2f}m", (cx - 50, cy - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+        cv2.putText(annotated_frame, f"Width: {width:.2f}m", (cx - 50, cy),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        cv2.putText(annotated_frame, f"Height: {height:.2f}m", (cx - 50, cy + 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+    return annotated_frame
+
+
+def annotate(renderer, bgr, boxes, classes, results, depth_values, widths, heights, model_names):
+    """탐지 결과와 측정값을 OverlayRenderer로 한 번에 표시. 스크립트들과 같이 컬러 버퍼(bgr)에 바로 그림."""
+    texts = [[(f"{model_names[cls]} {depth_value:.2f}m", (255, 0, 0)), (f"Width: {width:.2f}m", (0, 255, 0)),
+              (f"Height: {height:.2f}m", (0, 0, 255))]
+             for cls, depth_value, width, height in zip(classes.tolist(), depth_values, widths, heights)]
+    if results is not None:
+        return renderer.render_results(bgr, results[0], texts, out=bgr)
+    return renderer.render(bgr, boxes, classes, texts=texts, out=bgr)
+
+
+def run_benchmark(frame_source, detect, model_names, frames=200, warmup=10, variants=None):
+    """
+    프레임 소스에서 탐지 + Depth 측정 루프를 실행하며 단계별 처리 시간을 측정.
+
+    단계: grab, color_conversion, inference, depth_lookup, size_estimation, annotation, annotation_legacy.
+    측정 방식(variants)은 같은 프레임과 박스로 각각 따로 측정.
+
+    Returns:
+    - {"stages": {...}, "variants": {...}, "frames": 처리한 프레임 수, "throughput_fps": 전체 처리량}
+    """
+    variants = list(MEASUREMENT_VARIANTS) if variants is None else variants
+    stage_timer = StageTimer()
+    variant_timer = StageTimer()
+    context = frame_source.measurement_context()
+    calibration = frame_source.calibration
+    renderer = OverlayRenderer(model_names)
+    buffers = FrameBuffers()  # 색 변환 결과를 매 프레임 같은 버퍼에 씀
+    bgra = None
+
+    processed = 0
+    loop_start = None
+    for i in range(frames + warmup):
+        if i == warmup:
+            loop_start = time.perf_counter()
+        stage_timer.enabled = variant_timer.enabled = i >= warmup
+
+        frame = stage_timer.time("grab", frame_source.read)
+        if frame is None:
+            break
+        context.new_frame()
+
+        # ZED LEFT 뷰는 BGRA이므로 같은 형식으로 변환 비용을 측정
+        if bgra is None or bgra.shape[:2] != frame.bgr.shape[:2]:
+            bgra = np.empty(frame.bgr.shape[:2] + (4,), dtype=np.uint8)
+        cv2.cvtColor(np.ascontiguousarray(frame.bgr), cv2.COLOR_BGR2BGRA, dst=bgra)
+        bgr = stage_timer.time("color_conversion", buffers.color, bgra)
+
+        boxes, classes, results = stage_timer.time("inference", detect, bgr)
+        depth_np = frame.depth
+
+        depth_values = stage_timer.time(
+            "depth_lookup", lambda: context.lookup_depths(box_centers(boxes), boxes))
+        widths, heights = stage_timer.time(
+            "size_estimation", calculate_box_dimensions, boxes[:, 0], boxes[:, 2], boxes[:, 1], boxes[:, 3],
+            depth_values, calibration.fx, calibration.fy)
+        # 기존 방식은 새 영상에 그리므로 먼저 실행하고, 렌더러는 그다음 bgr 버퍼에 바로 그림
+        stage_timer.time("annotation_legacy", annotate_legacy, bgr, boxes, classes, results, depth_values, widths,
+                         heights, model_names)
+        stage_timer.time("annotation", annotate, renderer, bgr, boxes, classes, results, depth_values, widths,
+                         heights, model_names)
+
+        # 측정 방식 비교: 방식마다 프레임 캐시를 비워 인덱스/적분 영상 생성 비용까지 포함
+        for name in variants:
+            context.new_frame()
+            variant_timer.time(name, MEASUREMENT_VARIANTS[name], depth_np, boxes, context, calibration)
+
+        if i >= warmup:
+            processed += 1
+
+    elapsed = time.perf_counter() - loop_start if loop_start is not None else 0.0
+    return {
+        "frames": processed,
+        "throughput_fps": processed / elapsed if elapsed > 0 else 0.0,
+        "stages": stage_timer.summary(),
+        "variants": variant_timer.summary(),
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance=0.25, min_delta_ms=0.5):
+    """
+    기준 결과와 비교해 p95 지연이 tolerance 비율 이상(그리고 min_delta_ms 이상) 늘어난 항목을 찾음.
+
+    Returns:
+    - 회귀 항목 설명 문자열 리스트.
+    """
+    regressions = []
+    for section in ("stages", "variants"):
+        for name, base in baseline.get(section, {}).items():
+            current = report[section].get(name)
+            if current is None or base["count"] == 0:
+                continue
+            limit = base["p95_ms"] * (1.0 + tolerance)
+            if current["p95_ms"] > limit and current["p95_ms"] - base["p95_ms"] > min_delta_ms:
+                regressions.append(f"{section}/{name}: p95 {current['p95_ms']:.2f}ms > "
+                                   f"baseline {base['p95_ms']:.2f}ms (+{tolerance:.0%})")
+    return regressions
+
+
+def print_report(report):
+    for section in ("stages", "variants"):
+        print(f"\n[{section}]")
+        print(f"{'name':<18}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'fps':>10}")
+        for name, s in report[section].items():
+            print(f"{name:<18}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['fps']:>10.1f}")
+    print(f"\nframes={report['frames']} throughput={report['throughput_fps']:.1f} fps")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ZED + YOLO 루프 단계별 지연 벤치마크")
+    parser.add_argument("--source", default="synthetic", help='"synthetic" 또는 녹화 폴더 경로')
+    parser.add_argument("--model", default="none", help='YOLO 모델 경로. "none"이면 모델 없이 정답 박스 사용')
+    parser.add_argument("--backend", choices=["auto", "torch", "onnx", "openvino"], default="auto",
+                        help="추론 백엔드 (auto: runtime_backend.py 벤치마크로 선택된 백엔드)")
+    parser.add_argument("--frames", type=int, default=200, help="측정할 프레임 수")
+    parser.add_argument("--depth-scale", type=float, default=1.0, help="Depth 해상도 배율 (depth_grid.py 참고)")
+    parser.add_argument("--warmup", type=int, default=10, help="측정 전 워밍업 프레임 수")
+    parser.add_argument("--variants", default=",".join(MEASUREMENT_VARIANTS),
+                        help="비교할 측정 방식 (쉼표 구분)")
+    parser.add_argument("--out", default="benchmark_result.json", help="결과 JSON 경로")
+    parser.add_argument("--baseline", help="비교할 기준 결과 JSON 경로")
+    parser.add_argument("--save-baseline", action="store_true", help="이번 결과를 --baseline 경로에 저장")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="허용하는 p95 증가 비율")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    variants = [v for v in args.variants.split(",") if v]
+    unknown = set(variants) - set(MEASUREMENT_VARIANTS)
+    if unknown:
+        sys.exit(f"Unknown variants: {', '.join(sorted(unknown))}")
+
+    frame_source = open_frame_source(args.source, realtime=False, loop=True, depth_scale=args.depth_scale)
+    detect, model_names = make_detector(args.model, frame_source, args.backend)
+    try:
+        report = run_benchmark(frame_source, detect, model_names, args.frames, args.warmup, variants)
+    finally:
+        frame_source.close()
+
+    report["config"] = {
+        "source": args.source,
+        "model": args.model,
+        "backend": args.backend,
+        "frames": args.frames,
+        "depth_scale": args.depth_scale,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+    }
+    print_report(report)
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark result to {args.out}")
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
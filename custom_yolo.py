@@ -1,31 +1,39 @@
 import cv2
 import os
 import random
-from ultralytics import YOLO
 import matplotlib.pyplot as plt
 import numpy as np
 from datetime import datetime
 import matplotlib.font_manager as fm
 
+from inference_cache import InferenceCache, predict_with_cache
+from overlay import OverlayRenderer
+from runtime_backend import load_model, resolve_backend
+
 
 # YOLOv8 세그멘테이션 모델 불러오기
-model = YOLO('runs/segment/train2/weights/best.pt')  # 훈련된 모델 경로로 수정
+model_path = 'runs/segment/train2/weights/best.pt'  # 훈련된 모델 경로로 수정
+imgsz = 640  # 추론 입력 크기
+cache_conf = 0.25  # 캐시에 저장하는 최소 신뢰도 (conf_threshold는 이 값 이상으로 사용)
+backend, backend_model_path = resolve_backend(model_path, imgsz=imgsz)  # runtime_backend.py로 선택한 CPU 백엔드
+model = load_model(model_path, backend, imgsz)
+
+# 예측 결과 캐시 (같은 이미지/실행 모델/백엔드/추론 인자는 다시 실행할 때 추론을 건너뜀)
+# 임계값은 캐시 이후에 적용하므로 conf_threshold를 cache_conf 이상에서 바꿔도 캐시를 그대로 사용
+cache = InferenceCache('.inference_cache', backend_model_path, backend=backend, conf=cache_conf, imgsz=imgsz)
+
+# 박스, 마스크, 라벨을 한 번에 그리는 렌더러
+renderer = OverlayRenderer(model.names)
 
 def detect_objects(image_path, conf_threshold=0.35):
     # 이미지를 불러오기
     img = cv2.imread(image_path)
 
-    # 객체 탐지 및 세그멘테이션 수행
-    results = model(img)
-
-    # 결과 시각화 (탐지된 객체 이미지 얻기)
-    result_img = img.copy()  # 원본 이미지를 복사하여 사용
+    # 객체 탐지 및 세그멘테이션 수행 (캐시에 있으면 모델을 실행하지 않음)
+    prediction = predict_with_cache(model, cache, image_path, img)
 
-    # 탐지된 객체 중 신뢰도가 conf_threshold 이상인 경우만 필터링
-    for box in results[0].boxes:
-        if box.conf > conf_threshold:
-            # 신뢰도가 높은 객체에 대해 결과를 그리기
-            result_img = results[0].plot()
+    # 신뢰도가 conf_threshold 이상인 객체만 원본 이미지 위에 한 번에 그리기
+    result_img = renderer.render_prediction(img, prediction, conf_threshold=conf_threshold, out=img)
 
     return result_img  # 예측 결과 이미지 반환
 
@@ -0,0 +1,173 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+
+class DepthGrid:
+    """
+    검출기 영상 좌표와 축소된 Depth 그리드 좌표 사이의 변환.
+    Depth와 포인트 클라우드를 영상보다 작은 해상도로 가져올 때, 모든 Depth 조회 좌표를 이 객체로 변환.
+
+    그리드 픽셀 (i, j)는 영상 픽셀 (i / scale_y, j / scale_x)에 해당 (cv2.INTER_NEAREST 축소와 같은 기준).
+    크기 계산(픽셀 크기 x Depth / 초점 거리)은 영상 좌표와 영상 초점 거리를 그대로 사용.
+
+    Args:
+    - image_shape: 검출기 입력 영상 크기 (H, W).
+    - scale: Depth 해상도 배율 (예: 0.5이면 가로/세로 절반).
+    """
+
+    def __init__(self, image_shape, scale=1.0):
+        h, w = image_shape[:2]
+        self.image_shape = (h, w)
+        self.shape = (max(int(round(h * scale)), 1), max(int(round(w * scale)), 1))
+        self.scale_y, self.scale_x = self.shape[0] / h, self.shape[1] / w
+
+    @property
+    def full(self):
+        """영상과 같은 해상도이면 True (변환이 필요 없음)."""
+        return self.shape == self.image_shape
+
+    def points(self, points):
+        """영상 좌표 (..., 2) (x, y)를 그리드 좌표 (..., 2) int32로 변환."""
+        points = np.asarray(points)
+        if self.full:
+            return points
+        grid = np.empty(points.shape, dtype=np.int32)
+        grid[..., 0] = np.clip(points[..., 0] * self.scale_x, 0, self.shape[1] - 1)
+        grid[..., 1] = np.clip(points[..., 1] * self.scale_y, 0, self.shape[0] - 1)
+        return grid
+
+    def boxes(self, boxes):
+        """영상 좌표 박스 (N, 4) xyxy를 그리드 좌표 박스 (N, 4) int32로 변환."""
+        boxes = np.asarray(boxes)
+        return boxes if self.full else self.points(boxes.reshape(-1, 2, 2)).reshape(-1, 4)
+
+    def pixels(self, length):
+        """영상 픽셀 단위 길이(탐색 반경 등)를 그리드 픽셀 단위로 변환 (최소 1)."""
+        return length if self.full else max(int(round(length * self.scale_x)), 1)
+
+    def calibration(self, calibration):
+        """그리드 해상도 기준 CameraCalibration (포인트 클라우드 계산, 투영 넓이 등에 사용)."""
+        return calibration._replace(fx=calibration.fx * self.scale_x, fy=calibration.fy * self.scale_y,
+                                    cx=calibration.cx * self.scale_x, cy=calibration.cy * self.scale_y)
+
+    def downsample(self, depth_np, out=None):
+        """
+        전체 해상도 Depth를 그리드 해상도로 축소 (최근접 샘플링이라 NaN/inf 구멍이 주변으로 번지지 않음).
+
+        Args:
+        - out: 결과를 쓸 (h, w) float32 버퍼. 프레임마다 같은 버퍼를 넘기면 추가 할당이 없음.
+        """
+        if self.full:
+            return depth_np
+        if out is None:
+            out = np.empty(self.shape, dtype=np.float32)
+        return cv2.resize(depth_np, (self.shape[1], self.shape[0]), dst=out, interpolation=cv2.INTER_NEAREST)
+
+
+def depth_bytes_per_frame(grid, point_cloud=True):
+    """
+    프레임당 Depth 관련 메모리 트래픽 (바이트): Depth, 최근접 유효 Depth 인덱스(좌표 2개 + 거리),
+    포인트 클라우드(XYZRGBA, 4채널 float32).
+    """
+    pixels = grid.shape[0] * grid.shape[1]
+    traffic = pixels * 4 + pixels * 12
+    if point_cloud:
+        traffic += pixels * 16
+    return traffic
+
+
+def evaluate_scales(frames, calibration, scales, estimators):
+    """
+    같은 프레임과 박스를 Depth 해상도별로 측정해 전체 해상도 결과와 비교.
+
+    Args:
+    - frames: (Depth (H, W), 박스 (N, 4) int32) 리스트.
+    - calibration: 전체 해상도 CameraCalibration.
+    - scales: 비교할 Depth 해상도 배율 목록 (1.0이 기준).
+    - estimators: size_estimation.ESTIMATORS 중 비교할 방식.
+
+    Returns:
+    - {scale: {"shape", "mb_per_frame", "ms_per_frame", "depth_err_m", "size_err_m": {방식: 평균 오차}}}
+    """
+    from frame_source import depth_to_xyz
+    from measurement_context import FrameMeasurementContext
+    from size_estimation import SizeEstimator
+
+    reference, report = None, {}
+    for scale in sorted(scales, reverse=True):
+        grid = DepthGrid(frames[0][0].shape, scale)
+        grid_calibration = grid.calibration(calibration)
+        estimator = SizeEstimator(calibration.fx, calibration.fy, estimators)
+        buffer = np.empty(grid.shape, dtype=np.float32)
+        results, elapsed = [], 0.0
+        for depth_full, boxes in frames:
+            start = time.perf_counter()
+            depth = grid.downsample(depth_full, out=buffer)
+            context = FrameMeasurementContext(lambda: depth, lambda: depth_to_xyz(depth, grid_calibration), grid)
+            depths, sizes = estimator.estimate(boxes, context)
+            elapsed += time.perf_counter() - start
+            results.append((depths.copy(), sizes.copy()))
+
+        if reference is None:
+            reference = results
+        depth_err, size_err = [], []
+        for (depths, sizes), (ref_depths, ref_sizes) in zip(results, reference):
+            valid = (depths > 0) & (ref_depths > 0)
+            depth_err.append(np.abs(depths - ref_depths)[valid])
+            size_err.append(np.abs(sizes - ref_sizes)[valid & (ref_sizes > 0).all(axis=(1, 2))])
+        size_err = np.concatenate(size_err)
+        report[scale] = {
+            "shape": grid.shape,
+            "mb_per_frame": depth_bytes_per_frame(grid) / 1e6,
+            "ms_per_frame": elapsed * 1000.0 / len(frames),
+            "depth_err_m": float(np.concatenate(depth_err).mean()),
+            "size_err_m": {name: float(size_err[:, k].mean()) if len(size_err) else 0.0
+                           for k, name in enumerate(estimators)},
+        }
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Depth 해상도별 메모리 트래픽, 측정 시간, 거리/크기 오차 비교")
+    parser.add_argument("--source", default="synthetic", help='"synthetic" 또는 녹화 폴더 경로')
+    parser.add_argument("--model", default="none", help='YOLO 모델 경로. "none"이면 합성 소스의 정답 박스 사용')
+    parser.add_argument("--frames", type=int, default=60, help="사용할 프레임 수")
+    parser.add_argument("--scales", default="1.0,0.5,0.25", help="비교할 Depth 해상도 배율 (쉼표 구분)")
+    parser.add_argument("--variants", default="pinhole,pappus,point_cloud", help="비교할 크기 추정 방식 (쉼표 구분)")
+    return parser.parse_args()
+
+
+def main():
+    from benchmark import make_detector
+    from frame_source import open_frame_source
+
+    args = parse_args()
+    frame_source = open_frame_source(args.source, realtime=False, loop=True)
+    detect, _ = make_detector(args.model, frame_source)
+    frames = []
+    for _ in range(args.frames):
+        frame = frame_source.read()
+        boxes, _, _ = detect(np.ascontiguousarray(frame.bgr))
+        frames.append((np.array(frame.depth), np.asarray(boxes).astype(np.int32).reshape(-1, 4)))
+    calibration = frame_source.calibration
+    frame_source.close()
+
+    scales = [float(v) for v in args.scales.split(",") if v]
+    if 1.0 not in scales:
+        scales.append(1.0)
+    variants = tuple(v for v in args.variants.split(",") if v)
+    report = evaluate_scales(frames, calibration, scales, variants)
+
+    print(f"{'scale':>6}{'depth grid':>12}{'MB/frame':>10}{'ms/frame':>10}{'depth err (m)':>15}"
+          + "".join(f"{name + ' err':>18}" for name in variants))
+    for scale, row in report.items():
+        shape = f"{row['shape'][1]}x{row['shape'][0]}"
+        print(f"{scale:>6.2f}{shape:>12}{row['mb_per_frame']:>10.2f}{row['ms_per_frame']:>10.2f}"
+              f"{row['depth_err_m']:>15.4f}" + "".join(f"{row['size_err_m'][name]:>18.4f}" for name in variants))
+
+
+if __name__ == "__main__":
+    main()
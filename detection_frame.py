@@ -0,0 +1,152 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from depth_index import box_centers, lookup_valid_depth_batch, search_valid_depth_batch
+from inference_cache import prediction_from_result
+from mask_depth import instance_depth_stats, masks_to_depth_resolution
+from size_estimation import calculate_box_dimensions
+
+# 가로/세로/넓이를 측정해 표시하는 클래스
+MEASURED_CLASSES = ("rocks", "stone", "cement")
+
+
+class DetectionFrame(NamedTuple):
+    """
+    한 프레임의 탐지 결과를 탐지별 객체 대신 연속된 NumPy 배열로 묶은 컨테이너.
+    모델 출력에서 한 번만 만들고, 필터링과 측정은 모두 배열 단위로 수행.
+
+    - boxes: (N, 4) int32, xyxy (원본 영상 좌표).
+    - classes: (N,) int32.
+    - confs: (N,) float32.
+    - centers: (N, 2) int32, 박스 중심 (x, y).
+    - masks: (N, h, w) bool 또는 None. 추론 입력(레터박스) 해상도.
+    - orig_shape: 원본 영상 크기 (H, W).
+    - depths: (N,) float32, 측정한 거리 (m). 측정 전이거나 유효하지 않으면 0.
+    - sizes: (N, 2) float32, 측정한 가로/세로 (m). 측정 전이면 0.
+    """
+    boxes: np.ndarray
+    classes: np.ndarray
+    confs: np.ndarray
+    centers: np.ndarray
+    masks: np.ndarray
+    orig_shape: tuple
+    depths: np.ndarray
+    sizes: np.ndarray
+
+    @property
+    def areas(self):
+        """측정한 넓이 (N,) m^2 (가로 x 세로)."""
+        return self.sizes[:, 0] * self.sizes[:, 1]
+
+
+def detections_from_prediction(prediction):
+    """inference_cache.Prediction을 DetectionFrame으로 변환 (측정값은 0)."""
+    boxes = np.ascontiguousarray(prediction.boxes, dtype=np.float32).reshape(-1, 4).astype(np.int32)
+    n = len(boxes)
+    return DetectionFrame(
+        boxes,
+        np.ascontiguousarray(prediction.classes, dtype=np.int32),
+        np.ascontiguousarray(prediction.confs, dtype=np.float32),
+        box_centers(boxes).astype(np.int32),
+        prediction.masks,
+        tuple(prediction.orig_shape),
+        np.zeros(n, dtype=np.float32),
+        np.zeros((n, 2), dtype=np.float32),
+    )
+
+
+def detections_from_result(result):
+    """ultralytics Results 하나를 DetectionFrame으로 변환. 텐서는 여기서 한 번만 NumPy로 옮김."""
+    return detections_from_prediction(prediction_from_result(result))
+
+
+def select(detections, keep):
+    """keep(bool 마스크 또는 인덱스 배열)에 해당하는 탐지만 남긴 DetectionFrame."""
+    masks = detections.masks[keep] if detections.masks is not None else None
+    return detections._replace(boxes=detections.boxes[keep], classes=detections.classes[keep],
+                               confs=detections.confs[keep], centers=detections.centers[keep], masks=masks,
+                               depths=detections.depths[keep], sizes=detections.sizes[keep])
+
+
+def class_ids(names, wanted):
+    """클래스 이름 목록에 해당하는 클래스 번호 배열. names는 model.names (dict 또는 리스트)."""
+    items = names.items() if isinstance(names, dict) else enumerate(names)
+    return np.array([i for i, name in items if name in wanted], dtype=np.int32)
+
+
+def class_mask(detections, names, wanted=MEASURED_CLASSES):
+    """클래스 이름이 wanted에 속하는 탐지 (N,) bool."""
+    return np.isin(detections.classes, class_ids(names, wanted))
+
+
+def filter_detections(detections, min_conf=0.0, names=None, wanted=None):
+    """
+    신뢰도와 클래스로 탐지를 거름.
+
+    Args:
+    - min_conf: 이 값 이상인 탐지만 남김.
+    - names, wanted: 둘 다 주면 클래스 이름이 wanted에 속하는 탐지만 남김.
+    """
+    keep = detections.confs >= min_conf
+    if names is not None and wanted is not None:
+        keep &= class_mask(detections, names, wanted)
+    return detections if keep.all() else select(detections, keep)
+
+
+def with_measurements(detections, depths, sizes=None):
+    """측정한 거리 (N,)와 가로/세로 (N, 2)를 채운 DetectionFrame. sizes가 None이면 기존 크기를 유지."""
+    sizes = detections.sizes if sizes is None else np.asarray(sizes, dtype=np.float32).reshape(-1, 2)
+    return detections._replace(depths=np.asarray(depths, dtype=np.float32).reshape(-1), sizes=sizes)
+
+
+def measure_depths(detections, depth_np, depth_index=None, grid=None):
+    """
+    모든 탐지의 거리를 한 번에 계산. 마스크가 있으면 마스크 내부 중앙값 Depth,
+    없거나 마스크 안에 유효한 Depth가 없으면 박스 중심의 최근접 유효 Depth를 사용.
+
+    Args:
+    - depth_index: 이미 만든 프레임 Depth 인덱스. None이면 중심 픽셀과 박스 내부 창 탐색으로 조회
+      (depth_index.search_valid_depth_batch, 프레임 전체 인덱스를 만들지 않음).
+    - grid: Depth가 영상보다 작은 해상도이면 depth_grid.DepthGrid (중심/박스 좌표를 그리드 좌표로 변환).
+
+    Returns:
+    - (N,) float32 거리 (m). 유효하지 않으면 0.
+    """
+    depth_values = np.zeros(len(detections.boxes), dtype=np.float32)
+    lookup = np.ones(len(depth_values), dtype=bool)  # 중심 Depth를 조회할 탐지
+    if detections.masks is not None and len(depth_values):
+        mask_stats = instance_depth_stats(depth_np, masks_to_depth_resolution(detections.masks, depth_np.shape))
+        lookup = mask_stats.count <= 0
+        depth_values[~lookup] = mask_stats.median[~lookup]
+    if not lookup.any():
+        return depth_values
+
+    centers, boxes = detections.centers[lookup], detections.boxes[lookup]
+    radius, step = 20, 2
+    if grid is not None:
+        centers, boxes, radius, step = grid.points(centers), grid.boxes(boxes), grid.pixels(20), grid.pixels(2)
+    if depth_index is None:
+        depth_values[lookup] = search_valid_depth_batch(depth_np, centers, boxes, radius, step)
+    else:
+        depth_values[lookup] = lookup_valid_depth_batch(depth_index, centers, boxes, radius, step)
+    return depth_values
+
+
+def pinhole_sizes(boxes, depth_values, fx, fy):
+    """박스 픽셀 크기와 거리로 계산한 실제 가로/세로 (N, 2) (m)."""
+    real_width, real_height = calculate_box_dimensions(
+        boxes[:, 0], boxes[:, 2], boxes[:, 1], boxes[:, 3], depth_values, fx, fy)
+    return np.stack([real_width, real_height], axis=1)
+
+
+def measure_detections(detections, depth_np, fx, fy, depth_index=None, grid=None):
+    """
+    모든 탐지의 거리(measure_depths)와 핀홀 크기를 한 번에 계산.
+    크기는 영상 픽셀 크기와 영상 초점 거리로 계산 (grid가 있어도 동일).
+
+    Returns:
+    - depths, sizes를 채운 DetectionFrame.
+    """
+    depth_values = measure_depths(detections, depth_np, depth_index, grid)
+    return with_measurements(detections, depth_values, pinhole_sizes(detections.boxes, depth_values, fx, fy))
@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+NDJSON = "ndjson"
+BINARY = "binary"
+
+# 바이너리 형식: 프레임 헤더 + 탐지 레코드 count개 (모두 little-endian)
+FRAME_MAGIC = b"YDET"
+FRAME_HEADER = struct.Struct("<4sIdfI")  # magic, frame_id, timestamp, latency_ms, count
+DETECTION_DTYPE = np.dtype([
+    ("class_id", "<u2"), ("conf", "<f4"),
+    ("x1", "<f4"), ("y1", "<f4"), ("x2", "<f4"), ("y2", "<f4"),
+    ("depth", "<f4"), ("width", "<f4"), ("height", "<f4"), ("area", "<f4"),
+])
+
+
+def encode_ndjson(frame_id, timestamp, latency_ms, detections, names):
+    """프레임 하나를 JSON 한 줄(bytes)로 변환."""
+    record = {
+        "frame_id": int(frame_id),
+        "timestamp": round(float(timestamp), 6),
+        "latency_ms": round(float(latency_ms), 3),
+        "detections": [
+            {
+                "class_id": int(d["class_id"]),
+                "class": names[int(d["class_id"])],
+                "conf": round(float(d["conf"]), 4),
+                "bbox": [round(float(d[k]), 1) for k in ("x1", "y1", "x2", "y2")],
+                "depth": round(float(d["depth"]), 3),
+                "width": round(float(d["width"]), 3),
+                "height": round(float(d["height"]), 3),
+                "area": round(float(d["area"]), 4),
+            }
+            for d in detections
+        ],
+    }
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def encode_binary(frame_id, timestamp, latency_ms, detections, names=None):
+    """프레임 하나를 고정 길이 헤더 + 탐지 레코드 배열(bytes)로 변환."""
+    header = FRAME_HEADER.pack(FRAME_MAGIC, int(frame_id), float(timestamp), float(latency_ms), len(detections))
+    return header + detections.tobytes()
+
+
+def decode_binary(buffer):
+    """
+    바이너리 스트림(파일 내용 또는 데이터그램)에서 프레임을 차례로 꺼냄.
+
+    Yields:
+    - (frame_id, timestamp, latency_ms, detections). detections는 DETECTION_DTYPE 배열.
+    """
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(buffer):
+        magic, frame_id, timestamp, latency_ms, count = FRAME_HEADER.unpack_from(buffer, offset)
+        if magic != FRAME_MAGIC:
+            raise ValueError(f"Invalid frame header at byte {offset}")
+        offset += FRAME_HEADER.size
+        detections = np.frombuffer(buffer, dtype=DETECTION_DTYPE, count=count, offset=offset)
+        offset += count * DETECTION_DTYPE.itemsize
+        yield frame_id, timestamp, latency_ms, detections
+
+
+_ENCODERS = {NDJSON: encode_ndjson, BINARY: encode_binary}
+
+
+class FileStreamSink:
+    """프레임마다 파일에 이어 쓰는 출력. path가 "-"이면 표준 출력."""
+
+    def __init__(self, path):
+        self._file = sys.stdout.buffer if path == "-" else open(path, "wb")
+
+    def write(self, payload):
+        self._file.write(payload)
+        self._file.flush()  # tail -f 등 다른 프로세스가 바로 읽을 수 있도록
+
+    def close(self):
+        if self._file is not sys.stdout.buffer:
+            self._file.close()
+
+
+class DatagramStreamSink:
+    """
+    프레임 하나를 데이터그램 하나로 보내는 로컬 소켓 출력 (UDP 또는 Unix 도메인 소켓).
+    받는 쪽이 없어도 막히지 않으며, 보내지 못한 프레임은 dropped로 셈.
+    데이터그램 하나에 담을 수 없는 프레임은 보내지 않고 dropped와 oversized로 셈.
+    """
+
+    def __init__(self, family, address):
+        self._socket = socket.socket(family, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._address = address
+        # UDP(IPv4)는 65507바이트, Unix 도메인 소켓은 송신 버퍼 크기가 데이터그램 최대 크기
+        if family == socket.AF_INET:
+            self.max_datagram = 65507
+        else:
+            self.max_datagram = self._socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+        self.dropped = 0
+        self.oversized = 0
+
+    def write(self, payload):
+        if len(payload) > self.max_datagram:
+            self.oversized += 1
+            self.dropped += 1
+            return
+        try:
+            self._socket.sendto(payload, self._address)
+        except OSError:  # 받는 쪽 없음, 버퍼 가득 참(ENOBUFS), EMSGSIZE, 네트워크 도달 불가 등
+            self.dropped += 1
+
+    def close(self):
+        self._socket.close()
+
+
+def parse_address(spec):
+    """
+    "udp://host:port" 또는 "unix:///path" 주소를 (family, address)로 변환.
+    """
+    if spec.startswith("udp://"):
+        host, port = spec[len("udp://"):].rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+    if spec.startswith("unix://"):
+        return socket.AF_UNIX, spec[len("unix://"):]
+    raise ValueError(f"Unknown socket address: {spec}")
+
+
+def open_stream_sink(spec):
+    """
+    출력 지정 문자열로 출력 객체를 생성.
+
+    Args:
+    - spec: "udp://host:port", "unix:///path", 파일 경로 또는 "-"(표준 출력).
+    """
+    if spec.startswith(("udp://", "unix://")):
+        return DatagramStreamSink(*parse_address(spec))
+    return FileStreamSink(spec)
+
+
+class DetectionPublisher:
+    """
+    프레임별 탐지/측정 결과를 NDJSON 또는 바이너리로 인코딩해 출력하고,
+    grab부터 출력까지의 지연을 기록.
+
+    Args:
+    - sink: write(bytes)를 가진 출력 객체 (open_stream_sink 참고).
+    - names: 클래스 이름 dict (model.names).
+    - fmt: NDJSON 또는 BINARY.
+    - history: 지연 통계에 사용할 최근 프레임 수.
+    """
+
+    def __init__(self, sink, names, fmt=NDJSON, history=300):
+        if fmt not in _ENCODERS:
+            raise ValueError(f"Unknown stream format: {fmt}")
+        self.sink = sink
+        self.names = names
+        self.fmt = fmt
+        self.published = 0
+        self.bytes = 0
+        self._encode = _ENCODERS[fmt]
+        self._latencies = deque(maxlen=history)
+        self._detections = np.zeros(0, dtype=DETECTION_DTYPE)
+
+    def publish(self, frame_id, timestamp, grab_time, boxes, classes, confs, depths, sizes):
+        """
+        프레임 하나를 출력.
+
+        Args:
+        - frame_id: 프레임 번호.
+        - timestamp: 프레임 시각 (소스 기준, 초).
+        - grab_time: grab 시작 시각 (time.perf_counter 기준). 지연 계산에 사용.
+        - boxes: (N, 4) xyxy 박스.
+        - classes, confs, depths: (N,) 배열.
+        - sizes: (N, 2) 실제 가로/세로 (m).
+
+        Returns:
+        - grab부터 출력까지의 지연 (ms).
+        """
+        n = len(boxes)
+        if len(self._detections) < n:
+            self._detections = np.zeros(n, dtype=DETECTION_DTYPE)
+        detections = self._detections[:n]
+        detections["class_id"] = classes
+        detections["conf"] = confs
+        for k, name in enumerate(("x1", "y1", "x2", "y2")):
+            detections[name] = boxes[:, k]
+        detections["depth"] = depths
+        detections["width"] = sizes[:, 0]
+        detections["height"] = sizes[:, 1]
+        detections["area"] = sizes[:, 0] * sizes[:, 1]
+
+        latency_ms = (time.perf_counter() - grab_time) * 1000.0
+        payload = self._encode(frame_id, timestamp, latency_ms, detections, self.names)
+        self.sink.write(payload)
+        self._latencies.append(latency_ms)
+        self.published += 1
+        self.bytes += len(payload)
+        return latency_ms
+
+    def stats(self):
+        """출력 프레임 수, 바이트 수, grab → 출력 지연(p50/p95/p99, ms)."""
+        latency = np.asarray(self._latencies) if self._latencies else np.zeros(1)
+        return {
+            "published": self.published,
+            "bytes": self.bytes,
+            "dropped": getattr(self.sink, "dropped", 0),
+            "oversized": getattr(self.sink, "oversized", 0),
+            "latency_p50_ms": float(np.percentile(latency, 50)),
+            "latency_p95_ms": float(np.percentile(latency, 95)),
+            "latency_p99_ms": float(np.percentile(latency, 99)),
+        }
+
+    def close(self):
+        self.sink.close()
+
+
+def format_publisher_stats(stats):
+    """DetectionPublisher.stats() 결과를 한 줄 문자열로 변환."""
+    return (f"published={stats['published']} ({stats['bytes'] / 1024:.0f} KiB, dropped={stats['dropped']}, "
+            f"oversized={stats['oversized']}) "
+            f"grab->publish p50={stats['latency_p50_ms']:.1f}ms p95={stats['latency_p95_ms']:.1f}ms "
+            f"p99={stats['latency_p99_ms']:.1f}ms")
+
+
+def listen(spec, fmt):
+    """
+    로컬 소켓에서 탐지 스트림을 받아 한 프레임씩 출력 (확인용 수신기).
+    """
+    family, address = parse_address(spec)
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    if family == socket.AF_UNIX and os.path.exists(address):
+        os.remove(address)
+    sock.bind(address)
+    print(f"Listening on {spec} ({fmt})")
+    try:
+        while True:
+            payload = sock.recv(65536)
+            if fmt == NDJSON:
+                print(payload.decode("utf-8"), end="")
+                continue
+            for frame_id, timestamp, latency_ms, detections in decode_binary(payload):
+                print(f"frame={frame_id} t={timestamp:.3f} latency={latency_ms:.1f}ms detections={len(detections)}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+        if family == socket.AF_UNIX:
+            os.remove(address)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="탐지 스트림 수신기")
+    parser.add_argument("address", help='"udp://host:port" 또는 "unix:///path"')
+    parser.add_argument("--format", choices=[NDJSON, BINARY], default=NDJSON, help="스트림 형식")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    listen(args.address, args.format)
@@ -0,0 +1,298 @@
+import argparse
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+def bgra_base(image):
+    """
+    (H, W, 3) 컬러 영상이 4채널 버퍼(ZED LEFT 뷰 [:, :, :3])의 뷰이면 알파까지 포함한 (H, W, 4) 뷰를 반환,
+    아니면 None. 복사 없이 원래 BGRA 메모리를 가리킴.
+    """
+    if image.ndim != 3 or image.shape[2] != 3 or image.dtype != np.uint8:
+        return None
+    if image.strides[1:] != (4, 1) or image.base is None:
+        return None
+    base = image.base
+    if isinstance(base, np.ndarray) and (image.ctypes.data - base.ctypes.data) % 4:
+        return None  # 채널 0부터 시작하지 않는 뷰 (예: [:, :, 1:4])
+    return np.lib.stride_tricks.as_strided(image, shape=image.shape[:2] + (4,), strides=image.strides,
+                                           writeable=False)
+
+
+class FrameBuffers:
+    """
+    한 프레임 처리에 필요한 컬러 입력, 주석 캔버스, Depth 버퍼를 처음 한 번만 할당해 재사용.
+    해상도가 바뀔 때만 다시 할당하며, 반환된 배열은 같은 버퍼를 다시 채우기 전까지만 유효.
+
+    ZED LEFT 뷰는 BGRA 순서. [:, :, :3] 뷰를 NumPy로 복사하면 픽셀 간격이 4바이트라 느린 경로를 타므로
+    (720p 약 10ms), cv2.cvtColor(BGRA2BGR)로 미리 할당한 연속 버퍼에 한 번에 변환 (약 0.3ms).
+    """
+
+    def __init__(self):
+        self._arrays = {}
+        self.allocations = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        """이름별 버퍼. 크기나 형식이 바뀌었을 때만 새로 할당."""
+        array = self._arrays.get(name)
+        if array is None or array.shape != tuple(shape) or array.dtype != dtype:
+            array = self._arrays[name] = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+        return array
+
+    def color(self, image):
+        """
+        BGRA (H, W, 4) 영상, 그 [:, :, :3] 뷰, 또는 BGR 영상을 연속된 BGR 버퍼로 변환.
+        모델 입력과 제자리 주석(OverlayRenderer.render(..., out=같은 버퍼))에 함께 사용.
+        """
+        out = self.get("color", image.shape[:2] + (3,))
+        bgra = image if image.ndim == 3 and image.shape[2] == 4 else bgra_base(image)
+        if bgra is not None:
+            return cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=out)
+        np.copyto(out, image)
+        return out
+
+    def canvas(self, image):
+        """image를 복사한 주석 캔버스. 원본을 그대로 두어야 할 때만 사용 (그 외에는 color 버퍼에 바로 그림)."""
+        out = self.get("canvas", image.shape, image.dtype)
+        np.copyto(out, image)
+        return out
+
+    def depth(self, depth_np):
+        """다음 retrieve/read 뒤에도 써야 하는 Depth를 미리 할당한 버퍼에 복사."""
+        out = self.get("depth", depth_np.shape, np.float32)
+        np.copyto(out, depth_np)
+        return out
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self._arrays.values())
+
+
+class FrameBufferPool:
+    """
+    FrameBuffers 슬롯을 재사용하는 풀. 여러 프레임이 동시에 처리되는 파이프라인에서 사용.
+    acquire()로 받은 슬롯은 참조 수가 0이 될 때까지(release) 다른 프레임에 주지 않음.
+    파이프라인 끝에서 처리가 끝났을 때와 DROP_OLDEST 큐가 프레임을 버렸을 때 release를 호출해야 함.
+    빈 슬롯이 없으면 풀 밖의 새 FrameBuffers를 할당해 반환 (처리 중인 프레임의 버퍼를 덮어쓰지 않음).
+
+    Args:
+    - slots: 슬롯 수. pipeline.max_in_flight 이상이면 새로 할당하는 일이 없음.
+    """
+
+    def __init__(self, slots):
+        self.slots = [FrameBuffers() for _ in range(slots)]
+        self._free = deque(self.slots)
+        self._refs = {}
+        self._lock = threading.Lock()
+        self.overflows = 0
+
+    def acquire(self):
+        """빈 슬롯 (참조 수 1). 빈 슬롯이 없으면 풀에 속하지 않은 새 FrameBuffers."""
+        with self._lock:
+            if not self._free:
+                self.overflows += 1
+                return FrameBuffers()
+            buffers = self._free.popleft()
+            self._refs[id(buffers)] = 1
+            return buffers
+
+    def retain(self, buffers):
+        """같은 슬롯을 다른 곳에서도 잡고 있을 때 참조 수를 늘림."""
+        with self._lock:
+            if id(buffers) in self._refs:
+                self._refs[id(buffers)] += 1
+
+    def release(self, buffers):
+        """참조 수를 줄이고 0이 되면 슬롯을 돌려줌. None이나 풀 밖의 버퍼는 무시."""
+        if buffers is None:
+            return
+        with self._lock:
+            refs = self._refs.get(id(buffers))
+            if refs is None:
+                return
+            if refs > 1:
+                self._refs[id(buffers)] = refs - 1
+                return
+            del self._refs[id(buffers)]
+            self._free.append(buffers)
+
+    def stats(self):
+        with self._lock:
+            in_use = len(self._refs)
+        return {
+            "slots": len(self.slots),
+            "in_use": in_use,
+            "overflows": self.overflows,
+            "allocations": sum(buffers.allocations for buffers in self.slots),
+            "bytes": sum(buffers.nbytes for buffers in self.slots),
+        }
+
+
+def rss_bytes():
+    """현재 프로세스의 상주 메모리 (바이트). /proc을 읽을 수 없으면 최대 상주 메모리."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * 4096
+    except (OSError, IndexError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class AllocationMeter:
+    """
+    tracemalloc으로 프레임당 할당 바이트(프레임 안에서 새로 잡힌 최대 메모리)와 누적 증가량을 측정.
+    NumPy와 OpenCV가 만든 배열의 데이터 버퍼도 집계됨. 측정 중에는 할당마다 오버헤드가 있으므로 벤치마크 전용.
+    """
+
+    def __init__(self):
+        self.samples = []
+        self._start = 0
+
+    def __enter__(self):
+        tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        tracemalloc.stop()
+
+    def begin_frame(self):
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+
+    def end_frame(self):
+        current, peak = tracemalloc.get_traced_memory()
+        self.samples.append(peak - self._start)
+        return current
+
+    def stats(self):
+        values = np.asarray(self.samples, dtype=np.float64)
+        if not len(values):
+            return {"frames": 0, "mean_bytes": 0.0, "p95_bytes": 0.0}
+        return {"frames": len(values), "mean_bytes": float(values.mean()),
+                "p95_bytes": float(np.percentile(values, 95))}
+
+
+def legacy_frame(bgra, depth_np, detect, renderer):
+    """기존 스크립트 방식: 색 변환 새 배열, 주석용 복사본, Depth 복사본을 프레임마다 새로 만듦."""
+    rgb_frame = cv2.cvtColor(bgra, cv2.COLOR_RGBA2RGB)
+    prediction = detect(rgb_frame)
+    depth_copy = np.array(depth_np)
+    result_frame = rgb_frame.copy()
+    renderer.render_prediction(result_frame, prediction, out=result_frame)
+    return result_frame, depth_copy
+
+
+def pooled_frame(bgra, depth_np, detect, renderer, buffers):
+    """FrameBuffers 방식: 미리 할당한 버퍼에 변환/복사하고 모델 입력 버퍼에 바로 주석을 그림."""
+    bgr = buffers.color(bgra)
+    prediction = detect(bgr)
+    depth_copy = buffers.depth(depth_np)
+    renderer.render_prediction(bgr, prediction, out=bgr)
+    return bgr, depth_copy
+
+
+def run_memory_benchmark(frame_source, detect, renderer, frames=300, minutes=0.0, log_every=60.0, modes=None):
+    """
+    같은 소스로 기존 방식과 버퍼 재사용 방식의 프레임당 할당 바이트, 처리 시간, 상주 메모리 변화를 비교.
+    minutes를 주면 각 방식을 그 시간 동안 실행하며 log_every초마다 상주 메모리를 출력 (장시간 안정성 확인용).
+
+    Returns:
+    - {mode: {"frames", "ms_per_frame", "alloc_mean_bytes", "alloc_p95_bytes", "rss_start", "rss_end",
+              "traced_growth_bytes"}}
+    """
+    report = {}
+    for mode in modes or ("legacy", "pooled"):
+        buffers = FrameBuffers()
+        bgra = None
+        with AllocationMeter() as meter:
+            deadline = time.perf_counter() + minutes * 60.0 if minutes else None
+            rss_start, traced_start, next_log = None, 0, time.perf_counter() + log_every
+            elapsed, count = 0.0, 0
+            while (count < frames) if deadline is None else (time.perf_counter() < deadline):
+                frame = frame_source.read()
+                if frame is None:
+                    break
+                # ZED LEFT 뷰처럼 BGRA sl.Mat 버퍼를 흉내 (측정 대상이 아니므로 재사용 버퍼에 변환)
+                if bgra is None:
+                    bgra = np.empty(frame.bgr.shape[:2] + (4,), dtype=np.uint8)
+                cv2.cvtColor(np.ascontiguousarray(frame.bgr), cv2.COLOR_BGR2BGRA, dst=bgra)
+
+                meter.begin_frame()
+                start = time.perf_counter()
+                if mode == "legacy":
+                    legacy_frame(bgra, frame.depth, detect, renderer)
+                else:
+                    pooled_frame(bgra, frame.depth, detect, renderer, buffers)
+                elapsed += time.perf_counter() - start
+                current = meter.end_frame()
+                count += 1
+
+                if count == 10:  # 워밍업(첫 할당) 이후를 기준으로 누적 증가량 측정
+                    rss_start, traced_start = rss_bytes(), current
+                if deadline is not None and time.perf_counter() >= next_log:
+                    next_log += log_every
+                    print(f"[{mode}] frames={count} rss={rss_bytes() / 1e6:.1f} MB "
+                          f"traced={current / 1e6:.2f} MB")
+            stats = meter.stats()
+        report[mode] = {
+            "frames": count,
+            "ms_per_frame": elapsed * 1000.0 / max(count, 1),
+            "alloc_mean_bytes": stats["mean_bytes"],
+            "alloc_p95_bytes": stats["p95_bytes"],
+            "rss_start": rss_start or rss_bytes(),
+            "rss_end": rss_bytes(),
+            "traced_growth_bytes": current - traced_start if count else 0,
+        }
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="프레임 버퍼 재사용 전후의 프레임당 할당 바이트와 장시간 메모리 사용량 비교")
+    parser.add_argument("--source", default="synthetic", help='"zed", "synthetic" 또는 녹화 폴더 경로')
+    parser.add_argument("--model", default="none", help='YOLO 모델 경로. "none"이면 합성 소스의 정답 박스 사용')
+    parser.add_argument("--frames", type=int, default=300, help="방식별 프레임 수 (--minutes가 없을 때)")
+    parser.add_argument("--minutes", type=float, default=0.0, help="방식별 실행 시간 (분). 장시간 안정성 확인용")
+    parser.add_argument("--log-every", type=float, default=60.0, help="--minutes 실행 중 메모리 출력 간격 (초)")
+    return parser.parse_args()
+
+
+def main():
+    from benchmark import make_detector
+    from frame_source import open_frame_source
+    from inference_cache import Prediction
+    from overlay import OverlayRenderer
+
+    args = parse_args()
+    frame_source = open_frame_source(args.source, realtime=False, loop=True)
+    detect_boxes, model_names = make_detector(args.model, frame_source)
+
+    def detect(bgr):
+        boxes, classes, results = detect_boxes(bgr)
+        masks = None
+        if results is not None and results[0].masks is not None:
+            masks = results[0].masks.data.cpu().numpy() > 0.5
+        return Prediction(boxes, np.asarray(classes, dtype=np.int32), np.ones(len(boxes), dtype=np.float32),
+                          masks, bgr.shape[:2])
+
+    try:
+        report = run_memory_benchmark(frame_source, detect, OverlayRenderer(model_names), args.frames,
+                                      args.minutes, args.log_every)
+    finally:
+        frame_source.close()
+
+    print(f"{'mode':<8}{'frames':>8}{'ms/frame':>10}{'alloc/frame (MB)':>18}{'p95 (MB)':>10}"
+          f"{'RSS (MB)':>18}{'traced growth (KB)':>20}")
+    for mode, row in report.items():
+        rss = f"{row['rss_start'] / 1e6:.1f} -> {row['rss_end'] / 1e6:.1f}"
+        print(f"{mode:<8}{row['frames']:>8}{row['ms_per_frame']:>10.2f}{row['alloc_mean_bytes'] / 1e6:>18.2f}"
+              f"{row['alloc_p95_bytes'] / 1e6:>10.2f}{rss:>18}{row['traced_growth_bytes'] / 1e3:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
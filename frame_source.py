@@ -0,0 +1,451 @@
+import argparse
+import json
+import os
+import time
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+from depth_grid import DepthGrid
+from measurement_context import FrameMeasurementContext, zed_depth_resolution
+
+try:
+    import pyzed.sl as sl
+except ImportError:  # ZED SDK가 없는 환경에서는 녹화/합성 소스만 사용 가능
+    sl = None
+
+
+class CameraCalibration(NamedTuple):
+    """왼쪽 카메라 내부 파라미터 (픽셀 단위)."""
+    fx: float
+    fy: float
+    cx: float
+    cy: float
+
+
+class Frame(NamedTuple):
+    """
+    소스에서 읽은 한 프레임.
+
+    - frame_id: 프레임 번호.
+    - timestamp: 소스 기준 시각 (초).
+    - bgr: 컬러 영상 (H, W, 3), uint8, BGR 순서.
+    - depth: Depth 맵 (H, W), float32, 미터 단위. 유효하지 않은 픽셀은 NaN/inf.
+    """
+    frame_id: int
+    timestamp: float
+    bgr: np.ndarray
+    depth: np.ndarray
+
+
+def depth_to_xyz(depth_np, calibration):
+    """
+    Depth 맵과 내부 파라미터로 XYZ 포인트 클라우드를 계산 (ZED IMAGE 좌표계와 동일).
+
+    Returns:
+    - (H, W, 3) float32 배열.
+    """
+    h, w = depth_np.shape
+    u = (np.arange(w, dtype=np.float32) - calibration.cx) / calibration.fx
+    v = (np.arange(h, dtype=np.float32) - calibration.cy) / calibration.fy
+    xyz = np.empty((h, w, 3), dtype=np.float32)
+    xyz[..., 0] = depth_np * u[None, :]
+    xyz[..., 1] = depth_np * v[:, None]
+    xyz[..., 2] = depth_np
+    return xyz
+
+
+class FrameSource:
+    """
+    카메라에 독립적인 프레임 소스 인터페이스.
+    read()는 다음 Frame을 반환하고, 더 이상 프레임이 없으면 None을 반환.
+    """
+
+    calibration = None
+    shape = None  # 컬러 영상 크기 (H, W)
+    grid = None  # Depth가 영상보다 작은 해상도이면 depth_grid.DepthGrid
+
+    def read(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def measurement_context(self):
+        """
+        마지막으로 읽은 프레임에 대한 FrameMeasurementContext 생성.
+        포인트 클라우드는 Depth와 (Depth 해상도 기준) 내부 파라미터로 계산.
+        """
+        calibration = self.calibration if self.grid is None else self.grid.calibration(self.calibration)
+        return FrameMeasurementContext(
+            lambda: self._last.depth,
+            lambda: depth_to_xyz(self._last.depth, calibration),
+            self.grid,
+        )
+
+    def __iter__(self):
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 잠시 기다렸다가 다시 grab하면 복구될 수 있는 ZED 오류 (SDK 버전에 없는 이름은 무시)
+_TRANSIENT_GRAB_ERRORS = ("CORRUPTED_FRAME", "CAMERA_REBOOTING", "LOW_USB_BANDWIDTH", "NOT_ENOUGH_GPU_MEMORY")
+
+
+class ZedFrameSource(FrameSource):
+    """
+    ZED 카메라 실시간 소스.
+    반환된 배열은 다음 read() 호출 전까지만 유효 (sl.Mat 버퍼 재사용).
+    depth_scale이 1보다 작으면 Depth와 포인트 클라우드를 SDK에서 축소된 해상도로 가져옴 (grid로 좌표 변환).
+    SVO 파일 끝이면 read()가 None을 반환하고, 일시적인 grab 오류는 간격을 늘려가며 max_retries번까지 다시 시도.
+    """
+
+    def __init__(self, depth_mode="PERFORMANCE", resolution="HD720", serial_number=None, depth_scale=1.0,
+                 max_retries=20):
+        if sl is None:
+            raise ImportError("pyzed (ZED SDK) is required for ZedFrameSource")
+
+        self.zed = sl.Camera()
+        init_params = sl.InitParameters()
+        if serial_number is not None:  # 여러 대를 연결했을 때 특정 카메라 선택
+            init_params.set_from_serial_number(serial_number)
+        init_params.depth_mode = getattr(sl.DEPTH_MODE, depth_mode)
+        init_params.coordinate_units = sl.UNIT.METER
+        init_params.camera_resolution = getattr(sl.RESOLUTION, resolution)
+
+        if self.zed.open(init_params) != sl.ERROR_CODE.SUCCESS:
+            raise RuntimeError("Failed to open ZED camera!")
+
+        self.runtime_params = sl.RuntimeParameters()
+        left_cam = self.zed.get_camera_information().camera_configuration.calibration_parameters.left_cam
+        self.calibration = CameraCalibration(left_cam.fx, left_cam.fy, left_cam.cx, left_cam.cy)
+        grid, self._depth_resolution = zed_depth_resolution(self.zed, depth_scale)
+        self.shape = grid.image_shape
+        self.grid = None if grid.full else grid
+
+        self._image = sl.Mat()
+        self._depth = sl.Mat()
+        self._point_cloud = sl.Mat()
+        self._frame_id = 0
+        self._last = None
+        self.max_retries = max_retries
+        self._transient = {getattr(sl.ERROR_CODE, name) for name in _TRANSIENT_GRAB_ERRORS
+                           if hasattr(sl.ERROR_CODE, name)}
+
+    def _grab(self):
+        """
+        새 프레임을 grab. SVO 파일 끝이면 False.
+        일시적인 오류는 5ms부터 두 배씩 (최대 0.5초) 기다렸다가 다시 시도하고, 그 외 오류는 RuntimeError.
+        """
+        failures = 0
+        while True:
+            status = self.zed.grab(self.runtime_params)
+            if status == sl.ERROR_CODE.SUCCESS:
+                return True
+            if status == sl.ERROR_CODE.END_OF_SVOFILE_REACHED:
+                return False
+            if status not in self._transient or failures >= self.max_retries:
+                raise RuntimeError(f"ZED grab failed: {status}")
+            time.sleep(min(0.005 * 2 ** failures, 0.5))
+            failures += 1
+
+    def read(self):
+        if not self._grab():
+            return None
+        self.zed.retrieve_image(self._image, sl.VIEW.LEFT)
+        self.zed.retrieve_measure(self._depth, sl.MEASURE.DEPTH, sl.MEM.CPU, self._depth_resolution)
+        timestamp = self.zed.get_timestamp(sl.TIME_REFERENCE.IMAGE).get_milliseconds() / 1000.0
+
+        # LEFT 뷰는 BGRA 순서이므로 알파 채널만 잘라낸 뷰를 사용
+        frame = Frame(self._frame_id, timestamp, self._image.get_data()[:, :, :3], self._depth.get_data())
+        self._frame_id += 1
+        self._last = frame
+        return frame
+
+    def measurement_context(self):
+        """포인트 클라우드를 ZED SDK에서 직접 가져오는 FrameMeasurementContext."""
+        def fetch_xyz():
+            self.zed.retrieve_measure(self._point_cloud, sl.MEASURE.XYZRGBA, sl.MEM.CPU, self._depth_resolution)
+            return self._point_cloud.get_data()
+
+        return FrameMeasurementContext(lambda: self._last.depth, fetch_xyz, self.grid)
+
+    def close(self):
+        self.zed.close()
+
+
+class RecordingFrameSource(FrameSource):
+    """
+    디스크에 저장된 RGB + Depth 녹화 재생 소스.
+    Depth와 컬러 데이터는 메모리 맵으로 열어 필요한 프레임만 읽음.
+
+    녹화 폴더 구성 (RecordingWriter가 생성):
+    - meta.json: fx, fy, cx, cy, width, height, frames
+    - rgb.u8: (frames, H, W, 3) uint8 BGR 원시 데이터
+    - depth.f32: (frames, H, W) float32 원시 데이터
+    - timestamps.npy: (frames,) 초 단위 타임스탬프
+
+    Args:
+    - path: 녹화 폴더 경로.
+    - realtime: True이면 원래 프레임 간격대로 재생, False이면 최대 속도로 재생.
+    - loop: True이면 끝에 도달했을 때 처음부터 다시 재생.
+    """
+
+    def __init__(self, path, realtime=True, loop=False):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+
+        frames, h, w = meta["frames"], meta["height"], meta["width"]
+        self.calibration = CameraCalibration(meta["fx"], meta["fy"], meta["cx"], meta["cy"])
+        self.bgr = np.memmap(os.path.join(path, "rgb.u8"), dtype=np.uint8, mode="r", shape=(frames, h, w, 3))
+        self.depth = np.memmap(os.path.join(path, "depth.f32"), dtype=np.float32, mode="r", shape=(frames, h, w))
+        self.timestamps = np.load(os.path.join(path, "timestamps.npy"))
+        self.shape = (h, w)
+        self.realtime = realtime
+        self.loop = loop
+        self._index = 0
+        self._frame_id = 0
+        self._clock_offset = None
+        self._last = None
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def read(self):
+        if self._index >= len(self):
+            if not self.loop or len(self) == 0:
+                return None
+            self._index = 0
+            self._clock_offset = None
+
+        timestamp = float(self.timestamps[self._index])
+        if self.realtime:
+            # 첫 프레임 기준으로 원래 프레임 간격을 맞춤
+            now = time.perf_counter()
+            if self._clock_offset is None:
+                self._clock_offset = now - timestamp
+            delay = timestamp + self._clock_offset - now
+            if delay > 0:
+                time.sleep(delay)
+
+        frame = Frame(self._frame_id, timestamp, self.bgr[self._index], self.depth[self._index])
+        self._index += 1
+        self._frame_id += 1
+        self._last = frame
+        return frame
+
+
+class SyntheticFrameSource(FrameSource):
+    """
+    카메라 없이 파이프라인을 실행하기 위한 합성 프레임 소스.
+    기울어진 지면 위에 타원형 돌을 그리고, Depth에 노이즈와 구멍(NaN)을 추가.
+
+    Args:
+    - width, height: 영상 크기.
+    - num_frames: 생성할 프레임 수. None이면 무한.
+    - num_objects: 프레임당 돌 개수.
+    - hole_ratio: Depth 구멍 블록 비율.
+    - fps: None이 아니면 해당 속도로 프레임을 생성.
+    - seed: 난수 시드.
+    """
+
+    def __init__(self, width=1280, height=720, num_frames=None, num_objects=8, hole_ratio=0.1,
+                 fps=None, seed=0):
+        self.width, self.height = width, height
+        self.shape = (height, width)
+        self.num_frames = num_frames
+        self.num_objects = num_objects
+        self.hole_ratio = hole_ratio
+        self.fps = fps
+        self.calibration = CameraCalibration(700.0, 700.0, width / 2, height / 2)
+        self._rng = np.random.default_rng(seed)
+        self._frame_id = 0
+        self._start = time.perf_counter()
+        self._last = None
+        self.objects = np.zeros((0, 4), dtype=np.int32)  # 마지막 프레임의 돌 바운딩 박스
+        self.object_sizes = np.zeros((0, 2), dtype=np.float32)  # 마지막 프레임 돌의 실제 가로/세로 (m)
+
+        # 지면: 위쪽이 멀고 아래쪽이 가까운 Depth
+        rows = np.linspace(6.0, 1.5, height, dtype=np.float32)
+        self._ground = np.repeat(rows[:, None], width, axis=1)
+        self._texture = self._rng.integers(60, 140, size=(height, width, 3), dtype=np.uint8)
+        self._centers = self._rng.uniform([0.1 * width, 0.3 * height], [0.9 * width, 0.9 * height],
+                                          size=(num_objects, 2))
+        self._axes = self._rng.uniform(15, 80, size=(num_objects, 2))
+
+    def read(self):
+        if self.num_frames is not None and self._frame_id >= self.num_frames:
+            return None
+        if self.fps:
+            delay = self._start + self._frame_id / self.fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        h, w = self.height, self.width
+        bgr = self._texture.copy()
+        depth = self._ground + self._rng.normal(0, 0.01, size=(h, w)).astype(np.float32)
+
+        # 돌은 천천히 움직이며 지면보다 약간 앞에 위치
+        drift = np.array([np.sin(self._frame_id / 30.0), np.cos(self._frame_id / 45.0)]) * 5.0
+        mask = np.zeros((h, w), dtype=np.uint8)
+        boxes = []
+        for (cx, cy), (ax, ay) in zip(self._centers + drift, self._axes):
+            center, axes = (int(cx), int(cy)), (int(ax), int(ay))
+            cv2.ellipse(mask, center, axes, 0, 0, 360, 1, -1)
+            boxes.append([center[0] - axes[0], center[1] - axes[1], center[0] + axes[0], center[1] + axes[1]])
+        region = mask.view(bool)
+        depth[region] -= 0.2
+        bgr[region] = (90, 90, 95)
+        self.objects = np.clip(np.array(boxes, dtype=np.int32).reshape(-1, 4), 0, [w - 1, h - 1, w - 1, h - 1])
+        # 실제 크기: 타원 지름 (픽셀) x 노이즈 없는 중심 Depth / 초점 거리
+        centers = np.clip((self._centers + drift).astype(int), 0, [w - 1, h - 1])
+        z = self._ground[centers[:, 1], 0] - 0.2
+        self.object_sizes = (2 * self._axes.astype(int) * z[:, None]
+                             / [self.calibration.fx, self.calibration.fy]).astype(np.float32)
+
+        # 8x8 블록 단위 구멍
+        holes = self._rng.random((h // 8 + 1, w // 8 + 1)) < self.hole_ratio
+        depth[np.kron(holes, np.ones((8, 8), dtype=bool))[:h, :w]] = np.nan
+
+        frame = Frame(self._frame_id, time.perf_counter() - self._start, bgr, depth)
+        self._frame_id += 1
+        self._last = frame
+        return frame
+
+
+class ReducedDepthSource(FrameSource):
+    """
+    다른 소스의 Depth를 축소된 해상도로 바꿔 전달하는 소스 (녹화/합성 소스에서 ZED의 축소 retrieve를 재현).
+    축소한 Depth는 미리 할당한 버퍼 하나에 쓰므로 다음 read() 호출 전까지만 유효.
+
+    Args:
+    - source: 전체 해상도 FrameSource (shape가 있어야 함).
+    - depth_scale: Depth 해상도 배율.
+    """
+
+    def __init__(self, source, depth_scale):
+        self.source = source
+        self.calibration = source.calibration
+        self.shape = source.shape
+        self.grid = DepthGrid(source.shape, depth_scale)
+        self._depth = np.empty(self.grid.shape, dtype=np.float32)
+        self._last = None
+
+    def __getattr__(self, name):
+        # 합성 소스의 objects 등 원래 소스의 속성을 그대로 노출
+        if name == "source":
+            raise AttributeError(name)
+        return getattr(self.source, name)
+
+    def read(self):
+        frame = self.source.read()
+        if frame is None:
+            return None
+        frame = frame._replace(depth=self.grid.downsample(frame.depth, out=self._depth))
+        self._last = frame
+        return frame
+
+    def close(self):
+        self.source.close()
+
+
+class RecordingWriter:
+    """
+    프레임을 RecordingFrameSource 형식으로 디스크에 순차 저장.
+
+    Args:
+    - path: 저장할 폴더 경로.
+    - calibration: CameraCalibration.
+    """
+
+    def __init__(self, path, calibration):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.calibration = calibration
+        self._rgb = open(os.path.join(path, "rgb.u8"), "wb")
+        self._depth = open(os.path.join(path, "depth.f32"), "wb")
+        self._timestamps = []
+        self._shape = None
+
+    def write(self, frame):
+        if self._shape is None:
+            self._shape = frame.depth.shape
+        elif frame.depth.shape != self._shape:
+            raise ValueError(f"Frame size changed: {frame.depth.shape} != {self._shape}")
+        self._rgb.write(np.ascontiguousarray(frame.bgr, dtype=np.uint8).tobytes())
+        self._depth.write(np.ascontiguousarray(frame.depth, dtype=np.float32).tobytes())
+        self._timestamps.append(frame.timestamp)
+
+    def close(self):
+        self._rgb.close()
+        self._depth.close()
+        np.save(os.path.join(self.path, "timestamps.npy"), np.asarray(self._timestamps, dtype=np.float64))
+        h, w = self._shape if self._shape is not None else (0, 0)
+        meta = dict(self.calibration._asdict(), width=w, height=h, frames=len(self._timestamps))
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_frame_source(spec, realtime=True, loop=False, depth_scale=1.0, **kwargs):
+    """
+    문자열로 프레임 소스를 생성.
+
+    Args:
+    - spec: "zed", "zed:<시리얼 번호>", "synthetic", "synthetic:<seed>" 또는 녹화 폴더 경로.
+    - realtime, loop: 녹화 재생 옵션.
+    - depth_scale: Depth 해상도 배율. ZED는 SDK에서 축소해 가져오고, 그 외 소스는 ReducedDepthSource로 축소.
+    - kwargs: 각 소스 생성자에 전달할 추가 인자.
+
+    Returns:
+    - FrameSource.
+    """
+    if spec == "zed":
+        return ZedFrameSource(depth_scale=depth_scale, **kwargs)
+    if spec.startswith("zed:"):
+        return ZedFrameSource(serial_number=int(spec[len("zed:"):]), depth_scale=depth_scale, **kwargs)
+    if spec == "synthetic":
+        source = SyntheticFrameSource(**kwargs)
+    elif spec.startswith("synthetic:"):
+        source = SyntheticFrameSource(seed=int(spec[len("synthetic:"):]), **kwargs)
+    else:
+        source = RecordingFrameSource(spec, realtime=realtime, loop=loop)
+    return source if depth_scale == 1.0 else ReducedDepthSource(source, depth_scale)
+
+
+def record(source, path, max_frames):
+    """소스에서 최대 max_frames 프레임을 읽어 녹화 폴더로 저장."""
+    count = 0
+    with RecordingWriter(path, source.calibration) as writer:
+        for frame in source:
+            writer.write(frame)
+            count += 1
+            if count >= max_frames:
+                break
+    print(f"Saved {count} frames to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ZED(또는 합성) 프레임을 녹화 폴더로 저장")
+    parser.add_argument("--source", default="zed", help='"zed" 또는 "synthetic"')
+    parser.add_argument("--out", required=True, help="저장할 녹화 폴더")
+    parser.add_argument("--frames", type=int, default=300, help="저장할 프레임 수")
+    args = parser.parse_args()
+
+    with open_frame_source(args.source) as source:
+        record(source, args.out, args.frames)
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+
+class Prediction(NamedTuple):
+    """
+    모델 출력의 간결한 표현 (캐시 저장 단위).
+
+    - boxes: (N, 4) float32, xyxy (원본 영상 좌표).
+    - classes: (N,) int32.
+    - confs: (N,) float32.
+    - masks: (N, h, w) bool 또는 None. 추론 입력(레터박스) 해상도.
+    - orig_shape: 원본 영상 크기 (H, W).
+    """
+    boxes: np.ndarray
+    classes: np.ndarray
+    confs: np.ndarray
+    masks: np.ndarray
+    orig_shape: tuple
+
+
+def prediction_from_result(result):
+    """ultralytics Results 하나를 Prediction으로 변환."""
+    boxes = result.boxes
+    masks = None
+    if result.masks is not None:
+        masks = result.masks.data.cpu().numpy() > 0.5
+    return Prediction(
+        boxes.xyxy.cpu().numpy().astype(np.float32),
+        boxes.cls.cpu().numpy().astype(np.int32),
+        boxes.conf.cpu().numpy().astype(np.float32),
+        masks,
+        tuple(result.orig_shape),
+    )
+
+
+def prediction_to_result(prediction, orig_img, path, names):
+    """
+    Prediction을 ultralytics Results로 복원. results.plot() 등 기존 시각화 코드를 그대로 사용 가능.
+    """
+    import torch
+    from ultralytics.engine.results import Results
+
+    boxes = np.concatenate([prediction.boxes, prediction.confs[:, None],
+                            prediction.classes[:, None].astype(np.float32)], axis=1)
+    masks = torch.from_numpy(prediction.masks.astype(np.float32)) if prediction.masks is not None else None
+    return Results(orig_img, path=path, names=names, boxes=torch.from_numpy(boxes), masks=masks)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    파일 내용의 blake2b 해시 (16진수 문자열).
+    폴더(OpenVINO 모델 등)이면 하위 파일의 상대 경로와 내용을 정렬된 순서로 모두 해시.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode())
+                digest.update(file_digest(file_path, chunk_size).encode())
+        return digest.hexdigest()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class InferenceCache:
+    """
+    이미지 내용 해시, 실행 모델 해시, 백엔드, 추론 인자를 키로 하는 디스크 예측 캐시.
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제 (LRU).
+
+    Args:
+    - cache_dir: 캐시 폴더.
+    - weights_path: 실제로 실행하는 모델 파일(또는 OpenVINO 폴더) 경로 (내용 해시가 키에 포함됨).
+      ONNX/OpenVINO/INT8로 실행하면 .pt가 아니라 내보낸 모델 경로 (runtime_backend.resolve_backend).
+    - max_bytes: 캐시 최대 크기 (바이트).
+    - backend: 실행 백엔드 이름 (키에 포함되어 백엔드마다 결과를 따로 저장).
+    - params: 결과에 영향을 주는 추론 인자 (conf, imgsz 등).
+    """
+
+    def __init__(self, cache_dir, weights_path, max_bytes=512 * 1024 * 1024, backend="torch", **params):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self.weights_digest = file_digest(weights_path)
+        self.params = params
+        self.params_json = json.dumps(params, sort_keys=True, default=str)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}  # 경로 -> (마지막 사용 시각, 크기)
+        for name in os.listdir(cache_dir):
+            if name.endswith(".npz"):
+                stat = os.stat(os.path.join(cache_dir, name))
+                self._entries[os.path.join(cache_dir, name)] = (stat.st_mtime, stat.st_size)
+        self._total = sum(size for _, size in self._entries.values())
+
+    def key(self, image_path):
+        """이미지 내용 + 실행 모델 + 백엔드 + 추론 인자로 캐시 키 생성."""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(file_digest(image_path).encode())
+        digest.update(self.weights_digest.encode())
+        digest.update(self.backend.encode())
+        digest.update(self.params_json.encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """
+        캐시된 Prediction을 반환. 없으면 None.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                masks = None
+                if data["mask_shape"].size:
+                    n, h, w = data["mask_shape"]
+                    masks = np.unpackbits(data["masks"], count=n * h * w).reshape(n, h, w).astype(bool)
+                prediction = Prediction(data["boxes"], data["classes"], data["confs"], masks,
+                                        tuple(data["orig_shape"].tolist()))
+        except (zipfile.BadZipFile, EOFError):  # 쓰다 끊긴 파일 등 손상된 항목은 지우고 다시 추론
+            with self._lock:
+                self.misses += 1
+                self._discard(path)
+            return None
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            try:
+                os.utime(path)  # LRU 순서 갱신
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:  # 읽은 직후 다른 프로세스가 삭제
+                self._discard(path)
+            else:
+                if path in self._entries:
+                    self._entries[path] = (mtime, self._entries[path][1])
+        return prediction
+
+    def put(self, key, prediction):
+        """Prediction을 저장하고 필요하면 오래된 항목을 삭제."""
+        masks = prediction.masks
+        mask_shape = np.array(masks.shape if masks is not None else [], dtype=np.int64)
+        packed = np.packbits(masks.ravel()) if masks is not None else np.zeros(0, dtype=np.uint8)
+
+        path = self._path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, boxes=prediction.boxes, classes=prediction.classes, confs=prediction.confs,
+                                masks=packed, mask_shape=mask_shape,
+                                orig_shape=np.array(prediction.orig_shape, dtype=np.int64))
+        os.replace(tmp_path, path)  # 다른 프로세스가 읽는 중에도 안전하게 교체
+
+        size = os.path.getsize(path)
+        with self._lock:
+            _, old_size = self._entries.get(path, (0, 0))
+            self._entries[path] = (os.path.getmtime(path), size)
+            self._total += size - old_size
+            self._evict(keep=path)
+
+    def _discard(self, path):
+        """항목 파일을 삭제하고 목록에서 제거."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        _, size = self._entries.pop(path, (0, 0))
+        self._total -= size
+
+    def _evict(self, keep=None):
+        """오래 사용하지 않은 항목부터 삭제. 방금 저장한 항목(keep)은 남김."""
+        if self._total <= self.max_bytes:
+            return
+        for path, (_, size) in sorted(self._entries.items(), key=lambda item: item[1][0]):
+            if self._total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._discard(path)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._total}
+
+
+def predict_with_cache(model, cache, image_path, img=None):
+    """
+    캐시를 먼저 확인하고, 없을 때만 모델을 실행해 결과를 저장.
+    추론 인자는 캐시를 만들 때 준 params를 그대로 사용.
+
+    Args:
+    - model: YOLO 모델.
+    - cache: InferenceCache.
+    - image_path: 이미지 경로.
+    - img: 이미 디코딩한 이미지 (없으면 캐시 미스일 때만 디코딩).
+
+    Returns:
+    - Prediction.
+    """
+    key = cache.key(image_path)
+    prediction = cache.get(key)
+    if prediction is None:
+        if img is None:
+            img = cv2.imread(image_path)
+        result = model.predict(img, verbose=False, **cache.params)[0]
+        prediction = prediction_from_result(result)
+        cache.put(key, prediction)
+    return prediction
@@ -0,0 +1,415 @@
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from inference_cache import Prediction, prediction_from_result
+from metrics import summarize
+from offline_infer import prediction_to_record
+
+# 바이너리 응답: 헤더 + boxes (N, 4) f4 + classes (N,) u2 + confs (N,) f4 + packbits 마스크
+PREDICTION_MAGIC = b"YPRD"
+PREDICTION_HEADER = struct.Struct("<4sIHHHH")  # magic, count, orig_h, orig_w, mask_h, mask_w (마스크 없으면 0)
+BINARY_TYPE = "application/x-yolo-prediction"
+RAW_TYPE = "application/x-raw-bgr"  # 헤더 X-Image-Shape: "h,w"
+
+
+def encode_prediction(prediction):
+    """Prediction을 압축 없는 고정 형식 bytes로 변환 (마스크는 1비트/픽셀)."""
+    n = len(prediction.boxes)
+    oh, ow = prediction.orig_shape
+    masks = prediction.masks
+    mh, mw = masks.shape[1:] if masks is not None else (0, 0)
+    parts = [
+        PREDICTION_HEADER.pack(PREDICTION_MAGIC, n, oh, ow, mh, mw),
+        prediction.boxes.astype("<f4", copy=False).tobytes(),
+        prediction.classes.astype("<u2").tobytes(),
+        prediction.confs.astype("<f4", copy=False).tobytes(),
+    ]
+    if masks is not None:
+        parts.append(np.packbits(masks.ravel()).tobytes())
+    return b"".join(parts)
+
+
+def decode_prediction(payload):
+    """encode_prediction의 역변환."""
+    magic, n, oh, ow, mh, mw = PREDICTION_HEADER.unpack_from(payload)
+    if magic != PREDICTION_MAGIC:
+        raise ValueError("Invalid prediction payload")
+    offset = PREDICTION_HEADER.size
+    boxes = np.frombuffer(payload, "<f4", n * 4, offset).reshape(n, 4)
+    offset += boxes.nbytes
+    classes = np.frombuffer(payload, "<u2", n, offset).astype(np.int32)
+    offset += n * 2
+    confs = np.frombuffer(payload, "<f4", n, offset)
+    offset += confs.nbytes
+    masks = None
+    if mh:
+        packed = np.frombuffer(payload, np.uint8, offset=offset)
+        masks = np.unpackbits(packed, count=n * mh * mw).reshape(n, mh, mw).astype(bool)
+    return Prediction(boxes, classes, confs, masks, (oh, ow))
+
+
+class DynamicBatcher:
+    """
+    동시에 들어온 요청을 모아 한 번에 추론하는 배처.
+    첫 요청이 도착한 뒤 max_batch개가 모이거나 max_wait_ms가 지나면 배치를 실행.
+
+    Args:
+    - predict_batch: 영상 리스트를 받아 Prediction 리스트를 반환하는 함수.
+    - max_batch: 최대 배치 크기.
+    - max_wait_ms: 배치를 채우기 위해 기다리는 최대 시간.
+    """
+
+    def __init__(self, predict_batch, max_batch=8, max_wait_ms=5.0):
+        self.predict_batch = predict_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.requests = 0
+        self.batch_sizes = np.zeros(max_batch + 1, dtype=np.int64)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image):
+        """영상 하나를 배치 대기열에 넣고 Future (결과: Prediction)를 반환."""
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+
+            images, futures = zip(*batch)
+            try:
+                predictions = self.predict_batch(list(images))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, prediction in zip(futures, predictions):
+                future.set_result(prediction)
+            self.batches += 1
+            self.requests += len(batch)
+            self.batch_sizes[len(batch)] += 1
+
+    def stats(self):
+        """실행한 배치 수, 요청 수, 평균 배치 크기, 배치 크기 분포."""
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch": self.requests / self.batches if self.batches else 0.0,
+            "batch_sizes": {size: int(count) for size, count in enumerate(self.batch_sizes) if count},
+        }
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+def make_predict_batch(model, **predict_kwargs):
+    """YOLO 모델로 영상 리스트를 한 번에 추론해 Prediction 리스트를 반환하는 함수를 생성."""
+    def predict_batch(images):
+        return [prediction_from_result(r) for r in model(images, verbose=False, **predict_kwargs)]
+    return predict_batch
+
+
+def decode_raw_image(body, shape_header):
+    """
+    RAW_TYPE 본문을 (H, W, 3) uint8 BGR 영상으로 변환.
+    X-Image-Shape("H,W") 헤더가 없거나 잘못됐거나 본문 길이가 H*W*3과 다르면 None.
+    """
+    try:
+        h, w = (int(v) for v in (shape_header or "").split(","))
+    except ValueError:
+        return None
+    if h <= 0 or w <= 0 or len(body) != h * w * 3:
+        return None
+    return np.frombuffer(body, np.uint8).reshape(h, w, 3)
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /predict: 본문은 인코딩된 영상(JPEG/PNG) 또는 RAW_TYPE 원시 BGR.
+      ?format=json이면 박스와 마스크 폴리곤을 JSON으로, 기본은 BINARY_TYPE 바이너리로 응답.
+    GET /info: 모델 경로와 클래스 이름. GET /stats: 배치 통계.
+    """
+
+    protocol_version = "HTTP/1.1"  # 클라이언트가 연결을 재사용할 수 있도록
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/predict":
+            self._send(404, "text/plain", b"not found")
+            return
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Type") == RAW_TYPE:
+            image = decode_raw_image(body, self.headers.get("X-Image-Shape"))
+        else:
+            image = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            self._send(400, "text/plain", b"could not decode image")
+            return
+
+        try:
+            prediction = self.server.batcher.submit(image).result()
+        except Exception as e:
+            self._send(500, "text/plain", str(e).encode())
+            return
+
+        if parse_qs(url.query).get("format") == ["json"]:
+            record = prediction_to_record(None, prediction, self.server.names, include_masks=True)
+            self._send(200, "application/json", json.dumps(record).encode())
+        else:
+            self._send(200, BINARY_TYPE, encode_prediction(prediction))
+
+    def do_GET(self):
+        if self.path == "/info":
+            info = {"model": self.server.model_path, "names": self.server.names}
+        elif self.path == "/stats":
+            info = self.server.batcher.stats()
+        else:
+            self._send(404, "text/plain", b"not found")
+            return
+        self._send(200, "application/json", json.dumps(info).encode())
+
+    def _send(self, status, content_type, payload):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        # 헤더와 본문을 한 번에 써야 Nagle + 지연 ACK로 응답마다 약 40ms가 늘지 않음
+        self._headers_buffer.append(b"\r\n")
+        self._headers_buffer.append(payload)
+        self.flush_headers()
+
+    def log_message(self, format, *args):
+        pass  # 요청마다 로그를 찍지 않음
+
+
+# 벤치마크처럼 많은 클라이언트가 동시에 연결해도 listen 대기열(기본 5)이 넘치지 않도록
+REQUEST_QUEUE_SIZE = 64
+
+
+class InferenceHTTPServer(ThreadingHTTPServer):
+    """TCP에서 동작하는 HTTP 서버."""
+
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix 도메인 소켓에서 동작하는 HTTP 서버."""
+
+    daemon_threads = True
+    request_queue_size = REQUEST_QUEUE_SIZE
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+
+
+def make_server(address, batcher, names, model_path):
+    """
+    "host:port" 또는 "unix:///path" 주소에서 요청을 받는 서버를 생성.
+    """
+    if address.startswith("unix://"):
+        server = UnixHTTPServer(address[len("unix://"):], InferenceRequestHandler)
+    else:
+        host, port = address.rsplit(":", 1)
+        server = InferenceHTTPServer((host, int(port)), InferenceRequestHandler)
+    server.batcher = batcher
+    server.names = names
+    server.model_path = model_path
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=60.0):
+        super().__init__("localhost", timeout=timeout)
+        self._unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._unix_path)
+
+
+class InferenceClient:
+    """
+    추론 서버 클라이언트. 연결 하나를 재사용하므로 스레드마다 하나씩 생성.
+
+    Args:
+    - address: "host:port" 또는 "unix:///path".
+    """
+
+    def __init__(self, address, timeout=60.0):
+        if address.startswith("unix://"):
+            self._connection = _UnixHTTPConnection(address[len("unix://"):], timeout)
+        else:
+            host, port = address.rsplit(":", 1)
+            self._connection = http.client.HTTPConnection(host, int(port), timeout=timeout)
+
+    def _request(self, method, path, body=None, headers=None):
+        self._connection.request(method, path, body, headers or {})
+        response = self._connection.getresponse()
+        payload = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path} failed ({response.status}): {payload.decode(errors='replace')}")
+        return payload
+
+    def predict(self, image):
+        """BGR 영상(원시 전송) 또는 인코딩된 영상 bytes를 보내고 Prediction을 받음."""
+        if isinstance(image, np.ndarray):
+            headers = {"Content-Type": RAW_TYPE, "X-Image-Shape": f"{image.shape[0]},{image.shape[1]}"}
+            body = np.ascontiguousarray(image).tobytes()
+        else:
+            headers, body = {"Content-Type": "application/octet-stream"}, image
+        return decode_prediction(self._request("POST", "/predict", body, headers))
+
+    def info(self):
+        return json.loads(self._request("GET", "/info"))
+
+    def stats(self):
+        return json.loads(self._request("GET", "/stats"))
+
+    def close(self):
+        self._connection.close()
+
+
+def run_client_benchmark(address, payloads, clients, requests_per_client):
+    """
+    clients개의 스레드가 각자 연결 하나로 요청을 연속으로 보내 처리량과 지연을 측정.
+
+    Returns:
+    - summarize(지연) 결과에 "clients", "throughput"(요청/초)을 더한 dict.
+    """
+    latencies = [[] for _ in range(clients)]
+    errors = []
+    barrier = threading.Barrier(clients + 1)
+
+    def client_loop(k):
+        client = InferenceClient(address)
+        barrier.wait()
+        try:
+            for i in range(requests_per_client):
+                start = time.perf_counter()
+                client.predict(payloads[(k + i * clients) % len(payloads)])
+                latencies[k].append(time.perf_counter() - start)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            client.close()
+
+    threads = [threading.Thread(target=client_loop, args=(k,)) for k in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+
+    stats = summarize([t for samples in latencies for t in samples])
+    stats["clients"] = clients
+    stats["throughput"] = stats["count"] / elapsed
+    return stats
+
+
+def benchmark(address, image_folder, client_counts, requests_per_client):
+    """1, 4, 16 등 동시 클라이언트 수별 처리량과 꼬리 지연을 출력."""
+    names = sorted(f for f in os.listdir(image_folder) if f.lower().endswith((".png", ".jpg", ".jpeg")))
+    payloads = [open(os.path.join(image_folder, f), "rb").read() for f in names[:64]]
+    if not payloads:
+        raise SystemExit(f"No images in {image_folder}")
+
+    print(f"{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'mean batch':>12}")
+    probe = InferenceClient(address)
+    for clients in client_counts:
+        before = probe.stats()
+        stats = run_client_benchmark(address, payloads, clients, requests_per_client)
+        after = probe.stats()
+        batches = after["batches"] - before["batches"]
+        mean_batch = (after["requests"] - before["requests"]) / batches if batches else 0.0
+        print(f"{clients:>8d}{stats['throughput']:>9.1f}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}"
+              f"{stats['p99_ms']:>9.1f}{mean_batch:>12.2f}", flush=True)
+    probe.close()
+
+
+def serve(args):
+    from runtime_backend import load_model
+
+    model = load_model(args.model, args.backend, args.imgsz)
+    predict_kwargs = {"imgsz": args.imgsz}
+    if args.device is not None:
+        predict_kwargs["device"] = args.device
+    batcher = DynamicBatcher(make_predict_batch(model, **predict_kwargs), args.max_batch, args.max_wait_ms)
+    server = make_server(args.address, batcher, model.names, args.model)
+    print(f"Serving {args.model} on {args.address} (max batch {args.max_batch}, max wait {args.max_wait_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        print(json.dumps(batcher.stats()))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="가중치를 한 번만 불러 여러 도구가 공유하는 로컬 추론 서버")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="추론 서버 실행")
+    serve_parser.add_argument("--model", default="runs/segment/train2/weights/best.pt", help="YOLO 모델 경로")
+    serve_parser.add_argument("--address", default="127.0.0.1:8765", help='"host:port" 또는 "unix:///path"')
+    serve_parser.add_argument("--max-batch", type=int, default=8, help="최대 배치 크기")
+    serve_parser.add_argument("--max-wait-ms", type=float, default=5.0, help="배치를 채우기 위해 기다리는 최대 시간")
+    serve_parser.add_argument("--imgsz", type=int, default=640, help="추론 입력 크기")
+    serve_parser.add_argument("--backend", choices=["auto", "torch", "onnx", "openvino"], default="auto",
+                              help="추론 백엔드 (auto: runtime_backend.py 벤치마크로 선택된 백엔드)")
+    serve_parser.add_argument("--device", default=None, help='추론 장치 (예: "0", "cpu")')
+
+    bench_parser = subparsers.add_parser("bench", help="동시 클라이언트 수별 처리량/지연 측정")
+    bench_parser.add_argument("--address", default="127.0.0.1:8765", help='"host:port" 또는 "unix:///path"')
+    bench_parser.add_argument("--images", default="img", help="요청에 사용할 이미지 폴더")
+    bench_parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16], help="동시 클라이언트 수")
+    bench_parser.add_argument("--requests", type=int, default=50, help="클라이언트당 요청 수")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "serve":
+        serve(args)
+    else:
+        benchmark(args.address, args.images, args.clients, args.requests)
@@ -0,0 +1,154 @@
+import cv2
+import numpy as np
+from typing import NamedTuple
+
+# cv2.resize가 한 번에 처리할 수 있는 최대 채널 수
+_MAX_RESIZE_CHANNELS = 512
+
+
+class InstanceDepthStats(NamedTuple):
+    """
+    인스턴스별 마스크 내부 Depth 통계. 모두 (N,) 크기이며 유효 픽셀이 없으면 0.0.
+
+    - median: 중앙값 Depth.
+    - trimmed_mean: 위/아래 trim 비율을 제외한 평균 Depth.
+    - low, high: 하위/상위 퍼센타일 Depth (percentiles 인자).
+    - count: 마스크 내부 유효 Depth 픽셀 개수.
+    """
+    median: np.ndarray
+    trimmed_mean: np.ndarray
+    low: np.ndarray
+    high: np.ndarray
+    count: np.ndarray
+
+
+def letterbox_crop(mask_shape, orig_shape):
+    """
+    추론 입력(레터박스) 해상도 마스크에서 원본 영상에 해당하는 영역을 계산.
+
+    Args:
+    - mask_shape: 마스크 크기 (h, w).
+    - orig_shape: 원본 영상 크기 (H, W).
+
+    Returns:
+    - (top, bottom, left, right) 슬라이스 경계.
+    """
+    mh, mw = mask_shape
+    oh, ow = orig_shape
+    gain = min(mh / oh, mw / ow)
+    pad_x, pad_y = (mw - ow * gain) / 2, (mh - oh * gain) / 2
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    bottom, right = mh - int(round(pad_y + 0.1)), mw - int(round(pad_x + 0.1))
+    return top, bottom, left, right
+
+
+def masks_to_depth_resolution(masks, depth_shape):
+    """
+    YOLO 세그멘테이션 마스크를 Depth 맵 해상도로 변환.
+    추론 입력의 레터박스 패딩을 잘라낸 뒤 모든 인스턴스를 한 번의 cv2.resize로 스케일링.
+
+    Args:
+    - masks: results[0].masks (ultralytics Masks) 또는 (N, h, w) 배열.
+    - depth_shape: Depth 맵 크기 (H, W).
+
+    Returns:
+    - (N, H, W) bool 배열.
+    """
+    orig_shape = getattr(masks, "orig_shape", None)
+    data = getattr(masks, "data", masks)
+    if hasattr(data, "cpu"):
+        data = data.cpu().numpy()
+    data = np.asarray(data)
+
+    dh, dw = depth_shape
+    n, mh, mw = data.shape
+    if n == 0:
+        return np.zeros((0, dh, dw), dtype=bool)
+
+    # 레터박스 패딩 제거 (원본 영상 비율 기준)
+    top, bottom, left, right = letterbox_crop((mh, mw), orig_shape if orig_shape is not None else (dh, dw))
+    data = (data[:, top:bottom, left:right] > 0.5).view(np.uint8)
+
+    if data.shape[1:] == (dh, dw):
+        return data.astype(bool)
+
+    # (N, h, w) -> (h, w, N)로 바꿔 채널 단위로 한 번에 리사이즈
+    stacked = np.ascontiguousarray(data.transpose(1, 2, 0))
+    resized = np.empty((dh, dw, n), dtype=np.uint8)
+    for start in range(0, n, _MAX_RESIZE_CHANNELS):
+        chunk = stacked[:, :, start:start + _MAX_RESIZE_CHANNELS]
+        resized[:, :, start:start + chunk.shape[2]] = cv2.resize(
+            chunk, (dw, dh), interpolation=cv2.INTER_NEAREST).reshape(dh, dw, -1)
+    return resized.transpose(2, 0, 1).astype(bool)
+
+
+def instance_depth_stats(depth_np, masks, percentiles=(10, 90), trim=0.1, stride=1):
+    """
+    모든 인스턴스 마스크에 대해 중앙값, 절사 평균, 퍼센타일 Depth를 한 번에 계산.
+    인스턴스별 파이썬 루프 없이 인스턴스 오프셋을 더한 Depth 정렬 한 번으로 처리.
+
+    Args:
+    - depth_np: Depth 데이터 배열 (H, W).
+    - masks: Depth 해상도의 인스턴스 마스크 (N, H, W), bool.
+    - percentiles: 하위/상위 퍼센타일 (0 ~ 100).
+    - trim: 절사 평균에서 위/아래로 제외할 비율 (0 ~ 0.5).
+    - stride: 픽셀 샘플링 간격. 1이면 모든 픽셀 사용.
+
+    Returns:
+    - InstanceDepthStats.
+    """
+    n = len(masks)
+    if stride > 1:
+        masks = masks[:, ::stride, ::stride]
+        depth_np = depth_np[::stride, ::stride]
+
+    # 불리언 인덱싱 결과는 인스턴스 순서대로 이어져 있음
+    values = np.broadcast_to(depth_np, masks.shape)[masks].astype(np.float64)
+    inst = np.repeat(np.arange(n), masks.sum(axis=(1, 2)))
+    valid = np.isfinite(values) & (values > 0)
+    inst, values = inst[valid], values[valid]
+
+    # 인스턴스마다 Depth 최대값보다 큰 오프셋을 더해 한 번의 정렬로 인스턴스별 정렬을 수행
+    offset = values.max() + 1.0 if len(values) else 1.0
+    values = np.sort(values + inst * offset) - inst * offset
+    count = np.bincount(inst, minlength=n)
+    start = np.cumsum(count) - count
+    has_values = count > 0
+
+    def percentile(q):
+        pos = start + (q / 100.0) * np.maximum(count - 1, 0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        if not has_values.any():
+            return np.zeros(n)
+        lo_val = values[np.minimum(lo, len(values) - 1)]
+        hi_val = values[np.minimum(hi, len(values) - 1)]
+        return np.where(has_values, lo_val + (hi_val - lo_val) * (pos - lo), 0.0)
+
+    # 누적합으로 절사 구간의 합을 구간마다 한 번의 뺄셈으로 계산
+    cumsum = np.concatenate([[0.0], np.cumsum(values)])
+    cut = np.floor(count * trim).astype(np.int64)
+    kept = count - 2 * cut
+    trimmed_sum = cumsum[start + count - cut] - cumsum[start + cut]
+    trimmed_mean = np.where(kept > 0, trimmed_sum / np.maximum(kept, 1), 0.0)
+
+    low_q, high_q = percentiles
+    return InstanceDepthStats(percentile(50), trimmed_mean, percentile(low_q), percentile(high_q), count)
+
+
+def instance_depth_stats_from_results(results, depth_np, **kwargs):
+    """
+    YOLO 결과의 세그멘테이션 마스크로 인스턴스별 Depth 통계를 계산.
+
+    Args:
+    - results: YOLO 탐지 결과 객체.
+    - depth_np: Depth 데이터 배열 (H, W).
+    - kwargs: instance_depth_stats에 전달할 인자.
+
+    Returns:
+    - InstanceDepthStats. 마스크 출력이 없으면(탐지 없음, 비세그멘테이션 모델) None.
+    """
+    if results[0].masks is None:
+        return None
+    masks = masks_to_depth_resolution(results[0].masks, depth_np.shape)
+    return instance_depth_stats(depth_np, masks, **kwargs)
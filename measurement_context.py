@@ -0,0 +1,178 @@
+import numpy as np
+
+from depth_grid import DepthGrid
+from depth_index import build_depth_index, lookup_valid_depth_batch, search_valid_depth_batch
+from depth_stats import build_depth_integrals
+
+try:
+    import pyzed.sl as sl
+except ImportError:  # ZED SDK가 없는 환경 (녹화 재생, CI 등)
+    sl = None
+
+
+class FrameMeasurementContext:
+    """
+    프레임 단위 측정 컨텍스트.
+    Depth와 XYZ 포인트 클라우드를 grab 한 번당 최대 한 번만 가져오고,
+    Depth 인덱스/적분 영상 같은 파생 데이터도 프레임마다 한 번만 생성해 모든 추정기가 공유.
+
+    Depth를 영상보다 작은 해상도로 가져오면 grid(depth_grid.DepthGrid)를 주고,
+    get_3d_point(s)와 lookup_depths는 검출기 영상 좌표를 받아 Depth 그리드 좌표로 변환해 조회.
+
+    Args:
+    - fetch_depth: Depth 배열 (H, W)을 반환하는 함수.
+    - fetch_xyz: XYZ 포인트 클라우드 배열 (H, W, 3 이상)을 반환하는 함수.
+    - grid: 영상 좌표 -> Depth 그리드 좌표 변환. None이면 같은 해상도.
+    """
+
+    def __init__(self, fetch_depth, fetch_xyz, grid=None):
+        self._fetch_depth = fetch_depth
+        self._fetch_xyz = fetch_xyz
+        self.grid = grid
+        self.frame_count = 0
+        self.last_frame_stats = {"requests": 0, "retrieves": 0, "saved": 0}
+        self._reset()
+
+    def _reset(self):
+        self._cache = {}
+        self._requests = 0
+        self._retrieves = 0
+
+    def new_frame(self):
+        """
+        새 grab이 끝난 직후 호출. 이전 프레임의 캐시를 비우고 통계를 기록.
+
+        Returns:
+        - 이전 프레임의 통계 dict (requests, retrieves, saved).
+        """
+        if self.frame_count > 0:
+            self.last_frame_stats = self.frame_stats()
+        self.frame_count += 1
+        self._reset()
+        return self.last_frame_stats
+
+    def frame_stats(self):
+        """현재 프레임의 조회 요청 수, 실제 retrieve 수, 절약된 retrieve 수."""
+        return {
+            "requests": self._requests,
+            "retrieves": self._retrieves,
+            "saved": self._requests - self._retrieves,
+        }
+
+    def _get(self, key, build, retrieve=False):
+        if retrieve:
+            self._requests += 1
+        if key not in self._cache:
+            if retrieve:
+                self._retrieves += 1
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def depth(self):
+        """현재 프레임의 Depth 배열 (H, W)."""
+        return self._get("depth", self._fetch_depth, retrieve=True)
+
+    def xyz(self):
+        """현재 프레임의 XYZ 포인트 클라우드 (H, W, 3)."""
+        return self._get("xyz", lambda: self._fetch_xyz()[..., :3], retrieve=True)
+
+    def depth_index(self):
+        """현재 프레임의 최근접 유효 Depth 인덱스 (depth_index.DepthIndex)."""
+        return self._get("depth_index", lambda: build_depth_index(self.depth()))
+
+    def depth_integrals(self):
+        """현재 프레임의 Depth 적분 영상 (depth_stats.DepthIntegrals)."""
+        return self._get("depth_integrals", lambda: build_depth_integrals(self.depth()))
+
+    def get_3d_point(self, x, y):
+        """
+        픽셀 (x, y)의 3D 좌표를 반환. 포인트 클라우드는 프레임당 한 번만 가져옴.
+
+        Returns:
+        - (3,) 배열 (X, Y, Z).
+        """
+        xyz = self.xyz()
+        h, w = xyz.shape[:2]
+        if self.grid is not None:
+            x, y = self.grid.points([x, y]).tolist()
+        return xyz[min(max(int(y), 0), h - 1), min(max(int(x), 0), w - 1)]
+
+    def get_3d_points(self, points):
+        """
+        여러 픽셀의 3D 좌표를 한 번에 반환.
+
+        Args:
+        - points: 픽셀 좌표 (..., 2), (x, y) 순서.
+
+        Returns:
+        - (..., 3) 배열.
+        """
+        xyz = self.xyz()
+        h, w = xyz.shape[:2]
+        points = self.to_grid(points).astype(np.int64)
+        xs = np.clip(points[..., 0], 0, w - 1)
+        ys = np.clip(points[..., 1], 0, h - 1)
+        return xyz[ys, xs]
+
+    def to_grid(self, points):
+        """검출기 영상 좌표 (..., 2)를 Depth 그리드 좌표로 변환."""
+        return np.asarray(points) if self.grid is None else self.grid.points(points)
+
+    def to_grid_boxes(self, boxes):
+        """검출기 영상 좌표 박스 (N, 4)를 Depth 그리드 좌표 박스로 변환."""
+        return np.asarray(boxes) if self.grid is None else self.grid.boxes(boxes)
+
+    def lookup_depths(self, points, boxes, max_radius=20, step=2):
+        """
+        영상 좌표의 샘플 포인트와 박스로 유효 Depth를 조회.
+        이번 프레임에 Depth 인덱스를 이미 만들었으면 인덱스(depth_index.lookup_valid_depth_batch)를,
+        아니면 인덱스를 만들지 않는 창 탐색(depth_index.search_valid_depth_batch)을 사용.
+        탐색 반경과 간격은 영상 픽셀 단위로 주면 그리드 해상도에 맞게 변환.
+        """
+        if self.grid is not None:
+            max_radius, step = self.grid.pixels(max_radius), self.grid.pixels(step)
+        points, boxes = self.to_grid(points), self.to_grid_boxes(boxes)
+        if "depth_index" in self._cache:
+            return lookup_valid_depth_batch(self._cache["depth_index"], points, boxes, max_radius, step)
+        return search_valid_depth_batch(self.depth(), points, boxes, max_radius, step)
+
+
+def zed_depth_resolution(zed, depth_scale):
+    """
+    ZED 카메라 영상 해상도 기준 DepthGrid와 retrieve_measure에 넘길 sl.Resolution.
+    depth_scale이 1이면 sl.Resolution은 기본값(전체 해상도)을 의미하는 (0, 0).
+    """
+    resolution = zed.get_camera_information().camera_configuration.resolution
+    grid = DepthGrid((resolution.height, resolution.width), depth_scale)
+    return grid, sl.Resolution(0, 0) if grid.full else sl.Resolution(grid.shape[1], grid.shape[0])
+
+
+def zed_measurement_context(zed, depth_scale=1.0):
+    """
+    ZED 카메라용 FrameMeasurementContext 생성.
+    sl.Mat 버퍼를 한 번만 할당해 모든 프레임에서 재사용.
+
+    Args:
+    - zed: 열린 sl.Camera 객체.
+    - depth_scale: Depth/포인트 클라우드 해상도 배율. 1보다 작으면 SDK에서 축소된 해상도로 가져오고
+      모든 조회 좌표를 DepthGrid로 변환 (프레임당 메모리 복사량이 배율의 제곱에 비례해 줄어듦).
+
+    Returns:
+    - FrameMeasurementContext.
+    """
+    if sl is None:
+        raise ImportError("pyzed (ZED SDK) is required for zed_measurement_context")
+
+    depth_mat = sl.Mat()
+    point_cloud_mat = sl.Mat()
+    grid, resolution = zed_depth_resolution(zed, depth_scale)
+
+    def fetch_depth():
+        zed.retrieve_measure(depth_mat, sl.MEASURE.DEPTH, sl.MEM.CPU, resolution)
+        return depth_mat.get_data()
+
+    def fetch_xyz():
+        zed.retrieve_measure(point_cloud_mat, sl.MEASURE.XYZRGBA, sl.MEM.CPU, resolution)
+        return point_cloud_mat.get_data()
+
+    return FrameMeasurementContext(fetch_depth, fetch_xyz, None if grid.full else grid)
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def summarize(samples):
+    """
+    처리 시간 샘플(초)을 p50/p95/p99/평균(ms)과 처리량(fps)으로 요약.
+    """
+    if not samples:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "fps": 0.0}
+    ms = np.asarray(samples) * 1000.0
+    mean = float(ms.mean())
+    return {
+        "count": len(ms),
+        "mean_ms": mean,
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "fps": 1000.0 / mean if mean > 0 else 0.0,
+    }
+
+
+def box_iou_matrix(a, b):
+    """(N, 4), (M, 4) xyxy 박스의 IoU 행렬 (N, M)."""
+    a, b = a[:, None, :], b[None, :, :]
+    inter = (np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+             * np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None))
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+def greedy_match(iou, threshold):
+    """IoU가 큰 쌍부터 탐욕적으로 짝지음. Returns: [(행, 열), ...]."""
+    pairs, used_rows, used_cols = [], set(), set()
+    if iou.size == 0:
+        return pairs
+    for flat in np.argsort(iou, axis=None)[::-1]:
+        i, j = divmod(int(flat), iou.shape[1])
+        if iou[i, j] < threshold:
+            break
+        if i not in used_rows and j not in used_cols:
+            pairs.append((i, j))
+            used_rows.add(i)
+            used_cols.add(j)
+    return pairs
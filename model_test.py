@@ -1,20 +1,119 @@
+import os
+
 import numpy as np
 import pandas as pd
 from ultralytics import YOLO
 
-def evaluate_model_and_save_to_csv(model_path, data_yaml):
-   
+# model.val() 출력 / model_test_result.md와 같은 열 구성
+TABLE_COLUMNS = ["Class", "Images", "Instances",
+                 "Box(P", "R", "mAP50", "mAP50-95)", "Mask(P", "R", "mAP50", "mAP50-95)"]
+METRIC_KEYS = ["box_p", "box_r", "box_map50", "box_map", "mask_p", "mask_r", "mask_map50", "mask_map"]
+
+
+def resolve_data_yaml(data_yaml):
+    """
+    data.yaml의 train/val/test 경로가 이 머신에 없으면 (다른 PC의 절대 경로 등)
+    data.yaml이 있는 폴더 기준 경로로 바꾼 data.local.yaml을 만들어 그 경로를 반환.
+    """
+    import yaml
+
+    with open(data_yaml, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    root = os.path.dirname(os.path.abspath(data_yaml))
+    splits = {"train": "train", "val": "valid", "test": "test"}
+    if all(os.path.exists(str(data.get(key, ""))) for key in splits if key in data):
+        return data_yaml
+
+    data["path"] = root
+    for key, folder in splits.items():
+        if key in data:
+            data[key] = f"{folder}/images"
+    local_yaml = os.path.join(root, "data.local.yaml")
+    with open(local_yaml, "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+    return local_yaml
+
+
+def count_labels(labels_dir, num_classes):
+    """
+    YOLO 라벨 폴더에서 클래스별 이미지 수와 객체 수를 셈.
+
+    Returns:
+    - (전체 이미지 수, 클래스별 이미지 수 (num_classes,), 클래스별 객체 수 (num_classes,)).
+    """
+    images = np.zeros(num_classes, dtype=np.int64)
+    instances = np.zeros(num_classes, dtype=np.int64)
+    total = 0
+    for name in os.listdir(labels_dir):
+        if not name.endswith(".txt"):
+            continue
+        total += 1
+        with open(os.path.join(labels_dir, name), "r") as f:
+            classes = np.array([int(line.split()[0]) for line in f if line.strip()], dtype=np.int64)
+        counts = np.bincount(classes, minlength=num_classes)[:num_classes]
+        instances += counts
+        images += counts > 0
+    return total, images, instances
+
+
+def validation_rows(metrics, names, labels_dir):
+    """
+    model.val() 결과(SegmentMetrics)를 전체(all) + 클래스별 행 리스트로 변환.
+    """
+    total, images, instances = count_labels(labels_dir, len(names))
+    rows = [dict(zip(TABLE_COLUMNS[:3], ["all", total, int(instances.sum())]),
+                 **dict(zip(METRIC_KEYS, map(float, metrics.mean_results()))))]
+    for i, cls in enumerate(metrics.ap_class_index):
+        cls = int(cls)
+        rows.append(dict(zip(TABLE_COLUMNS[:3], [names[cls], int(images[cls]), int(instances[cls])]),
+                         **dict(zip(METRIC_KEYS, map(float, metrics.class_result(i))))))
+    return rows
+
+
+def format_validation_table(rows):
+    """validation_rows 결과를 model.val() 출력과 같은 고정 폭 표로 변환."""
+    lines = ["".join(f"{name:>15}" if k == 0 else f"{name:>11}" for k, name in enumerate(TABLE_COLUMNS))]
+    for row in rows:
+        values = [f"{row['Class']:>15}", f"{row['Images']:>11}", f"{row['Instances']:>11}"]
+        values += [f"{row[key]:>11.3g}" for key in METRIC_KEYS]
+        lines.append("".join(values))
+    return "\n".join(lines)
+
+
+def evaluate_model_and_save_to_csv(model_path, data_yaml, csv_path=None, **val_kwargs):
+    """
+    검증 데이터셋으로 모델을 평가하고 클래스별 결과를 CSV로 저장.
+
+    Args:
+    - model_path: YOLO 모델 경로 (.pt, .onnx 또는 OpenVINO 폴더).
+    - data_yaml: 데이터셋 YAML 경로.
+    - csv_path: 저장할 CSV 경로. None이면 "<모델 이름>_val.csv".
+    - val_kwargs: model.val()에 전달할 인자 (batch, device, imgsz 등).
+
+    Returns:
+    - (클래스별 결과 행 리스트, 이미지당 처리 시간 dict (preprocess/inference/postprocess, ms)).
+    """
     # YOLO 모델 로드
-    model = YOLO(model_path)
+    model = YOLO(model_path, task="segment")
 
     # 검증 데이터셋 평가
-    results = model.val(data=data_yaml)
+    data_yaml = resolve_data_yaml(data_yaml)
+    results = model.val(data=data_yaml, **val_kwargs)
+
+    # 클래스별 결과를 CSV로 저장
+    labels_dir = os.path.join(os.path.dirname(os.path.abspath(data_yaml)), "valid", "labels")
+    rows = validation_rows(results, model.names, labels_dir)
+    if csv_path is None:
+        csv_path = f"{os.path.splitext(os.path.basename(os.path.normpath(model_path)))[0]}_val.csv"
+    pd.DataFrame(rows).to_csv(csv_path, index=False)
+    return rows, dict(results.speed)
 
-   
 
-# 모델 경로와 데이터셋 경로 설정
-model_path = "customtrain.pt"  # YOLO 모델 경로
-data_yaml = "yolo_env_detection_ver3-4/data.yaml"  # 데이터셋 YAML 경로
+if __name__ == "__main__":
+    # 모델 경로와 데이터셋 경로 설정
+    model_path = "customtrain.pt"  # YOLO 모델 경로
+    data_yaml = "yolo_env_detection_ver3-4/data.yaml"  # 데이터셋 YAML 경로
 
-# 검증 실행 및 결과 저장
-evaluate_model_and_save_to_csv(model_path, data_yaml)
+    # 검증 실행 및 결과 저장
+    rows, _ = evaluate_model_and_save_to_csv(model_path, data_yaml)
+    print(format_validation_table(rows))
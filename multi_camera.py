@@ -0,0 +1,223 @@
+import argparse
+import multiprocessing as mp
+import queue
+import threading
+import time
+
+from detection_stream import BINARY, NDJSON, DetectionPublisher, open_stream_sink
+from frame_source import open_frame_source
+from shm_ring import FrameRing
+from zed_yolo_multiprocess import measure_prediction
+
+# 소스별 공유 카운터 필드 (multiprocessing.Array, 소스마다 _FIELDS개)
+_INFERRED, _SKIPPED, _LAST_SEQ, _PUBLISHED, _LATENCY_P95, _DONE = range(6)
+_FIELDS = 6
+# 전체 카운터 (소스 카운터 뒤에 위치)
+_BATCHES, _BATCHED_FRAMES = range(2)
+
+
+def source_main(index, spec, realtime, slots, lock, stop, info_queue, result_queue, counters, publish, fmt):
+    """
+    소스 프로세스 하나: 캡처 스레드가 프레임을 이 소스의 링에 쓰고,
+    메인 스레드는 공유 추론 워커가 돌려준 결과로 Depth 측정 후 스트림으로 출력.
+    """
+    frame_source = open_frame_source(spec, realtime=realtime)
+    grabbed_at = time.monotonic()
+    first = frame_source.read()
+    if first is None:
+        info_queue.put((index, None))
+        frame_source.close()
+        return
+
+    ring = FrameRing.create(lock, slots, first.depth.shape, channels=first.bgr.shape[2])
+    info_queue.put((index, ring.name))
+    fx, fy = frame_source.calibration.fx, frame_source.calibration.fy
+    base = index * _FIELDS
+
+    def capture():
+        frame, grab_start = first, grabbed_at
+        while frame is not None and not stop.is_set():
+            ring.write(frame.frame_id, frame.timestamp, frame.bgr, frame.depth, grab_start)
+            grab_start = time.monotonic()
+            frame = frame_source.read()
+        counters[base + _DONE] = 1.0
+
+    capture_thread = threading.Thread(target=capture, name=f"capture-{index}", daemon=True)
+    capture_thread.start()
+
+    publisher = None
+    try:
+        _, names = result_queue.get()
+        publisher = DetectionPublisher(open_stream_sink(publish.format(source=index)), names, fmt)
+        while not stop.is_set():
+            try:
+                seq, prediction = result_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            frame = ring.get(seq)
+            if frame is None:
+                continue
+            boxes, depth_values, sizes = measure_prediction(prediction, frame.depth, fx, fy)
+            grab_time = time.perf_counter() - (time.monotonic() - frame.grabbed_at)
+            publisher.publish(frame.frame_id, frame.timestamp, grab_time, boxes, prediction.classes,
+                              prediction.confs, depth_values, sizes)
+            del frame
+            ring.release(seq)
+            counters[base + _PUBLISHED] = publisher.published
+            counters[base + _LATENCY_P95] = publisher.stats()["latency_p95_ms"]
+    finally:
+        capture_thread.join(timeout=1.0)
+        frame_source.close()
+        if publisher is not None:
+            publisher.close()
+        ring.close()
+
+
+def inference_main(ring_names, lock, stop, model_path, result_queues, counters, max_wait_ms, poll=0.0005):
+    """
+    공유 추론 워커: 모든 소스 링에서 새 프레임을 모아 한 번에 배치 추론하고, 결과를 소스별 큐로 돌려줌.
+
+    첫 프레임이 들어온 뒤 최대 max_wait_ms 동안 다른 소스의 프레임을 기다려 배치를 채움.
+    소스의 결과 큐가 가득 차 있으면(측정이 밀림) 그 결과는 버리고 슬롯을 놓아줌.
+    """
+    from inference_cache import prediction_from_result
+    from runtime_backend import load_model
+
+    rings = [FrameRing.attach(name, lock) for name in ring_names]
+    model = load_model(model_path)
+    for result_queue in result_queues:
+        result_queue.put(("names", model.names))
+
+    last_seqs = [-1] * len(rings)
+    totals = len(rings) * _FIELDS
+    try:
+        while not stop.is_set():
+            batch = {}
+            deadline = None
+            while len(batch) < len(rings) and not stop.is_set():
+                for i, ring in enumerate(rings):
+                    if i not in batch:
+                        frame = ring.acquire(last_seqs[i])
+                        if frame is not None:
+                            batch[i] = frame
+                if batch and deadline is None:
+                    deadline = time.monotonic() + max_wait_ms / 1000.0
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                if len(batch) < len(rings):
+                    time.sleep(poll)
+            if not batch:
+                continue
+
+            sources = sorted(batch)
+            results = model([batch[i].color for i in sources], verbose=False)
+            counters[totals + _BATCHES] += 1
+            counters[totals + _BATCHED_FRAMES] += len(sources)
+
+            for i, result in zip(sources, results):
+                seq = batch[i].seq
+                last_seqs[i] = seq
+                counters[i * _FIELDS + _LAST_SEQ] = seq
+                try:
+                    result_queues[i].put_nowait((seq, prediction_from_result(result)))
+                    counters[i * _FIELDS + _INFERRED] += 1
+                except queue.Full:
+                    rings[i].release(seq)
+                    counters[i * _FIELDS + _SKIPPED] += 1
+            batch = None
+    finally:
+        for ring in rings:
+            ring.close()
+
+
+def print_source_table(specs, rings, result_queues, counters, previous, elapsed):
+    """소스별 캡처/추론/출력 fps, 큐 길이, 링 상태를 표로 출력."""
+    totals = len(specs) * _FIELDS
+    batches = counters[totals + _BATCHES]
+    mean_batch = counters[totals + _BATCHED_FRAMES] / batches if batches else 0.0
+    print(f"{'source':<24}{'cap fps':>8}{'inf fps':>8}{'pub fps':>8}{'pending':>8}{'queue':>6}"
+          f"{'held':>5}{'drop':>6}{'skip':>6}{'p95 ms':>8}")
+    for i, spec in enumerate(specs):
+        base = i * _FIELDS
+        ring_stats = rings[i].stats()
+        current = (ring_stats["written"], counters[base + _INFERRED], counters[base + _PUBLISHED])
+        fps = [(c - p) / elapsed for c, p in zip(current, previous[i])]
+        previous[i] = current
+        pending = rings[i].latest_seq() - int(counters[base + _LAST_SEQ])
+        done = " (done)" if counters[base + _DONE] else ""
+        print(f"{(spec + done)[:23]:<24}{fps[0]:>8.1f}{fps[1]:>8.1f}{fps[2]:>8.1f}{pending:>8d}"
+              f"{result_queues[i].qsize():>6d}{ring_stats['held']:>5d}{ring_stats['dropped']:>6d}"
+              f"{int(counters[base + _SKIPPED]):>6d}{counters[base + _LATENCY_P95]:>8.1f}")
+    print(f"inference batches={int(batches)} mean batch={mean_batch:.2f}", flush=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="여러 카메라/녹화를 하나의 공유 추론 워커로 처리")
+    parser.add_argument("sources", nargs="+",
+                        help='소스 목록: "zed", "zed:<시리얼>", "synthetic[:seed]" 또는 녹화 폴더 경로')
+    parser.add_argument("--model", default="customtrain.pt", help="YOLO 모델 경로")
+    parser.add_argument("--fast", action="store_true", help="녹화를 원래 속도 대신 최대 속도로 재생")
+    parser.add_argument("--slots", type=int, default=4, help="소스별 공유 메모리 링 슬롯 수")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="배치를 채우기 위해 기다리는 최대 시간")
+    parser.add_argument("--publish", default="detections_{source}.ndjson",
+                        help='소스별 출력 ({source}는 소스 번호로 바뀜). 예: "udp://127.0.0.1:900{source}"')
+    parser.add_argument("--format", choices=[NDJSON, BINARY], default=NDJSON, help="출력 형식")
+    parser.add_argument("--stats-interval", type=float, default=2.0, help="소스별 통계 출력 간격 (초)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    ctx = mp.get_context("spawn")
+    lock, stop = ctx.Lock(), ctx.Event()
+    info_queue = ctx.Queue()
+    result_queues = [ctx.Queue(maxsize=1) for _ in args.sources]
+    counters = ctx.Array("d", len(args.sources) * _FIELDS + 2, lock=False)
+
+    sources = [
+        ctx.Process(target=source_main, name=f"source-{i}",
+                    args=(i, spec, not args.fast, args.slots, lock, stop, info_queue, result_queues[i], counters,
+                          args.publish, args.format))
+        for i, spec in enumerate(args.sources)
+    ]
+    for process in sources:
+        process.start()
+
+    ring_names = [None] * len(args.sources)
+    for _ in args.sources:
+        index, name = info_queue.get(timeout=60)
+        if name is None:
+            stop.set()
+            raise RuntimeError(f"Source '{args.sources[index]}' produced no frames")
+        ring_names[index] = name
+
+    worker = ctx.Process(target=inference_main, name="inference",
+                         args=(ring_names, lock, stop, args.model, result_queues, counters, args.max_wait_ms))
+    worker.start()
+
+    rings = [FrameRing.attach(name, lock) for name in ring_names]
+    previous = [(0, 0, 0) for _ in args.sources]
+    print(f"{len(args.sources)} sources, one shared inference worker. Press Ctrl+C to quit.")
+    try:
+        last = time.monotonic()
+        while worker.is_alive() and any(p.is_alive() for p in sources):
+            time.sleep(args.stats_interval)
+            now = time.monotonic()
+            print_source_table(args.sources, rings, result_queues, counters, previous, now - last)
+            last = now
+            if all(counters[i * _FIELDS + _DONE] for i in range(len(args.sources))):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for ring in rings:
+            ring.close()
+        for process in [worker] + sources:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+import argparse
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from mask_depth import letterbox_crop
+
+
+class ObjectExtents(NamedTuple):
+    """
+    인스턴스 마스크 아래 3D 점들로 구한 객체별 방향 바운딩 박스. 모두 객체 수 N 기준.
+
+    - dims: (N, 3) float32, PCA 주축 방향 길이/너비/높이 (m, 큰 순서). 계산하지 못했으면 0.
+      카메라가 보는 겉면만 사용하므로 높이(두께)는 실제보다 작게 나올 수 있음.
+    - axes: (N, 3, 3) float32, dims 순서의 주축 단위 벡터 (행 단위).
+    - centroids: (N, 3) float32, 점들의 중심 XYZ.
+    - areas: (N,) float32, 카메라 방향 투영 넓이 (m^2). 마스크 픽셀별 Z^2 / (fx * fy)의 합.
+    - counts: (N,) int32, PCA에 사용한 점 개수.
+    - done: (N,) bool, 시간 예산 안에서 계산했으면 True.
+    """
+    dims: np.ndarray
+    axes: np.ndarray
+    centroids: np.ndarray
+    areas: np.ndarray
+    counts: np.ndarray
+    done: np.ndarray
+
+
+def empty_extents(n):
+    """계산하지 않은 상태(모두 0)의 ObjectExtents."""
+    return ObjectExtents(np.zeros((n, 3), dtype=np.float32), np.zeros((n, 3, 3), dtype=np.float32),
+                         np.zeros((n, 3), dtype=np.float32), np.zeros(n, dtype=np.float32),
+                         np.zeros(n, dtype=np.int32), np.zeros(n, dtype=bool))
+
+
+def mask_samples(masks, orig_shape, grid_shape, stride=2):
+    """
+    인스턴스 마스크를 stride 간격으로 샘플링해 포인트 클라우드(그리드) 좌표로 변환.
+    마스크 전체를 리사이즈하지 않고 샘플 좌표만 스케일링.
+
+    Args:
+    - masks: (N, h, w) 마스크. 추론 입력(레터박스) 해상도.
+    - orig_shape: 원본 영상 크기 (H, W).
+    - grid_shape: 포인트 클라우드 크기 (H, W).
+    - stride: 마스크 픽셀 샘플 간격.
+
+    Returns:
+    - (objects, ys, xs, weight). objects는 객체 순서로 정렬된 (M,) 객체 번호,
+      ys, xs는 그리드 좌표, weight는 샘플 하나가 대표하는 그리드 픽셀 수.
+    """
+    data = getattr(masks, "data", masks)
+    if hasattr(data, "cpu"):
+        data = data.cpu().numpy()
+    data = np.asarray(data)
+    mh, mw = data.shape[1:]
+    gh, gw = grid_shape
+    top, bottom, left, right = letterbox_crop((mh, mw), orig_shape)
+    view = data[:, top:bottom:stride, left:right:stride]
+    objects, ys, xs = np.nonzero(view if view.dtype == bool else view > 0.5)
+
+    scale_y, scale_x = gh / (bottom - top), gw / (right - left)
+    ys = np.minimum(((ys * stride + stride / 2) * scale_y).astype(np.intp), gh - 1)
+    xs = np.minimum(((xs * stride + stride / 2) * scale_x).astype(np.intp), gw - 1)
+    return objects, ys, xs, stride * stride * scale_y * scale_x
+
+
+def voxel_downsample(objects, points, voxel_size):
+    """
+    객체별 복셀 격자에서 복셀당 점 하나만 남김. 가까운 면에 점이 몰리는 것을 줄여 PCA 방향을 안정화.
+
+    Returns:
+    - 남길 점의 인덱스 (객체 순서 유지).
+    """
+    cells = np.clip(np.floor(points / voxel_size), -(1 << 15), (1 << 15) - 1).astype(np.int64) + (1 << 15)
+    keys = (objects.astype(np.int64) << 48) | (cells[:, 0] << 32) | (cells[:, 1] << 16) | cells[:, 2]
+    _, keep = np.unique(keys, return_index=True)
+    return keep
+
+
+def stride_cap(objects, n, max_points):
+    """
+    객체별 점 개수가 max_points를 넘지 않도록 객체마다 다른 간격으로 균일하게 솎아냄.
+
+    Args:
+    - objects: 객체 순서로 정렬된 (M,) 객체 번호.
+
+    Returns:
+    - 남길 점의 bool 마스크 (M,).
+    """
+    counts = np.bincount(objects, minlength=n)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    steps = np.maximum(-(-counts // max_points), 1)
+    ranks = np.arange(len(objects)) - starts[objects]
+    return ranks % steps[objects] == 0
+
+
+def oriented_boxes(objects, points, n, trim=0.02, min_points=10):
+    """
+    객체별 점들로 PCA 방향 바운딩 박스를 계산. 객체들을 (n, K, 3) 배열에 모아 한 번에 처리.
+
+    Args:
+    - objects: 객체 순서로 정렬된 (M,) 객체 번호.
+    - points: (M, 3) XYZ.
+    - trim: 각 축 양끝에서 버릴 비율 (마스크 경계의 배경 점 등 이상치 제거).
+    - min_points: 이보다 점이 적은 객체는 계산하지 않음.
+
+    Returns:
+    - (dims (n, 3), axes (n, 3, 3), centroids (n, 3), counts (n,)). 계산하지 못한 객체는 0.
+    """
+    dims = np.zeros((n, 3), dtype=np.float32)
+    axes = np.zeros((n, 3, 3), dtype=np.float32)
+    centroids = np.zeros((n, 3), dtype=np.float32)
+    counts = np.bincount(objects, minlength=n).astype(np.int32)
+    valid = counts >= min_points
+    if not valid.any():
+        return dims, axes, centroids, counts
+
+    keep = valid[objects]
+    objects, points = objects[keep], points[keep]
+    rows = np.cumsum(valid) - 1  # 객체 번호 -> 유효 객체 행
+    starts = np.concatenate([[0], np.cumsum(counts[valid])[:-1]])
+    slots = np.arange(len(objects)) - starts[rows[objects]]
+    m, k = int(valid.sum()), int(counts.max())
+
+    # 점 개수가 다른 객체들을 NaN으로 채운 (m, K, 3) 배열로 모음
+    padded = np.full((m, k, 3), np.nan, dtype=np.float32)
+    padded[rows[objects], slots] = points
+    count = counts[valid].astype(np.float32)
+    center = np.nansum(padded, axis=1) / count[:, None]
+    centered = padded - center[:, None, :]
+    filled = np.nan_to_num(centered)
+    cov = np.einsum("nki,nkj->nij", filled, filled) / np.maximum(count - 1, 1)[:, None, None]
+    _, vectors = np.linalg.eigh(cov)  # 열이 고유벡터 (분산 오름차순)
+
+    # 주축에 투영해 축별로 정렬한 뒤 trim 퍼센타일 사이 폭을 크기로 사용 (NaN은 정렬 시 뒤로 감)
+    projected = np.sort(np.einsum("nki,nij->nkj", centered, vectors), axis=1)
+    low = np.floor(trim * (count - 1)).astype(np.intp)
+    high = np.ceil((1.0 - trim) * (count - 1)).astype(np.intp)
+    lengths = (np.take_along_axis(projected, high[:, None, None].repeat(3, axis=2), axis=1)
+               - np.take_along_axis(projected, low[:, None, None].repeat(3, axis=2), axis=1))[:, 0]
+
+    order = np.argsort(-lengths, axis=1)
+    dims[valid] = np.take_along_axis(lengths, order, axis=1)
+    axes[valid] = np.take_along_axis(vectors.transpose(0, 2, 1), order[:, :, None], axis=1)
+    centroids[valid] = center
+    return dims, axes, centroids, counts
+
+
+class ObjectExtentEstimator:
+    """
+    프레임 포인트 클라우드 하나에서 인스턴스 마스크 아래의 3D 점을 모아 객체별 방향 바운딩 박스와
+    투영 넓이를 계산. 바운딩 박스 모서리 두 점만 쓰는 방식과 달리 회전하거나 일부 가려진 돌에도 맞는 크기를 줌.
+
+    객체당 점 개수는 stride 샘플링, 복셀 격자, max_points 상한으로 제한하고,
+    객체를 chunk개씩 묶어 배열 연산으로 처리. budget_ms를 넘길 것으로 예상되면 남은 객체는 건너뜀
+    (done=False, 호출하는 쪽에서 모서리 방식 등으로 대체). 첫 묶음은 항상 계산.
+
+    Args:
+    - fx, fy: 포인트 클라우드 해상도 기준 초점 거리 (픽셀). 투영 넓이에 사용.
+    - max_points: 객체당 최대 점 개수.
+    - stride: 마스크 픽셀 샘플 간격.
+    - voxel_size: 복셀 크기 (m). 0이면 복셀 다운샘플링을 하지 않음.
+    - trim: 축 양끝에서 버릴 점 비율.
+    - budget_ms: 프레임당 시간 예산 (ms). None이면 제한 없음.
+    - chunk: 한 번에 처리할 객체 수.
+    - min_points: 크기를 계산할 최소 점 개수.
+    """
+
+    def __init__(self, fx, fy, max_points=256, stride=2, voxel_size=0.0, trim=0.02, budget_ms=None,
+                 chunk=8, min_points=10):
+        self.fx, self.fy = fx, fy
+        self.max_points = max_points
+        self.stride = stride
+        self.voxel_size = voxel_size
+        self.trim = trim
+        self.budget_ms = budget_ms
+        self.chunk = chunk
+        self.min_points = min_points
+        self.frames = 0
+        self.objects = 0
+        self.skipped = 0
+        self.elapsed = 0.0
+
+    def _estimate_chunk(self, masks, orig_shape, xyz):
+        n = len(masks)
+        objects, ys, xs, weight = mask_samples(masks, orig_shape, xyz.shape[:2], self.stride)
+        points = xyz[ys, xs]
+        finite = np.isfinite(points).all(axis=1)
+
+        # 투영 넓이: 유효 점의 평균 Z^2 x 마스크 전체 픽셀 수 / (fx * fy)
+        mask_pixels = np.bincount(objects, minlength=n) * weight
+        objects, points = objects[finite], points[finite]
+        found = np.bincount(objects, minlength=n)
+        z2 = np.bincount(objects, weights=points[:, 2].astype(np.float64) ** 2, minlength=n)
+        areas = np.where(found > 0, z2 / np.maximum(found, 1) * mask_pixels / (self.fx * self.fy), 0.0)
+
+        if self.voxel_size > 0:
+            keep = voxel_downsample(objects, points, self.voxel_size)
+            objects, points = objects[keep], points[keep]
+        if self.max_points:
+            keep = stride_cap(objects, n, self.max_points)
+            objects, points = objects[keep], points[keep]
+        dims, axes, centroids, counts = oriented_boxes(objects, points, n, self.trim, self.min_points)
+        return dims, axes, centroids, areas.astype(np.float32), counts
+
+    def estimate(self, masks, orig_shape, context, order=None):
+        """
+        Args:
+        - masks: (N, h, w) 인스턴스 마스크 (DetectionFrame.masks). 추론 입력 해상도.
+        - orig_shape: 원본 영상 크기 (H, W).
+        - context: measurement_context.FrameMeasurementContext (포인트 클라우드는 프레임당 한 번만 가져옴).
+        - order: 처리 우선순위 인덱스 (예: 신뢰도 내림차순). 없으면 탐지 순서.
+
+        Returns:
+        - ObjectExtents.
+        """
+        start = time.perf_counter()
+        n = 0 if masks is None else len(masks)
+        extents = empty_extents(n)
+        if n == 0:
+            return extents
+
+        xyz = context.xyz()
+        order = np.arange(n) if order is None else np.asarray(order)
+        budget = None if self.budget_ms is None else self.budget_ms / 1000.0
+        done = 0
+        while done < n:
+            index = order[done:done + self.chunk]
+            elapsed = time.perf_counter() - start
+            # 지금까지의 객체당 처리 시간으로 다음 묶음이 예산을 넘을지 예상
+            if done and budget is not None and elapsed + elapsed / done * len(index) > budget:
+                break
+            dims, axes, centroids, areas, counts = self._estimate_chunk(masks[index], orig_shape, xyz)
+            extents.dims[index] = dims
+            extents.axes[index] = axes
+            extents.centroids[index] = centroids
+            extents.areas[index] = areas
+            extents.counts[index] = counts
+            extents.done[index] = True
+            done += len(index)
+
+        self.frames += 1
+        self.objects += n
+        self.skipped += n - done
+        self.elapsed += time.perf_counter() - start
+        return extents
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "objects": self.objects,
+            "skipped": self.skipped,
+            "ms_per_frame": self.elapsed * 1000.0 / max(self.frames, 1),
+        }
+
+
+def format_extent_stats(stats):
+    """ObjectExtentEstimator.stats()를 한 줄 문자열로."""
+    return (f"Object extents: {stats['objects'] - stats['skipped']}/{stats['objects']} objects "
+            f"in {stats['ms_per_frame']:.2f} ms/frame (skipped {stats['skipped']} over budget)")
+
+
+def synthetic_masks(frame_source, imgsz=640):
+    """
+    SyntheticFrameSource의 마지막 프레임 돌 박스에 내접하는 타원 마스크 (N, h, w).
+    YOLO 출력처럼 imgsz 레터박스 해상도(32 배수 패딩)로 그림.
+    """
+    import cv2
+
+    height, width = frame_source.height, frame_source.width
+    gain = min(imgsz / height, imgsz / width)
+    h, w = int(np.ceil(height * gain / 32) * 32), int(np.ceil(width * gain / 32) * 32)
+    pad_x, pad_y = (w - width * gain) / 2, (h - height * gain) / 2
+
+    boxes = frame_source.objects * gain + [pad_x, pad_y, pad_x, pad_y]
+    masks = np.zeros((len(boxes), h, w), dtype=np.uint8)
+    for mask, (x1, y1, x2, y2) in zip(masks, boxes.round().astype(int).tolist()):
+        cv2.ellipse(mask, ((x1 + x2) // 2, (y1 + y2) // 2), ((x2 - x1) // 2, (y2 - y1) // 2), 0, 0, 360, 1, -1)
+    return masks.view(bool)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="마스크 포인트 클라우드 기반 3D 크기 추정의 속도/오차 비교 (합성 소스)")
+    parser.add_argument("--frames", type=int, default=30, help="사용할 프레임 수")
+    parser.add_argument("--objects", type=int, default=16, help="프레임당 객체 수")
+    parser.add_argument("--max-points", default="64,256,1024", help="비교할 객체당 최대 점 개수 (쉼표 구분)")
+    parser.add_argument("--voxel-size", type=float, default=0.0, help="복셀 크기 (m)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="프레임당 시간 예산 (ms)")
+    return parser.parse_args()
+
+
+def main():
+    from metrics import summarize
+    from frame_source import SyntheticFrameSource, depth_to_xyz
+    from measurement_context import FrameMeasurementContext
+    from size_estimation import POINT_CLOUD, SizeEstimator
+
+    args = parse_args()
+    frame_source = SyntheticFrameSource(num_frames=args.frames, num_objects=args.objects)
+    calibration = frame_source.calibration
+    frames = []
+    for frame in frame_source:
+        frames.append((frame.depth, synthetic_masks(frame_source), frame_source.objects.copy()))
+
+    def contexts():
+        for depth, masks, boxes in frames:
+            xyz = depth_to_xyz(depth, calibration)
+            yield FrameMeasurementContext(lambda: depth, lambda xyz=xyz: xyz), masks, boxes, depth.shape
+
+    # 기준값: 모든 마스크 픽셀 사용
+    reference = ObjectExtentEstimator(calibration.fx, calibration.fy, max_points=0, stride=1)
+    truth = [reference.estimate(masks, shape, context) for context, masks, _, shape in contexts()]
+
+    def error(results):
+        diffs = [np.abs(r.dims[:, :2] - t.dims[:, :2])[r.done & (t.counts > 0)] for r, t in zip(results, truth)]
+        return float(np.concatenate(diffs).mean())
+
+    print(f"{'method':<22}{'p50 ms':>9}{'p95 ms':>9}{'done':>8}{'L/W err (m)':>13}")
+    corners = SizeEstimator(1.0, 1.0, (POINT_CLOUD,))
+    samples, results = [], []
+    for context, masks, boxes, _ in contexts():
+        start = time.perf_counter()
+        _, sizes = corners.estimate(boxes, context)
+        samples.append(time.perf_counter() - start)
+        # 모서리 방식은 축 방향 가로/세로이므로 큰 값을 길이로 맞춰 비교
+        dims = np.zeros((len(boxes), 3), dtype=np.float32)
+        dims[:, :2] = -np.sort(-sizes[:, 0], axis=1)
+        results.append(empty_extents(len(boxes))._replace(dims=dims, done=np.ones(len(boxes), dtype=bool)))
+    latency = summarize(samples)
+    print(f"{'bbox corners':<22}{latency['p50_ms']:>9.2f}{latency['p95_ms']:>9.2f}{1.0:>8.2f}{error(results):>13.4f}")
+
+    for max_points in [int(v) for v in args.max_points.split(",") if v]:
+        estimator = ObjectExtentEstimator(calibration.fx, calibration.fy, max_points=max_points,
+                                          voxel_size=args.voxel_size, budget_ms=args.budget_ms)
+        samples, results = [], []
+        for context, masks, _, shape in contexts():
+            start = time.perf_counter()
+            results.append(estimator.estimate(masks, shape, context))
+            samples.append(time.perf_counter() - start)
+        latency, stats = summarize(samples), estimator.stats()
+        done = 1.0 - stats["skipped"] / max(stats["objects"], 1)
+        print(f"{f'pca max_points={max_points}':<22}{latency['p50_ms']:>9.2f}{latency['p95_ms']:>9.2f}"
+              f"{done:>8.2f}{error(results):>13.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from inference_cache import InferenceCache, prediction_from_result
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def iter_image_paths(folders, extensions=IMAGE_EXTENSIONS):
+    """
+    폴더(하위 폴더 포함)의 이미지 경로를 하나씩 반환. 전체 목록을 메모리에 올리지 않음.
+
+    Args:
+    - folders: 폴더 또는 이미지 파일 경로 리스트.
+    - extensions: 이미지 확장자.
+    """
+    for folder in folders:
+        if os.path.isfile(folder):
+            yield folder
+            continue
+        stack = [folder]
+        while stack:
+            current = stack.pop()
+            with os.scandir(current) as entries:
+                entries = sorted(entries, key=lambda e: e.name)
+            # 하위 폴더는 이름 순서대로 방문
+            stack.extend(e.path for e in reversed(entries) if e.is_dir())
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(extensions):
+                    yield entry.path
+
+
+def prefetch_decode(paths, num_workers=4, prefetch=16, load=cv2.imread):
+    """
+    스레드 풀에서 이미지를 미리 디코딩하면서 입력 순서대로 반환.
+    최대 prefetch 장만 메모리에 유지.
+
+    Args:
+    - load: 경로 하나를 읽는 함수 (기본: cv2.imread).
+
+    Yields:
+    - (path, load(path)). cv2.imread가 디코딩에 실패하면 image는 None.
+    """
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        pending = deque()
+        for path in paths:
+            pending.append((path, executor.submit(load, path)))
+            if len(pending) >= prefetch:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
+
+
+def batched(items, batch_size):
+    """반복자를 batch_size 크기의 리스트로 묶어 반환."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def mask_polygons(masks, orig_shape):
+    """
+    추론 해상도의 인스턴스 마스크에서 가장 큰 외곽선을 찾아 원본 영상 좌표 폴리곤으로 변환.
+
+    Args:
+    - masks: (N, h, w) bool 배열 (레터박스 포함).
+    - orig_shape: 원본 영상 크기 (H, W).
+
+    Returns:
+    - (K, 2) float32 배열 N개의 리스트. 마스크가 비어 있으면 (0, 2).
+    """
+    oh, ow = orig_shape
+    _, mh, mw = masks.shape
+    gain = min(mh / oh, mw / ow)
+    pad = np.array([(mw - ow * gain) / 2, (mh - oh * gain) / 2], dtype=np.float32)
+
+    polygons = []
+    for mask in masks:
+        contours, _ = cv2.findContours(mask.view(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            polygons.append(np.zeros((0, 2), dtype=np.float32))
+            continue
+        contour = max(contours, key=len).reshape(-1, 2).astype(np.float32)
+        contour = (contour - pad) / gain
+        contour[:, 0] = contour[:, 0].clip(0, ow)
+        contour[:, 1] = contour[:, 1].clip(0, oh)
+        polygons.append(contour)
+    return polygons
+
+
+def prediction_to_record(path, prediction, model_names, include_masks=False):
+    """
+    Prediction 하나를 JSON으로 저장할 수 있는 dict로 변환.
+
+    Returns:
+    - {"image", "width", "height", "detections": [{"class_id", "class", "conf", "bbox", ("polygon")}]}
+    """
+    h, w = prediction.orig_shape
+    xyxy = prediction.boxes.round(1).tolist()
+    classes = prediction.classes.astype(int).tolist()
+    confs = prediction.confs.round(4).tolist()
+    polygons = None
+    if include_masks and prediction.masks is not None:
+        polygons = mask_polygons(prediction.masks, prediction.orig_shape)
+
+    detections = []
+    for i, (bbox, cls, conf) in enumerate(zip(xyxy, classes, confs)):
+        detection = {"class_id": cls, "class": model_names[cls], "conf": conf, "bbox": bbox}
+        if polygons is not None:
+            detection["polygon"] = np.round(polygons[i]).astype(int).ravel().tolist()
+        detections.append(detection)
+    return {"image": path, "width": w, "height": h, "detections": detections}
+
+
+def result_to_record(path, result, model_names, include_masks=False):
+    """YOLO 결과 하나를 JSON으로 저장할 수 있는 dict로 변환 (prediction_to_record 참고)."""
+    return prediction_to_record(path, prediction_from_result(result), model_names, include_masks)
+
+
+class JsonlSink:
+    """이미지 한 장당 한 줄씩 JSON을 바로 기록하는 출력."""
+
+    def __init__(self, path):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """
+    탐지 한 개당 한 행으로 Parquet에 기록하는 출력.
+    rows_per_group 행마다 row group으로 기록해 메모리 사용량을 일정하게 유지.
+    """
+
+    def __init__(self, path, rows_per_group=10000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("pyarrow is required for Parquet output (pip install pyarrow)") from e
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ("image", pa.string()), ("width", pa.int32()), ("height", pa.int32()),
+            ("class_id", pa.int32()), ("class", pa.string()), ("conf", pa.float32()),
+            ("x1", pa.float32()), ("y1", pa.float32()), ("x2", pa.float32()), ("y2", pa.float32()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows = []
+        self._rows_per_group = rows_per_group
+
+    def write(self, record):
+        for d in record["detections"]:
+            x1, y1, x2, y2 = d["bbox"]
+            self._rows.append((record["image"], record["width"], record["height"],
+                               d["class_id"], d["class"], d["conf"], x1, y1, x2, y2))
+        if len(self._rows) >= self._rows_per_group:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        columns = list(zip(*self._rows))
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(col, type=field.type) for col, field in zip(columns, self._schema)],
+            schema=self._schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_sink(path):
+    """확장자에 따라 JSONL(.jsonl) 또는 Parquet(.parquet) 출력을 생성."""
+    if path.endswith(".parquet"):
+        return ParquetSink(path)
+    return JsonlSink(path)
+
+
+def run_offline_inference(model, paths, sink, batch_size=8, num_workers=4, prefetch=32,
+                          include_masks=False, progress_every=100, cache=None, **predict_kwargs):
+    """
+    이미지 경로 스트림을 고정 크기 배치로 추론하고 결과를 sink에 바로 기록.
+
+    Args:
+    - model: YOLO 모델.
+    - paths: 이미지 경로 반복자.
+    - sink: write(record)를 가진 출력 객체.
+    - batch_size: 모델에 한 번에 넣을 이미지 수.
+    - num_workers: 디코딩 스레드 수.
+    - prefetch: 미리 디코딩해 둘 최대 이미지 수.
+    - include_masks: True이면 마스크 폴리곤도 기록.
+    - progress_every: 진행 상황 출력 간격 (이미지 수). 0이면 출력하지 않음.
+    - cache: InferenceCache. 주어지면 캐시에 있는 이미지는 디코딩과 추론을 모두 건너뜀.
+      추론 인자는 predict_kwargs 대신 cache.params를 사용.
+    - predict_kwargs: model.predict에 전달할 인자 (conf, imgsz 등).
+
+    Returns:
+    - {"images", "failed", "detections", "cached", "seconds", "images_per_sec"}
+    """
+    if cache is not None:
+        predict_kwargs = cache.params
+
+    def load(path):
+        # 디코딩 스레드에서 캐시 조회까지 처리: (key, prediction, image)
+        if cache is None:
+            return None, None, cv2.imread(path)
+        try:
+            key = cache.key(path)
+        except OSError:
+            return None, None, None  # 읽을 수 없는 파일은 디코딩 실패로 기록
+        prediction = cache.get(key)
+        return key, prediction, cv2.imread(path) if prediction is None else None
+
+    start = time.perf_counter()
+    images = failed = detections = cached = 0
+
+    for batch in batched(prefetch_decode(paths, num_workers, prefetch, load), batch_size):
+        predictions = [prediction for _, (_, prediction, _) in batch]
+        cached += sum(prediction is not None for prediction in predictions)
+        misses = [i for i, (_, (_, prediction, img)) in enumerate(batch) if prediction is None and img is not None]
+        if misses:
+            results = model.predict([batch[i][1][2] for i in misses], verbose=False, **predict_kwargs)
+            for i, result in zip(misses, results):
+                predictions[i] = prediction_from_result(result)
+                if cache is not None:
+                    cache.put(batch[i][1][0], predictions[i])
+
+        # 입력 순서대로 기록 (디코딩 실패 항목 포함)
+        previous = images
+        for (path, _), prediction in zip(batch, predictions):
+            if prediction is None:
+                sink.write({"image": path, "error": "decode_failed", "detections": []})
+                failed += 1
+                continue
+            record = prediction_to_record(path, prediction, model.names, include_masks)
+            sink.write(record)
+            detections += len(record["detections"])
+            images += 1
+
+        if progress_every and images // progress_every != previous // progress_every:
+            print(f"{images} images, {images / (time.perf_counter() - start):.1f} img/s")
+
+    seconds = time.perf_counter() - start
+    return {
+        "images": images,
+        "failed": failed,
+        "detections": detections,
+        "cached": cached,
+        "seconds": seconds,
+        "images_per_sec": images / seconds if seconds > 0 else 0.0,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="이미지 폴더 전체에 대한 배치 오프라인 추론")
+    parser.add_argument("inputs", nargs="+", help="이미지 폴더 또는 파일 경로")
+    parser.add_argument("--model", default="runs/segment/train2/weights/best.pt", help="YOLO 모델 경로")
+    parser.add_argument("--out", default="detections.jsonl", help="출력 경로 (.jsonl 또는 .parquet)")
+    parser.add_argument("--batch", type=int, default=8, help="배치 크기")
+    parser.add_argument("--workers", type=int, default=4, help="디코딩 스레드 수")
+    parser.add_argument("--prefetch", type=int, default=32, help="미리 디코딩할 최대 이미지 수")
+    parser.add_argument("--conf", type=float, default=0.35, help="신뢰도 임계값")
+    parser.add_argument("--imgsz", type=int, default=640, help="추론 입력 크기")
+    parser.add_argument("--masks", action="store_true", help="마스크 폴리곤도 기록 (JSONL만)")
+    parser.add_argument("--backend", choices=["auto", "torch", "onnx", "openvino"], default="auto",
+                        help="추론 백엔드 (auto: runtime_backend.py 벤치마크로 선택된 백엔드)")
+    parser.add_argument("--cache", help="예측 캐시 폴더 (같은 이미지/가중치/인자는 추론 생략)")
+    parser.add_argument("--cache-mb", type=int, default=512, help="예측 캐시 최대 크기 (MB)")
+    return parser.parse_args()
+
+
+def main():
+    from runtime_backend import load_model, resolve_backend
+
+    args = parse_args()
+    backend, model_path = resolve_backend(args.model, args.backend, args.imgsz)
+    model = load_model(args.model, backend, args.imgsz)
+    cache = None
+    if args.cache:
+        cache = InferenceCache(args.cache, model_path, max_bytes=args.cache_mb * 1024 * 1024, backend=backend,
+                               conf=args.conf, imgsz=args.imgsz)
+    sink = open_sink(args.out)
+    try:
+        summary = run_offline_inference(
+            model, iter_image_paths(args.inputs), sink, batch_size=args.batch, num_workers=args.workers,
+            prefetch=args.prefetch, include_masks=args.masks, cache=cache, conf=args.conf, imgsz=args.imgsz)
+    finally:
+        sink.close()
+    print(f"Processed {summary['images']} images ({summary['failed']} failed, {summary['cached']} cached), "
+          f"{summary['detections']} detections in {summary['seconds']:.1f}s "
+          f"({summary['images_per_sec']:.1f} img/s) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
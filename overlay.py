@@ -0,0 +1,289 @@
+import re
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from mask_depth import letterbox_crop
+
+# ultralytics 기본 팔레트 (RGB 16진수)
+_PALETTE_HEX = ("042AFF", "0BDBEB", "F3F3F3", "00DFB7", "111F68", "FF6FDD", "FF444F", "CCED00", "00F344", "BD00FF",
+                "00B4FF", "DD00BA", "00FFFF", "26C000", "01FFB3", "7D24FF", "7B0068", "FF1B6C", "FC6D2F", "A2FF0B")
+PALETTE = np.array([[int(h[i:i + 2], 16) for i in (4, 2, 0)] for h in _PALETTE_HEX], dtype=np.uint8)  # BGR
+_PALETTE_TUPLES = [tuple(int(c) for c in color) for color in PALETTE]
+
+# 한 번에 합성할 수 있는 최대 마스크 수 (인덱스 맵이 uint8)
+_MAX_MASKS = 255
+
+
+def class_color(cls):
+    """클래스 번호에 해당하는 BGR 색상."""
+    return _PALETTE_TUPLES[int(cls) % len(_PALETTE_TUPLES)]
+
+
+_NUMBER = re.compile(r"[-+]?\.?\d")
+_ZEROS = str.maketrans("123456789", "000000000")
+
+
+def split_label(text):
+    """
+    라벨을 고정된 앞부분과 바뀌는 숫자 부분(숫자로 시작하는 마지막 단어)으로 나눔. 숫자가 없으면 전체가 앞부분.
+    예: "Depth: 1.23m" -> ("Depth: ", "1.23m"), "stone 0.91" -> ("stone ", "0.91"), "Depth: Invalid" -> (전체, "").
+    """
+    head, sep, tail = text.rpartition(" ")
+    if _NUMBER.match(tail):
+        return head + sep, tail
+    return text, ""
+
+
+class LabelCache:
+    """
+    라벨의 고정된 앞부분(클래스 이름, "Depth: " 등)만 한 번 그려 두고 재사용하는 스프라이트 캐시.
+    신뢰도, 거리, 크기처럼 프레임마다 바뀌는 숫자 부분은 cv2.putText로 그림.
+    여러 줄의 앞부분은 스프라이트 하나로 묶어 cv2.copyTo 한 번으로 그림.
+
+    Args:
+    - font: cv2 폰트.
+    - max_entries: 캐시할 최대 스프라이트 수 (초과하면 오래 사용하지 않은 것부터 삭제).
+    """
+
+    def __init__(self, font=cv2.FONT_HERSHEY_SIMPLEX, max_entries=256):
+        self.font = font
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._sprites = OrderedDict()
+        self._zero_width = {}
+
+    def advance(self, text, scale, thickness):
+        """text 다음 글자가 시작하는 x 오프셋 (cv2.putText 한 번으로 이어 그린 것과 같은 위치)."""
+        zero = self._zero_width.get((scale, thickness))
+        if zero is None:
+            zero = self._zero_width[(scale, thickness)] = cv2.getTextSize("0", self.font, scale, thickness)[0][0]
+        return cv2.getTextSize(text + "0", self.font, scale, thickness)[0][0] - zero
+
+    def sprite(self, prefixes, scale, thickness, line_height, background=None, blanks=None):
+        """
+        줄별 앞부분 스프라이트를 반환.
+
+        Args:
+        - prefixes: ((문자열, BGR 색상), ...) 줄 순서.
+        - background: BGR 색상이면 글자 뒤를 채움.
+        - blanks: background를 채울 때 줄별 숫자 부분 자리 (숫자를 0으로 바꾼 문자열).
+          Hershey 폰트의 숫자는 폭이 모두 같으므로 같은 형식의 숫자는 같은 스프라이트를 사용.
+
+        Returns:
+        - (image (h, w, 3) uint8, mask (h, w) uint8, origin_x, origin_y, advances).
+          origin은 첫 줄 cv2.putText의 org(글자 기준선 왼쪽)에 해당하는 스프라이트 내 좌표,
+          advances는 줄별 숫자 부분이 시작하는 x 오프셋.
+        """
+        key = (prefixes, scale, thickness, line_height, background, blanks)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+        self.misses += 1
+        blanks = blanks or ("",) * len(prefixes)
+        advances = tuple(self.advance(text, scale, thickness) if text else 0 for text, _ in prefixes)
+        sizes = [cv2.getTextSize(text + blank, self.font, scale, thickness)[0]
+                 for (text, _), blank in zip(prefixes, blanks)]
+        text_h = max(h for _, h in sizes)
+        pad = thickness + 1
+        descent = text_h // 2  # g, y 등 기준선 아래로 내려가는 글자 여유
+        origin_x, origin_y = pad, pad + text_h
+        height = origin_y + (len(prefixes) - 1) * line_height + descent + pad
+        width = max(w for w, _ in sizes) + 2 * pad
+
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        glyphs = np.zeros((height, width), dtype=np.uint8)
+        for line, (text, color) in enumerate(prefixes):
+            if not text:
+                continue
+            # 줄마다 색이 다르므로 줄별로 그린 뒤 합침. 굵은 선 가장자리 반투명 픽셀은 임계값으로 잘라냄
+            glyph = np.zeros((height, width), dtype=np.uint8)
+            cv2.putText(glyph, text, (origin_x, origin_y + line * line_height), self.font, scale, 255, thickness)
+            glyph = glyph >= 128
+            image[glyph] = color
+            glyphs[glyph] = 1
+        if background is not None:
+            image[glyphs == 0] = background
+            glyphs[:] = 1
+
+        sprite = (image, glyphs, origin_x, origin_y, advances)
+        self._sprites[key] = sprite
+        if len(self._sprites) > self.max_entries:
+            self._sprites.popitem(last=False)
+        return sprite
+
+    def draw_lines(self, out, lines, org, scale, thickness=1, line_height=20, background=None):
+        """
+        cv2.putText(out, text, (org[0], org[1] + k * line_height), ...)를 줄마다 호출한 것과 같은 위치에 그림.
+        앞부분은 캐시된 스프라이트 하나로, 숫자 부분은 줄마다 cv2.putText로 그림.
+
+        Args:
+        - lines: [(문자열, BGR 색상), ...].
+        - background: BGR 색상이면 글자 뒤를 채움 (클래스 라벨용).
+        """
+        prefixes, suffixes = [], []
+        for text, color in lines:
+            prefix, suffix = split_label(text)
+            prefixes.append((prefix, tuple(color)))
+            suffixes.append(suffix)
+        blanks = None if background is None else tuple(suffix.translate(_ZEROS) for suffix in suffixes)
+        image, mask, origin_x, origin_y, advances = self.sprite(tuple(prefixes), scale, thickness, line_height,
+                                                                background, blanks)
+        x0, y0 = org[0] - origin_x, org[1] - origin_y
+        h, w = mask.shape
+        if x0 >= 0 and y0 >= 0 and x0 + w <= out.shape[1] and y0 + h <= out.shape[0]:
+            cv2.copyTo(image, mask, out[y0:y0 + h, x0:x0 + w])
+        else:  # 영상 밖으로 나가는 부분은 잘라냄
+            sx0, sy0 = max(0, -x0), max(0, -y0)
+            sx1, sy1 = min(w, out.shape[1] - x0), min(h, out.shape[0] - y0)
+            if sx1 > sx0 and sy1 > sy0:
+                cv2.copyTo(image[sy0:sy1, sx0:sx1], mask[sy0:sy1, sx0:sx1],
+                           out[y0 + sy0:y0 + sy1, x0 + sx0:x0 + sx1])
+
+        for line, suffix in enumerate(suffixes):
+            if suffix:
+                cv2.putText(out, suffix, (org[0] + advances[line], org[1] + line * line_height), self.font, scale,
+                            prefixes[line][1], thickness)
+
+    def draw(self, out, text, org, scale, color, thickness=1, background=None):
+        """cv2.putText(out, text, org, ...)와 같은 위치에 라벨 한 줄을 그림."""
+        self.draw_lines(out, [(text, color)], org, scale, thickness, background=background)
+
+
+class OverlayRenderer:
+    """
+    박스, 마스크, 라벨, 측정값 텍스트를 출력 버퍼 하나에 한 번에 합성하는 렌더러.
+    results[0].plot() 후 박스마다 cv2.putText를 여러 번 호출하던 방식을 대체.
+
+    Args:
+    - names: 클래스 이름 dict (model.names).
+    - mask_alpha: 마스크 색상 불투명도.
+    - line_width: 박스 선 두께.
+    - label_scale: 클래스 라벨 글자 크기.
+    - show_conf: True이면 클래스 라벨에 신뢰도도 표시.
+    - text_offset: 측정값 텍스트 첫 줄의 박스 중심 기준 위치 (dx, dy).
+    - line_height: 측정값 텍스트 줄 간격 (픽셀).
+    - text_scale, text_thickness: 측정값 텍스트 글자 크기와 두께.
+    """
+
+    def __init__(self, names, mask_alpha=0.5, line_width=2, label_scale=0.5, show_conf=True,
+                 text_offset=(-50, -20), line_height=20, text_scale=0.5, text_thickness=2):
+        self.names = names
+        self.mask_alpha = mask_alpha
+        self.line_width = line_width
+        self.label_scale = label_scale
+        self.show_conf = show_conf
+        self.text_offset = text_offset
+        self.line_height = line_height
+        self.text_scale = text_scale
+        self.text_thickness = text_thickness
+        self.labels = LabelCache()
+        self.last_ms = 0.0
+        self._out = None
+        self._lut = np.zeros((256, 1, 3), dtype=np.uint8)
+
+    def render(self, image, boxes, classes, confs=None, masks=None, texts=None, keep=None, out=None):
+        """
+        탐지 결과를 영상 위에 한 번에 그림.
+
+        Args:
+        - image: BGR 영상 (H, W, 3).
+        - boxes: (N, 4) xyxy 박스 (영상 좌표).
+        - classes: (N,) 클래스 번호.
+        - confs: (N,) 신뢰도 또는 None.
+        - masks: (N, h, w) 마스크 (추론 입력 해상도 또는 영상 해상도) 또는 None.
+        - texts: 탐지별 [(문자열, BGR 색상), ...] 리스트 또는 None. 박스 중심 근처에 한 줄씩 표시.
+        - keep: (N,) bool 배열. False인 탐지는 그리지 않음.
+        - out: 결과를 쓸 버퍼. None이면 내부 버퍼를 재사용 (다음 render 호출 전까지만 유효).
+          image와 같은 배열을 주면 제자리에서 그림.
+
+        Returns:
+        - out.
+        """
+        start = time.perf_counter()
+        if out is None:
+            if self._out is None or self._out.shape != image.shape:
+                self._out = np.empty_like(image)
+            out = self._out
+        if out is not image:
+            np.copyto(out, image)
+
+        boxes = np.asarray(boxes).reshape(-1, 4).astype(np.int32)
+        classes = np.asarray(classes).astype(np.int64)
+        selected = np.arange(len(boxes)) if keep is None else np.flatnonzero(keep)
+
+        if masks is not None and len(selected):
+            self._blend_masks(out, np.asarray(masks)[selected], classes[selected])
+
+        box_list, class_list = boxes.tolist(), classes.tolist()
+        conf_list = np.asarray(confs).tolist() if self.show_conf and confs is not None else None
+        for i in selected.tolist():
+            x1, y1, x2, y2 = box_list[i]
+            cls = class_list[i]
+            color = class_color(cls)
+            cv2.rectangle(out, (x1, y1), (x2, y2), color, self.line_width)
+
+            label = self.names[cls]
+            if conf_list is not None:
+                label = f"{label} {conf_list[i]:.2f}"
+            self.labels.draw(out, label, (x1, max(y1 - 4, 12)), self.label_scale, (255, 255, 255), 1, color)
+
+            if texts is not None and texts[i]:
+                tx, ty = (x1 + x2) // 2 + self.text_offset[0], (y1 + y2) // 2 + self.text_offset[1]
+                self.labels.draw_lines(out, texts[i], (tx, ty), self.text_scale, self.text_thickness,
+                                       self.line_height)
+
+        self.last_ms = (time.perf_counter() - start) * 1000.0
+        return out
+
+    def _blend_masks(self, out, masks, classes):
+        """
+        모든 마스크를 인스턴스 번호 맵 하나로 합친 뒤 한 번의 리사이즈와 블렌딩으로 합성.
+        겹치는 영역은 뒤에 오는 인스턴스가 위에 그려짐.
+        """
+        masks = masks[:_MAX_MASKS] > 0.5
+        n, mh, mw = masks.shape
+        h, w = out.shape[:2]
+
+        # 마스크 해상도에서 인스턴스 번호 맵 생성 (0: 배경)
+        index = (masks * np.arange(1, n + 1, dtype=np.uint8)[:, None, None]).max(axis=0)
+
+        if (mh, mw) != (h, w):
+            top, bottom, left, right = letterbox_crop((mh, mw), (h, w))
+            index = cv2.resize(index[top:bottom, left:right], (w, h), interpolation=cv2.INTER_NEAREST)
+
+        # 박스가 있는 영역만 블렌딩
+        ys, xs = np.nonzero(index.any(axis=1))[0], np.nonzero(index.any(axis=0))[0]
+        if not len(ys):
+            return
+        y0, y1, x0, x1 = ys[0], ys[-1] + 1, xs[0], xs[-1] + 1
+        index = index[y0:y1, x0:x1]
+        roi = out[y0:y1, x0:x1]
+
+        self._lut[1:n + 1, 0] = PALETTE[classes[:n] % len(PALETTE)]
+        colors = cv2.LUT(cv2.merge([index, index, index]), self._lut)
+        blended = cv2.addWeighted(roi, 1.0 - self.mask_alpha, colors, self.mask_alpha, 0.0)
+        cv2.copyTo(blended, index, roi)
+
+    def render_prediction(self, image, prediction, texts=None, conf_threshold=0.0, out=None):
+        """inference_cache.Prediction을 그림. conf_threshold 미만인 탐지는 생략."""
+        return self.render(image, prediction.boxes, prediction.classes, prediction.confs, prediction.masks,
+                           texts, prediction.confs >= conf_threshold, out)
+
+    def render_detections(self, image, detections, texts=None, conf_threshold=0.0, out=None):
+        """detection_frame.DetectionFrame을 그림. conf_threshold 미만인 탐지는 생략."""
+        return self.render(image, detections.boxes, detections.classes, detections.confs, detections.masks,
+                           texts, detections.confs >= conf_threshold, out)
+
+    def render_results(self, image, result, texts=None, conf_threshold=0.0, out=None):
+        """ultralytics Results 하나를 그림. conf_threshold 미만인 탐지는 생략."""
+        confs = result.boxes.conf.cpu().numpy()
+        masks = result.masks.data.cpu().numpy() if result.masks is not None else None
+        return self.render(image, result.boxes.xyxy.cpu().numpy(), result.boxes.cls.cpu().numpy(), confs, masks,
+                           texts, confs >= conf_threshold, out)
@@ -0,0 +1,254 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 큐가 가득 찼을 때의 정책
+DROP_OLDEST = "drop_oldest"  # 가장 오래된 프레임을 버리고 새 프레임을 넣음 (지연 최소화)
+BLOCK = "block"  # 앞 단계가 기다림 (프레임 손실 없음)
+
+_END = object()  # 스트림 종료 신호
+
+
+def max_in_flight(num_stages, queue_size):
+    """
+    파이프라인 안에 동시에 존재할 수 있는 최대 패킷 수.
+    큐마다 queue_size개, 단계 스레드마다 처리 중인 1개, 소스가 만드는 1개, results()를 읽는 쪽이 잡고 있는 1개.
+    Pipeline(release=...)로 버려지거나 끝난 패킷의 버퍼를 돌려주면, 이만큼의 슬롯을 가진 풀은 새로 할당하지 않음.
+    """
+    return (num_stages + 1) * queue_size + num_stages + 2
+
+
+class FramePacket:
+    """
+    파이프라인 단계 사이를 이동하는 프레임 단위 데이터.
+
+    - frame_id: 소스에서 부여한 프레임 번호.
+    - timestamp: 소스에서 프레임을 받은 시각 (time.perf_counter 기준).
+    - data: 단계들이 읽고 쓰는 dict (예: "bgr", "depth", "results").
+    - stage_times: 단계 이름별 처리 시간 (초).
+    """
+
+    __slots__ = ("frame_id", "timestamp", "data", "stage_times")
+
+    def __init__(self, frame_id, timestamp, data):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.data = data
+        self.stage_times = {}
+
+    def latency(self):
+        """소스 수신부터 현재까지의 경과 시간 (초)."""
+        return time.perf_counter() - self.timestamp
+
+
+class BoundedQueue:
+    """
+    정책(drop_oldest / block)을 가진 크기 제한 큐.
+
+    Args:
+    - maxsize: 큐 최대 길이.
+    - policy: DROP_OLDEST 또는 BLOCK.
+    - on_drop: DROP_OLDEST로 버린 항목을 받는 함수 (버퍼 반환 등). None이면 호출하지 않음.
+    """
+
+    def __init__(self, maxsize=2, policy=DROP_OLDEST, on_drop=None):
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.policy = policy
+        self.on_drop = on_drop
+        self.dropped = 0
+
+    def put(self, item, stop_event=None):
+        """
+        항목을 넣음. 종료 신호는 정책과 관계없이 항상 기다렸다가 넣음.
+        종료 중이라 넣지 못했으면 False.
+        """
+        if self.policy == BLOCK or item is _END:
+            while True:
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    if stop_event is not None and stop_event.is_set():
+                        return False
+
+        with self._lock:
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return True
+                except queue.Full:
+                    try:
+                        old = self._queue.get_nowait()
+                    except queue.Empty:
+                        continue
+                    if old is _END:  # 종료 신호는 버리지 않음
+                        self._queue.put_nowait(old)
+                        return False
+                    self.dropped += 1
+                    if self.on_drop is not None:
+                        self.on_drop(old)
+
+    def get(self, timeout=0.1):
+        return self._queue.get(timeout=timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+class Pipeline:
+    """
+    캡처 / 추론 / 측정 / 표시 단계를 각각의 스레드에서 동시에 실행하는 파이프라인.
+    단계 사이는 BoundedQueue로 연결되어, 처리량은 가장 느린 단계의 속도에 수렴.
+
+    Args:
+    - source: 호출할 때마다 프레임 dict를 반환하는 함수. None을 반환하면 스트림 종료.
+    - stages: (이름, 함수) 리스트. 함수는 FramePacket을 받아 FramePacket(또는 None=버림)을 반환.
+    - queue_size: 단계 사이 큐의 최대 길이.
+    - policy: 큐 정책 (DROP_OLDEST 또는 BLOCK).
+    - history: 지연 통계에 사용할 최근 프레임 수.
+    - release: 패킷이 파이프라인을 떠날 때(큐에서 버려짐, 단계가 None 반환, results()를 읽는 쪽의 처리 끝)
+      호출할 함수. 소스가 풀에서 빌린 버퍼를 돌려주는 데 사용.
+    """
+
+    def __init__(self, source, stages, queue_size=2, policy=DROP_OLDEST, history=300, release=None):
+        self.source = source
+        self.stages = list(stages)
+        self.release = release
+        self.queues = [BoundedQueue(queue_size, policy, self._release)
+                       for _ in range(len(self.stages) + 1)]
+        self._stop = threading.Event()
+        self._threads = []
+        self._stage_times = {name: deque(maxlen=history) for name, _ in [("source", None)] + self.stages}
+        self._latencies = deque(maxlen=history)
+        self._finished = deque(maxlen=history)
+        self._errors = []
+
+    def start(self):
+        """소스와 모든 단계 스레드를 시작."""
+        self._threads = [threading.Thread(target=self._run_source, name="source", daemon=True)]
+        for i, (name, fn) in enumerate(self.stages):
+            self._threads.append(threading.Thread(
+                target=self._run_stage, args=(name, fn, self.queues[i], self.queues[i + 1]),
+                name=name, daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """모든 스레드를 종료."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+
+    def _release(self, packet):
+        if self.release is not None and packet is not None and packet is not _END:
+            self.release(packet)
+
+    def _run_source(self):
+        frame_id = 0
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                data = self.source()
+                if data is None:
+                    break
+                packet = FramePacket(frame_id, start, data)
+                elapsed = time.perf_counter() - start
+                packet.stage_times["source"] = elapsed
+                self._stage_times["source"].append(elapsed)
+                if not self.queues[0].put(packet, self._stop):
+                    self._release(packet)
+                frame_id += 1
+        except Exception as e:
+            self._errors.append(("source", e))
+        finally:
+            self.queues[0].put(_END, self._stop)
+
+    def _run_stage(self, name, fn, in_queue, out_queue):
+        while not self._stop.is_set():
+            try:
+                packet = in_queue.get()
+            except queue.Empty:
+                continue
+            if packet is _END:
+                out_queue.put(_END, self._stop)
+                return
+            start = time.perf_counter()
+            try:
+                result = fn(packet)
+            except Exception as e:
+                self._errors.append((name, e))
+                self._release(packet)
+                self._stop.set()
+                out_queue.put(_END, self._stop)
+                return
+            if result is None:
+                self._release(packet)
+                continue
+            elapsed = time.perf_counter() - start
+            result.stage_times[name] = elapsed
+            self._stage_times[name].append(elapsed)
+            if not out_queue.put(result, self._stop):
+                self._release(result)
+
+    def results(self):
+        """
+        마지막 단계를 통과한 FramePacket을 순서대로 반환하는 제너레이터.
+        cv2.imshow처럼 메인 스레드에서 실행해야 하는 표시 단계는 여기서 처리.
+        반환된 패킷은 다음 패킷을 요청할 때(또는 반복을 멈출 때) release로 넘어가므로 그 뒤에는 사용하지 않음.
+        """
+        out_queue = self.queues[-1]
+        while True:
+            try:
+                packet = out_queue.get()
+            except queue.Empty:
+                if self._stop.is_set():
+                    break
+                continue
+            if packet is _END:
+                break
+            self._latencies.append(packet.latency())
+            self._finished.append(time.perf_counter())
+            try:
+                yield packet
+            finally:
+                self._release(packet)
+        if self._errors:
+            name, error = self._errors[0]
+            raise RuntimeError(f"Pipeline stage '{name}' failed") from error
+
+    def stats(self):
+        """
+        단계별 처리 시간, 큐 길이/드롭 수, 종단 간 지연, 처리량(fps)을 dict로 반환.
+        """
+        def summarize(values):
+            if not values:
+                return {"mean_ms": 0.0, "p95_ms": 0.0}
+            values = np.asarray(values) * 1000.0
+            return {"mean_ms": float(values.mean()), "p95_ms": float(np.percentile(values, 95))}
+
+        fps = 0.0
+        if len(self._finished) > 1:
+            span = self._finished[-1] - self._finished[0]
+            fps = (len(self._finished) - 1) / span if span > 0 else 0.0
+
+        return {
+            "stages": {name: summarize(times) for name, times in self._stage_times.items()},
+            "queues": [{"size": q.qsize(), "dropped": q.dropped} for q in self.queues],
+            "latency": summarize(self._latencies),
+            "fps": fps,
+        }
+
+
+def format_stats(stats):
+    """Pipeline.stats() 결과를 한 줄 문자열로 변환."""
+    stages = " ".join(f"{name}={s['mean_ms']:.1f}ms" for name, s in stats["stages"].items())
+    dropped = sum(q["dropped"] for q in stats["queues"])
+    return (f"fps={stats['fps']:.1f} latency={stats['latency']['mean_ms']:.1f}ms"
+            f"(p95 {stats['latency']['p95_ms']:.1f}ms) dropped={dropped} | {stages}")
@@ -0,0 +1,186 @@
+import argparse
+import os
+import random
+
+import cv2
+import numpy as np
+
+from runtime_backend import ONNX, OPENVINO, export_model
+
+DEFAULT_DATA = "yolo_env_detection_ver3-4/data.yaml"
+METRIC_LABELS = [("box_map50", "Box mAP50"), ("box_map", "Box mAP50-95"),
+                 ("mask_map50", "Mask mAP50"), ("mask_map", "Mask mAP50-95")]
+
+
+def calibration_images(train_dir, count, seed=0):
+    """학습 이미지 폴더에서 보정(calibration)에 사용할 이미지 경로를 무작위로 count개 선택."""
+    names = sorted(f for f in os.listdir(train_dir) if f.lower().endswith((".png", ".jpg", ".jpeg")))
+    random.Random(seed).shuffle(names)
+    return [os.path.abspath(os.path.join(train_dir, f)) for f in names[:count]]
+
+
+def letterbox(img, size):
+    """
+    ultralytics와 같은 방식으로 비율을 유지해 size x size로 리사이즈하고 회색(114)으로 패딩.
+    """
+    h, w = img.shape[:2]
+    gain = min(size / h, size / w)
+    nh, nw = round(h * gain), round(w * gain)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    out = np.full((size, size, 3), 114, dtype=np.uint8)
+    out[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return out
+
+
+class _CalibrationReader:
+    """onnxruntime 정적 양자화용 보정 데이터 (이미지 한 장씩 NCHW float32로 전달)."""
+
+    def __init__(self, paths, input_name, imgsz):
+        self._paths = iter(paths)
+        self._input_name = input_name
+        self._imgsz = imgsz
+
+    def get_next(self):
+        for path in self._paths:
+            img = cv2.imread(path)
+            if img is None:
+                continue
+            rgb = cv2.cvtColor(letterbox(img, self._imgsz), cv2.COLOR_BGR2RGB)
+            return {self._input_name: (rgb.transpose(2, 0, 1)[None].astype(np.float32) / 255.0)}
+        return None
+
+
+def quantize_onnx(weights_path, paths, imgsz=640):
+    """
+    FP32 ONNX 모델을 학습 이미지로 보정해 INT8(QDQ) ONNX로 정적 양자화.
+
+    Returns:
+    - INT8 모델 경로 ("<가중치 이름>_int8.onnx").
+    """
+    import onnx
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    fp32_path = export_model(weights_path, ONNX, imgsz)
+    int8_path = f"{os.path.splitext(weights_path)[0]}_int8.onnx"
+    input_name = onnxruntime.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    quantize_static(fp32_path, int8_path, _CalibrationReader(paths, input_name, imgsz),
+                    quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                    per_channel=True, calibrate_method=CalibrationMethod.MinMax)
+
+    # ultralytics가 클래스 이름, 입력 크기 등을 읽는 메타데이터를 FP32 모델에서 복사
+    fp32_model, int8_model = onnx.load(fp32_path), onnx.load(int8_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, int8_path)
+    return int8_path
+
+
+def quantize_openvino(weights_path, data_yaml, paths, imgsz=640):
+    """
+    OpenVINO(NNCF)로 학습 이미지를 보정 데이터로 사용해 INT8 모델을 생성.
+    ultralytics는 데이터셋의 val 항목으로 보정하므로, val이 선택한 학습 이미지 목록을 가리키는 YAML을 따로 만듦.
+
+    Returns:
+    - INT8 OpenVINO 모델 폴더 경로.
+    """
+    import yaml
+    from ultralytics import YOLO
+
+    from model_test import resolve_data_yaml
+
+    with open(resolve_data_yaml(data_yaml), "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    root = os.path.dirname(os.path.abspath(data_yaml))
+    list_path = os.path.join(root, "calibration.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(paths) + "\n")
+    data["path"] = root
+    data["val"] = list_path
+    calibration_yaml = os.path.join(root, "data.calibration.yaml")
+    with open(calibration_yaml, "w", encoding="utf-8") as f:
+        yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+
+    return str(YOLO(weights_path).export(format=OPENVINO, int8=True, data=calibration_yaml, imgsz=imgsz))
+
+
+def _markdown_table(header, rows):
+    lines = ["| " + " | ".join(header) + " |", "|" + "|".join("---" for _ in header) + "|"]
+    lines += ["| " + " | ".join(str(v) for v in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def write_comparison(path, fp32_name, int8_name, fp32_rows, int8_rows, fp32_speed, int8_speed, calibration_count):
+    """FP32 / INT8 검증 표(model_test_result.md 형식)와 클래스별 mAP, 지연 비교 표를 마크다운으로 저장."""
+    from model_test import format_validation_table
+
+    int8_by_class = {row["Class"]: row for row in int8_rows}
+    comparison = []
+    for row in fp32_rows:
+        other = int8_by_class.get(row["Class"])
+        if other is None:
+            continue
+        values = [row["Class"], row["Instances"]]
+        for key, _ in METRIC_LABELS:
+            values += [f"{row[key]:.3f}", f"{other[key]:.3f}", f"{other[key] - row[key]:+.3f}"]
+        comparison.append(values)
+    header = ["Class", "Instances"]
+    for _, label in METRIC_LABELS:
+        header += [f"{label} FP32", "INT8", "Δ"]
+
+    fp32_total, int8_total = sum(fp32_speed.values()), sum(int8_speed.values())
+    latency_rows = [
+        [name] + [f"{speed[k]:.1f}" for k in ("preprocess", "inference", "postprocess")] + [f"{total:.1f}", speedup]
+        for name, speed, total, speedup in [
+            (f"FP32 (`{fp32_name}`)", fp32_speed, fp32_total, "1.00x"),
+            (f"INT8 (`{int8_name}`)", int8_speed, int8_total, f"{fp32_total / max(int8_total, 1e-9):.2f}x"),
+        ]
+    ]
+
+    text = "\n\n".join([
+        "# FP32 / INT8 검증 결과 비교",
+        f"- 보정 데이터: 학습(train) 이미지 {calibration_count}장\n- 검증 데이터: valid 분할, batch=1, CPU",
+        f"## FP32 (`{fp32_name}`)\n```\n{format_validation_table(fp32_rows)}\n```",
+        f"## INT8 (`{int8_name}`)\n```\n{format_validation_table(int8_rows)}\n```",
+        "## 클래스별 mAP 비교\n" + _markdown_table(header, comparison),
+        "## 이미지당 처리 시간 (ms)\n" + _markdown_table(
+            ["모델", "preprocess", "inference", "postprocess", "합계", "속도 배율"], latency_rows),
+    ])
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="학습 데이터로 보정한 INT8 양자화 및 FP32 대비 정확도/지연 비교")
+    parser.add_argument("--model", default="runs/segment/train2/weights/best.pt", help="FP32 .pt 가중치 경로")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="데이터셋 YAML 경로")
+    parser.add_argument("--backend", choices=[OPENVINO, ONNX], default=OPENVINO, help="INT8 런타임")
+    parser.add_argument("--calibration", type=int, default=300, help="보정에 사용할 학습 이미지 수")
+    parser.add_argument("--imgsz", type=int, default=640, help="입력 크기")
+    parser.add_argument("--out", default="int8_result.md", help="비교 결과 마크다운 경로")
+    return parser.parse_args()
+
+
+def main():
+    from model_test import evaluate_model_and_save_to_csv
+
+    args = parse_args()
+    train_dir = os.path.join(os.path.dirname(os.path.abspath(args.data)), "train", "images")
+    paths = calibration_images(train_dir, args.calibration)
+    print(f"Calibrating {args.backend} INT8 model on {len(paths)} training images")
+    if args.backend == ONNX:
+        int8_path = quantize_onnx(args.model, paths, args.imgsz)
+    else:
+        int8_path = quantize_openvino(args.model, args.data, paths, args.imgsz)
+
+    # 같은 조건(batch=1, CPU)으로 FP32 / INT8 검증
+    val_kwargs = {"batch": 1, "device": "cpu", "imgsz": args.imgsz}
+    fp32_rows, fp32_speed = evaluate_model_and_save_to_csv(args.model, args.data, **val_kwargs)
+    int8_rows, int8_speed = evaluate_model_and_save_to_csv(int8_path, args.data, **val_kwargs)
+
+    write_comparison(args.out, args.model, int8_path, fp32_rows, int8_rows, fp32_speed, int8_speed, len(paths))
+    print(f"Saved comparison to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
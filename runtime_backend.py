@@ -0,0 +1,236 @@
+import argparse
+import importlib.util
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from inference_cache import file_digest, prediction_from_result
+from mask_depth import masks_to_depth_resolution
+from metrics import box_iou_matrix, greedy_match, summarize
+
+TORCH = "torch"
+ONNX = "onnx"
+OPENVINO = "openvino"
+AUTO = "auto"
+BACKENDS = (TORCH, ONNX, OPENVINO)
+
+# 내보내기 형식별 필요한 런타임 모듈
+_RUNTIME_MODULES = {ONNX: "onnxruntime", OPENVINO: "openvino"}
+
+
+def available_backends():
+    """이 머신에서 사용할 수 있는 백엔드 목록 (torch는 항상 포함)."""
+    return [TORCH] + [b for b, module in _RUNTIME_MODULES.items() if importlib.util.find_spec(module) is not None]
+
+
+def _sidecar_path(weights_path, name):
+    root, _ = os.path.splitext(weights_path)
+    return f"{root}.{name}.json"
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def export_model(weights_path, backend, imgsz=640, dynamic=True):
+    """
+    가중치를 CPU용 그래프 형식으로 내보내고 가중치 옆에 캐시.
+    같은 가중치(내용 해시)와 설정으로 이미 내보낸 결과가 있으면 다시 내보내지 않음.
+
+    Args:
+    - weights_path: .pt 가중치 경로.
+    - backend: ONNX 또는 OPENVINO.
+    - imgsz: 입력 크기.
+    - dynamic: True이면 배치/입력 크기가 가변인 그래프로 내보냄 (배치 추론에 필요).
+
+    Returns:
+    - 내보낸 모델 경로 (ONNX 파일 또는 OpenVINO 폴더).
+    """
+    if backend not in _RUNTIME_MODULES:
+        raise ValueError(f"Unknown export backend: {backend}")
+    manifest_path = _sidecar_path(weights_path, "export")
+    manifest = _read_json(manifest_path)
+    settings = {"weights_digest": file_digest(weights_path), "imgsz": imgsz, "dynamic": dynamic}
+
+    entry = manifest.get(backend)
+    if entry and os.path.exists(entry["path"]) and {k: entry.get(k) for k in settings} == settings:
+        return entry["path"]
+
+    from ultralytics import YOLO
+    path = YOLO(weights_path).export(format=backend, imgsz=imgsz, dynamic=dynamic, half=False)
+    manifest[backend] = dict(settings, path=str(path))
+    _write_json(manifest_path, manifest)
+    return str(path)
+
+
+def selected_backend(weights_path):
+    """
+    benchmark_backends가 이 가중치에 대해 저장한 가장 빠른 백엔드. 기록이 없거나 가중치가 바뀌었으면 TORCH.
+    """
+    choice = _read_json(_sidecar_path(weights_path, "backend"))
+    backend = choice.get("backend", TORCH)
+    if backend == TORCH or backend not in available_backends():
+        return TORCH
+    if choice.get("weights_digest") != file_digest(weights_path):
+        return TORCH
+    return backend
+
+
+def resolve_backend(weights_path, backend=AUTO, imgsz=640):
+    """
+    실제로 실행할 백엔드와 모델 경로를 결정. ONNX/OPENVINO는 필요하면 내보냄.
+    예측 캐시 키(inference_cache.InferenceCache)에 실행 모델을 반영할 때 사용.
+
+    Returns:
+    - (백엔드, 모델 경로). TORCH이면 weights_path 그대로, 그 외에는 내보낸 모델 경로.
+    """
+    if backend == AUTO:
+        backend = selected_backend(weights_path) if weights_path.endswith(".pt") else TORCH
+    if backend == TORCH:
+        return TORCH, weights_path
+    return backend, export_model(weights_path, backend, imgsz)
+
+
+def load_model(weights_path, backend=AUTO, imgsz=640):
+    """
+    지정한 백엔드로 YOLO 모델을 불러옴. 반환값은 백엔드와 관계없이 같은 ultralytics YOLO 객체이므로
+    model(img), model.names, results[0].boxes/masks 등 기존 코드를 그대로 사용할 수 있음.
+
+    Args:
+    - weights_path: .pt 가중치 경로.
+    - backend: TORCH, ONNX, OPENVINO 또는 AUTO (benchmark_backends로 선택된 백엔드, 없으면 TORCH).
+    - imgsz: 내보내기 입력 크기.
+    """
+    from ultralytics import YOLO
+
+    backend, model_path = resolve_backend(weights_path, backend, imgsz)
+    if backend == TORCH:
+        return YOLO(model_path)
+    return YOLO(model_path, task="segment")
+
+
+def compare_predictions(reference, candidate, iou_threshold=0.5):
+    """
+    두 Prediction의 탐지를 같은 클래스끼리 박스 IoU로 짝지어 차이를 계산.
+
+    Returns:
+    - {"matched": 짝지어진 비율 (양쪽 탐지 수 중 큰 값 기준), "box_iou": 짝의 평균 박스 IoU,
+       "conf_diff": 짝의 최대 신뢰도 차이, "mask_iou": 짝의 평균 마스크 IoU (원본 해상도)}
+    """
+    n_ref, n_cand = len(reference.boxes), len(candidate.boxes)
+    if n_ref == 0 or n_cand == 0:
+        matched = 1.0 if n_ref == n_cand else 0.0
+        return {"matched": matched, "box_iou": matched, "conf_diff": 0.0, "mask_iou": matched}
+
+    iou = box_iou_matrix(reference.boxes, candidate.boxes)
+    iou[reference.classes[:, None] != candidate.classes[None, :]] = 0.0
+    pairs = greedy_match(iou, iou_threshold)
+    if not pairs:
+        return {"matched": 0.0, "box_iou": 0.0, "conf_diff": 1.0, "mask_iou": 0.0}
+
+    ref_idx, cand_idx = (np.array(index) for index in zip(*pairs))
+    result = {
+        "matched": len(pairs) / max(n_ref, n_cand),
+        "box_iou": float(iou[ref_idx, cand_idx].mean()),
+        "conf_diff": float(np.abs(reference.confs[ref_idx] - candidate.confs[cand_idx]).max()),
+        "mask_iou": 1.0,
+    }
+    if reference.masks is not None and candidate.masks is not None:
+        ref_masks = masks_to_depth_resolution(reference.masks[ref_idx], reference.orig_shape)
+        cand_masks = masks_to_depth_resolution(candidate.masks[cand_idx], candidate.orig_shape)
+        inter = (ref_masks & cand_masks).sum(axis=(1, 2))
+        union = np.maximum((ref_masks | cand_masks).sum(axis=(1, 2)), 1)
+        result["mask_iou"] = float((inter / union).mean())
+    return result
+
+
+def benchmark_backends(weights_path, image_paths, backends=None, imgsz=640, warmup=3,
+                       min_matched=0.9, min_box_iou=0.9, max_conf_diff=0.05, min_mask_iou=0.85):
+    """
+    사용 가능한 백엔드별 추론 지연을 측정하고 PyTorch 결과와 비교한 뒤,
+    허용 오차를 만족하는 가장 빠른 백엔드를 가중치 옆에 기록 (load_model(backend=AUTO)가 사용).
+
+    Returns:
+    - 백엔드별 {"latency": summarize 결과, "agreement": compare_predictions 평균, "ok": 허용 오차 만족 여부}
+      와 선택된 백엔드 이름.
+    """
+    images = [cv2.imread(path) for path in image_paths]
+    images = [img for img in images if img is not None]
+    if not images:
+        raise ValueError("No readable images for the backend benchmark")
+    backends = backends or available_backends()
+
+    report, reference = {}, None
+    for backend in [TORCH] + [b for b in backends if b != TORCH]:
+        model = load_model(weights_path, backend, imgsz)
+        for img in images[:warmup]:
+            model(img, verbose=False)
+
+        samples, predictions = [], []
+        for img in images:
+            start = time.perf_counter()
+            results = model(img, verbose=False)
+            samples.append(time.perf_counter() - start)
+            predictions.append(prediction_from_result(results[0]))
+
+        if reference is None:
+            reference = predictions
+        agreements = [compare_predictions(ref, pred) for ref, pred in zip(reference, predictions)]
+        agreement = {
+            "matched": float(np.mean([a["matched"] for a in agreements])),
+            "box_iou": float(np.mean([a["box_iou"] for a in agreements])),
+            "conf_diff": float(np.max([a["conf_diff"] for a in agreements])),
+            "mask_iou": float(np.mean([a["mask_iou"] for a in agreements])),
+        }
+        ok = (agreement["matched"] >= min_matched and agreement["box_iou"] >= min_box_iou
+              and agreement["conf_diff"] <= max_conf_diff and agreement["mask_iou"] >= min_mask_iou)
+        report[backend] = {"latency": summarize(samples), "agreement": agreement, "ok": ok}
+
+    best = min((b for b in report if report[b]["ok"]), key=lambda b: report[b]["latency"]["p50_ms"])
+    _write_json(_sidecar_path(weights_path, "backend"), {
+        "backend": best,
+        "weights_digest": file_digest(weights_path),
+        "imgsz": imgsz,
+        "results": report,
+    })
+    return report, best
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="CPU용 백엔드(ONNX / OpenVINO) 내보내기 및 자동 선택 벤치마크")
+    parser.add_argument("weights", help=".pt 가중치 경로")
+    parser.add_argument("--images", default="img", help="벤치마크에 사용할 이미지 폴더")
+    parser.add_argument("--count", type=int, default=30, help="사용할 이미지 수")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=None,
+                        help="비교할 백엔드 (기본: 설치된 모든 백엔드)")
+    parser.add_argument("--imgsz", type=int, default=640, help="입력 크기")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    names = sorted(f for f in os.listdir(args.images) if f.lower().endswith((".png", ".jpg", ".jpeg")))
+    paths = [os.path.join(args.images, f) for f in names[:args.count]]
+    report, best = benchmark_backends(args.weights, paths, args.backends, args.imgsz)
+
+    print(f"{'backend':<10}{'p50 ms':>9}{'p95 ms':>9}{'matched':>9}{'box IoU':>9}{'conf diff':>11}{'mask IoU':>10}  ok")
+    for backend, entry in report.items():
+        latency, agreement = entry["latency"], entry["agreement"]
+        print(f"{backend:<10}{latency['p50_ms']:>9.1f}{latency['p95_ms']:>9.1f}{agreement['matched']:>9.3f}"
+              f"{agreement['box_iou']:>9.3f}{agreement['conf_diff']:>11.3f}{agreement['mask_iou']:>10.3f}"
+              f"  {'yes' if entry['ok'] else 'no'}")
+    print(f"Selected backend: {best} (saved to {_sidecar_path(args.weights, 'backend')})")
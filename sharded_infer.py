@@ -0,0 +1,231 @@
+import argparse
+import contextlib
+import itertools
+import multiprocessing as mp
+import os
+import time
+import traceback
+
+import cv2
+
+from offline_infer import batched, iter_image_paths, open_sink, result_to_record
+
+# 워커 프로세스마다 한 번만 로드되는 모델과 추론 인자
+_worker_model = None
+_worker_options = None
+_worker_error = None  # 초기화 실패 시 traceback 문자열 (예외를 올리면 Pool이 워커를 계속 다시 만듦)
+
+# 워커의 BLAS/OpenMP 스레드 수를 제한하는 환경 변수
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def default_threads_per_worker(num_workers):
+    """코어를 과다 점유하지 않도록 워커당 연산 스레드 수를 계산."""
+    return max(1, (os.cpu_count() or 1) // num_workers)
+
+
+@contextlib.contextmanager
+def _thread_limits(threads):
+    """
+    워커를 시작하는 동안 BLAS/OpenMP 스레드 수 환경 변수를 설정.
+    spawn된 워커는 offline_infer를 통해 초기화 함수보다 먼저 numpy를 가져오므로 부모에서 설정해야 적용됨.
+    """
+    saved = {name: os.environ.get(name) for name in _THREAD_ENV_VARS}
+    os.environ.update({name: str(threads) for name in _THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _init_worker(model_path, threads, options):
+    """
+    워커 프로세스 초기화. torch 스레드 수를 제한하고 모델을 한 번만 로드.
+    실패하면 예외 대신 _worker_error에 기록해 _wait_for_workers가 부모에서 보고하도록 함.
+    """
+    global _worker_model, _worker_options, _worker_error
+    try:
+        import torch
+
+        from runtime_backend import load_model
+
+        torch.set_num_threads(threads)
+        cv2.setNumThreads(1)
+        _worker_model = load_model(model_path)
+        _worker_options = options
+    except Exception:
+        _worker_error = traceback.format_exc()
+
+
+def _infer_chunk(paths):
+    """워커에서 이미지 묶음 하나를 디코딩하고 추론한 뒤 기록용 dict 리스트를 반환."""
+    include_masks = _worker_options.get("include_masks", False)
+    predict_kwargs = _worker_options.get("predict_kwargs", {})
+
+    records = []
+    images = []
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            records.append({"image": path, "error": "decode_failed", "detections": []})
+        else:
+            images.append((path, img))
+
+    if images:
+        results = _worker_model.predict([img for _, img in images], verbose=False, **predict_kwargs)
+        for (path, _), result in zip(images, results):
+            records.append(result_to_record(path, result, _worker_model.names, include_masks))
+
+    # 입력 순서 유지 (디코딩 실패 항목 포함)
+    order = {path: i for i, path in enumerate(paths)}
+    records.sort(key=lambda r: order[r["image"]])
+    return records
+
+
+def run_sharded_inference(model_path, paths, sink, num_workers=None, batch_size=8, threads_per_worker=None,
+                          include_masks=False, **predict_kwargs):
+    """
+    N개의 워커 프로세스로 오프라인 추론을 나눠 실행하고 결과를 입력 순서대로 기록.
+    입력은 batch_size 단위 묶음으로 나뉘어 비어 있는 워커에 차례로 배분.
+
+    Args:
+    - model_path: YOLO 모델 경로 (워커마다 한 번 로드).
+    - paths: 이미지 경로 반복자.
+    - sink: write(record)를 가진 출력 객체.
+    - num_workers: 워커 프로세스 수. None이면 CPU 코어 수.
+    - batch_size: 워커가 한 번에 추론할 이미지 수.
+    - threads_per_worker: 워커당 연산 스레드 수. None이면 코어 수 / 워커 수.
+    - include_masks: True이면 마스크 폴리곤도 기록.
+    - predict_kwargs: model.predict에 전달할 인자.
+
+    Returns:
+    - {"workers", "images", "failed", "detections", "seconds", "images_per_sec"}
+    """
+    num_workers = num_workers or os.cpu_count() or 1
+    threads = threads_per_worker or default_threads_per_worker(num_workers)
+    options = {"include_masks": include_masks, "predict_kwargs": predict_kwargs}
+
+    ctx = mp.get_context("spawn")  # torch 스레드 풀을 fork로 복제하지 않도록 spawn 사용
+    images = failed = detections = 0
+    with _thread_limits(threads):
+        pool = ctx.Pool(num_workers, initializer=_init_worker, initargs=(model_path, threads, options))
+    with pool:
+        _wait_for_workers(pool, num_workers)  # 모델 로드 시간은 처리량 측정에서 제외
+        start = time.perf_counter()
+        for records in pool.imap(_infer_chunk, batched(paths, batch_size)):
+            for record in records:
+                sink.write(record)
+                if "error" in record:
+                    failed += 1
+                else:
+                    images += 1
+                    detections += len(record["detections"])
+        seconds = time.perf_counter() - start
+
+    return {
+        "workers": num_workers,
+        "images": images,
+        "failed": failed,
+        "detections": detections,
+        "seconds": seconds,
+        "images_per_sec": images / seconds if seconds > 0 else 0.0,
+    }
+
+
+def _worker_status(_):
+    return os.getpid(), _worker_error
+
+
+def _wait_for_workers(pool, num_workers, timeout=600.0):
+    """
+    모든 워커가 초기화(모델 로드)를 마칠 때까지 대기.
+    워커의 초기화가 실패했거나 timeout초 안에 끝나지 않으면 RuntimeError.
+    """
+    ready = set()
+    deadline = time.monotonic() + timeout
+    while len(ready) < num_workers:
+        remaining = deadline - time.monotonic()
+        try:
+            statuses = pool.map_async(_worker_status, range(num_workers), chunksize=1).get(max(remaining, 0.0))
+        except mp.TimeoutError:
+            raise RuntimeError(f"Workers did not finish loading the model within {timeout:.0f}s") from None
+        for pid, error in statuses:
+            if error is not None:
+                raise RuntimeError(f"Worker initialization failed:\n{error}")
+            ready.add(pid)
+        if len(ready) < num_workers:
+            time.sleep(0.1)
+
+
+class _NullSink:
+    def write(self, record):
+        pass
+
+    def close(self):
+        pass
+
+
+def measure_scaling(model_path, paths, max_workers, batch_size=8, **predict_kwargs):
+    """
+    워커 수를 1, 2, 4, ... max_workers로 늘려가며 images/sec와 1워커 대비 배율을 출력.
+
+    Returns:
+    - [{"workers", "images_per_sec", "speedup"}]
+    """
+    paths = list(paths)
+    counts = sorted({1, max_workers} | {2 ** i for i in range(1, max_workers.bit_length()) if 2 ** i < max_workers})
+
+    rows = []
+    print(f"{'workers':>8}{'threads':>9}{'img/s':>10}{'speedup':>9}")
+    for workers in counts:
+        summary = run_sharded_inference(model_path, paths, _NullSink(), workers, batch_size, **predict_kwargs)
+        speedup = summary["images_per_sec"] / rows[0]["images_per_sec"] if rows else 1.0
+        rows.append({"workers": workers, "images_per_sec": summary["images_per_sec"], "speedup": speedup})
+        print(f"{workers:>8}{default_threads_per_worker(workers):>9}"
+              f"{summary['images_per_sec']:>10.2f}{speedup:>8.2f}x")
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="여러 프로세스로 나눠 실행하는 오프라인 추론")
+    parser.add_argument("inputs", nargs="+", help="이미지 폴더 또는 파일 경로")
+    parser.add_argument("--model", default="runs/segment/train2/weights/best.pt", help="YOLO 모델 경로")
+    parser.add_argument("--out", default="detections.jsonl", help="출력 경로 (.jsonl 또는 .parquet)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="워커 프로세스 수")
+    parser.add_argument("--threads", type=int, help="워커당 연산 스레드 수 (기본: 코어 수 / 워커 수)")
+    parser.add_argument("--batch", type=int, default=8, help="워커 배치 크기")
+    parser.add_argument("--conf", type=float, default=0.35, help="신뢰도 임계값")
+    parser.add_argument("--imgsz", type=int, default=640, help="추론 입력 크기")
+    parser.add_argument("--masks", action="store_true", help="마스크 폴리곤도 기록 (JSONL만)")
+    parser.add_argument("--scaling", action="store_true", help="1 ~ N 워커의 처리량 배율 측정")
+    parser.add_argument("--limit", type=int, default=200, help="--scaling에서 사용할 이미지 수")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    paths = iter_image_paths(args.inputs)
+
+    if args.scaling:
+        measure_scaling(args.model, itertools.islice(paths, args.limit), args.workers, args.batch,
+                        conf=args.conf, imgsz=args.imgsz)
+        return
+
+    sink = open_sink(args.out)
+    try:
+        summary = run_sharded_inference(
+            args.model, paths, sink, args.workers, args.batch, args.threads,
+            include_masks=args.masks, conf=args.conf, imgsz=args.imgsz)
+    finally:
+        sink.close()
+    print(f"{summary['workers']} workers: {summary['images']} images ({summary['failed']} failed), "
+          f"{summary['detections']} detections in {summary['seconds']:.1f}s "
+          f"({summary['images_per_sec']:.1f} img/s) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
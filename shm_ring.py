@@ -0,0 +1,305 @@
+import time
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+
+_MAGIC = 0x59524E47  # "YRNG"
+
+# 헤더 int64 필드 순서
+_H_MAGIC, _H_SLOTS, _H_HEIGHT, _H_WIDTH, _H_CHANNELS, _H_NEXT_SEQ, _H_LAST_SLOT, \
+    _H_WRITTEN, _H_DROPPED, _H_OVERWRITTEN, _H_STALE, _H_OCCUPIED_COUNT, _H_HELD_COUNT = range(13)
+_HEADER_INTS = 16
+# 헤더 float64 필드 순서
+_F_OCCUPIED_TOTAL, _F_OCCUPIED_MAX, _F_HELD_TOTAL, _F_HELD_MAX = range(4)
+_HEADER_FLOATS = 4
+# 슬롯 메타데이터 (슬롯마다 int64 3개 + float64 4개)
+_S_SEQ, _S_REFS, _S_FRAME_ID = range(3)
+_S_TIMESTAMP, _S_GRABBED_AT, _S_WRITTEN_AT, _S_ACQUIRED = range(4)
+_SLOT_FLOATS = 4
+
+_ALIGN = 64
+
+
+def _aligned(size):
+    return (size + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class RingFrame(NamedTuple):
+    """
+    링 슬롯 하나의 zero-copy 뷰. 슬롯을 놓아준(release) 뒤에는 내용이 바뀔 수 있음.
+
+    - seq: 링에 쓰인 순서 번호 (0부터 증가).
+    - frame_id: 소스 프레임 번호.
+    - timestamp: 소스 기준 시각 (초).
+    - grabbed_at: 캡처 프로세스가 grab을 시작한 시각 (time.monotonic 기준, 프로세스 사이에서 공통).
+    - written_at: 슬롯 쓰기를 마친 시각 (time.monotonic 기준).
+    - color: (H, W, C) uint8 뷰.
+    - depth: (H, W) float32 뷰.
+    """
+    seq: int
+    frame_id: int
+    timestamp: float
+    grabbed_at: float
+    written_at: float
+    color: np.ndarray
+    depth: np.ndarray
+
+
+class FrameRing:
+    """
+    프로세스 사이에서 컬러 + Depth 프레임을 주고받는 고정 슬롯 공유 메모리 링 버퍼.
+
+    쓰는 쪽(캡처 프로세스 하나)은 읽는 쪽이 잡고 있지 않은 가장 오래된 슬롯에 새 프레임을 씀.
+    읽는 쪽은 acquire로 슬롯을 잡고 zero-copy NumPy 뷰로 읽은 뒤 release로 놓아줌.
+    잡힌 슬롯은 덮어쓰지 않으며, 모든 슬롯이 잡혀 있으면 새 프레임을 버림(dropped).
+    슬롯마다 순서 번호(seq)를 기록해, 읽기 전에 덮어쓰인 프레임을 감지.
+
+    상태 변경(잡기/놓기/슬롯 선택)만 lock 안에서 하고, 프레임 복사는 lock 밖에서 함.
+    직접 생성하지 말고 FrameRing.create / FrameRing.attach를 사용.
+    """
+
+    def __init__(self, shm, lock, owner):
+        self._shm = shm
+        self._lock = lock
+        self._owner = owner
+
+        ints = np.ndarray((_HEADER_INTS,), dtype=np.int64, buffer=shm.buf)
+        if ints[_H_MAGIC] != _MAGIC:
+            raise ValueError(f"Shared memory '{shm.name}' is not a frame ring")
+        slots, height, width, channels = (int(v) for v in ints[_H_SLOTS:_H_CHANNELS + 1])
+        self.slots = slots
+        self.shape = (height, width)
+        self.channels = channels
+
+        offset = _HEADER_INTS * 8
+        self._ints = ints
+        self._floats = np.ndarray((_HEADER_FLOATS,), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset += _HEADER_FLOATS * 8
+        self._slot_ints = np.ndarray((slots, 3), dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += slots * 3 * 8
+        self._slot_floats = np.ndarray((slots, _SLOT_FLOATS), dtype=np.float64, buffer=shm.buf, offset=offset)
+        offset = _aligned(offset + slots * _SLOT_FLOATS * 8)
+
+        color_size = _aligned(height * width * channels)
+        depth_size = _aligned(height * width * 4)
+        self._color = [np.ndarray((height, width, channels), dtype=np.uint8, buffer=shm.buf,
+                                  offset=offset + i * color_size) for i in range(slots)]
+        offset += slots * color_size
+        self._depth = [np.ndarray((height, width), dtype=np.float32, buffer=shm.buf,
+                                  offset=offset + i * depth_size) for i in range(slots)]
+
+    @staticmethod
+    def nbytes(slots, shape, channels):
+        """링 전체 크기 (바이트)."""
+        height, width = shape
+        meta = _aligned((_HEADER_INTS + _HEADER_FLOATS + slots * (3 + _SLOT_FLOATS)) * 8)
+        return meta + slots * (_aligned(height * width * channels) + _aligned(height * width * 4))
+
+    @classmethod
+    def create(cls, lock, slots, shape, channels=3, name=None):
+        """
+        새 링을 생성 (소유 프로세스에서 한 번).
+
+        Args:
+        - lock: 프로세스 사이에서 공유하는 multiprocessing Lock.
+        - slots: 슬롯 수.
+        - shape: 프레임 크기 (H, W).
+        - channels: 컬러 채널 수 (BGR이면 3, BGRA이면 4).
+        - name: 공유 메모리 이름. None이면 자동 생성.
+        """
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.nbytes(slots, shape, channels))
+        ints = np.ndarray((_HEADER_INTS,), dtype=np.int64, buffer=shm.buf)
+        ints[:] = 0
+        ints[_H_MAGIC] = _MAGIC
+        ints[_H_SLOTS], (ints[_H_HEIGHT], ints[_H_WIDTH]), ints[_H_CHANNELS] = slots, shape, channels
+        ints[_H_LAST_SLOT] = slots - 1
+        ring = cls(shm, lock, owner=True)
+        ring._floats[:] = 0.0
+        ring._slot_ints[:] = 0
+        ring._slot_ints[:, _S_SEQ] = -1
+        ring._slot_floats[:] = 0.0
+        return ring
+
+    @classmethod
+    def attach(cls, name, lock):
+        """다른 프로세스에서 이름으로 기존 링에 연결."""
+        return cls(shared_memory.SharedMemory(name=name), lock, owner=False)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    # ------------------------------------------------------------------
+    # 쓰기 (캡처 프로세스)
+    # ------------------------------------------------------------------
+
+    def write(self, frame_id, timestamp, color, depth, grabbed_at=None):
+        """
+        프레임 하나를 빈 슬롯에 복사.
+
+        Args:
+        - frame_id, timestamp: 소스 프레임 번호와 시각.
+        - color: (H, W, C) uint8 배열 (ZED BGRA 뷰의 [:, :, :3]처럼 strided 뷰도 가능).
+        - depth: (H, W) float32 배열.
+        - grabbed_at: grab 시작 시각 (time.monotonic 기준). None이면 현재 시각.
+
+        Returns:
+        - 쓴 프레임의 seq. 모든 슬롯이 잡혀 있어 버렸으면 None.
+        """
+        now = time.monotonic()
+        grabbed_at = now if grabbed_at is None else grabbed_at
+        with self._lock:
+            slot = self._pick_slot()
+            if slot is None:
+                self._ints[_H_DROPPED] += 1
+                return None
+            if self._slot_ints[slot, _S_SEQ] >= 0:
+                # 아무도 읽지 않은 프레임을 덮어씀
+                if self._slot_floats[slot, _S_ACQUIRED] == 0.0:
+                    self._ints[_H_OVERWRITTEN] += 1
+                self._record_occupancy(slot, now)
+            self._slot_ints[slot, _S_SEQ] = -1  # 쓰는 중
+            self._ints[_H_LAST_SLOT] = slot
+
+        np.copyto(self._color[slot], color)
+        np.copyto(self._depth[slot], depth)
+
+        with self._lock:
+            seq = int(self._ints[_H_NEXT_SEQ])
+            self._ints[_H_NEXT_SEQ] += 1
+            self._ints[_H_WRITTEN] += 1
+            self._slot_ints[slot, _S_SEQ] = seq
+            self._slot_ints[slot, _S_FRAME_ID] = frame_id
+            self._slot_floats[slot, _S_TIMESTAMP] = timestamp
+            self._slot_floats[slot, _S_GRABBED_AT] = grabbed_at
+            self._slot_floats[slot, _S_WRITTEN_AT] = time.monotonic()
+            self._slot_floats[slot, _S_ACQUIRED] = 0.0
+        return seq
+
+    def _pick_slot(self):
+        """마지막으로 쓴 슬롯 다음부터 잡혀 있지 않은 슬롯을 찾음."""
+        start = int(self._ints[_H_LAST_SLOT]) + 1
+        for k in range(self.slots):
+            slot = (start + k) % self.slots
+            if self._slot_ints[slot, _S_REFS] == 0:
+                return slot
+        return None
+
+    def _record_occupancy(self, slot, now):
+        """슬롯이 프레임을 담고 있던 시간(쓰기 완료 ~ 덮어쓰기)을 누적."""
+        occupied = now - self._slot_floats[slot, _S_WRITTEN_AT]
+        self._ints[_H_OCCUPIED_COUNT] += 1
+        self._floats[_F_OCCUPIED_TOTAL] += occupied
+        self._floats[_F_OCCUPIED_MAX] = max(self._floats[_F_OCCUPIED_MAX], occupied)
+
+    # ------------------------------------------------------------------
+    # 읽기 (추론 / 측정 프로세스)
+    # ------------------------------------------------------------------
+
+    def _frame(self, slot):
+        timestamp, grabbed_at, written_at, _ = self._slot_floats[slot].tolist()
+        return RingFrame(int(self._slot_ints[slot, _S_SEQ]), int(self._slot_ints[slot, _S_FRAME_ID]),
+                         timestamp, grabbed_at, written_at, self._color[slot], self._depth[slot])
+
+    def latest_seq(self):
+        """가장 최근에 쓴 프레임의 seq (아직 없으면 -1)."""
+        return int(self._ints[_H_NEXT_SEQ]) - 1
+
+    def acquire(self, after_seq=-1):
+        """
+        seq가 after_seq보다 큰 가장 최근 프레임의 슬롯을 잡음.
+
+        Returns:
+        - RingFrame 또는 None (새 프레임 없음).
+        """
+        with self._lock:
+            seqs = self._slot_ints[:, _S_SEQ]
+            slot = int(np.argmax(seqs))
+            if seqs[slot] <= after_seq:
+                return None
+            self._slot_ints[slot, _S_REFS] += 1
+            if self._slot_floats[slot, _S_ACQUIRED] == 0.0:
+                self._slot_floats[slot, _S_ACQUIRED] = time.monotonic()
+            return self._frame(slot)
+
+    def wait(self, after_seq=-1, timeout=1.0, poll=0.0005):
+        """새 프레임이 들어올 때까지 기다렸다가 acquire. timeout이 지나면 None."""
+        deadline = time.monotonic() + timeout
+        while True:
+            frame = self.acquire(after_seq)
+            if frame is not None or time.monotonic() >= deadline:
+                return frame
+            time.sleep(poll)
+
+    def get(self, seq):
+        """
+        seq 프레임이 아직 슬롯에 있으면 뷰를 반환 (잡지 않음). 이미 덮어쓰였으면 None (stale로 셈).
+        다른 프로세스가 잡은 슬롯을 넘겨받을 때 사용.
+        """
+        with self._lock:
+            matches = np.flatnonzero(self._slot_ints[:, _S_SEQ] == seq)
+            if not len(matches):
+                self._ints[_H_STALE] += 1
+                return None
+            return self._frame(int(matches[0]))
+
+    def release(self, seq):
+        """seq 프레임 슬롯을 놓아줌. 잡은 프로세스와 다른 프로세스에서 호출해도 됨."""
+        with self._lock:
+            matches = np.flatnonzero(self._slot_ints[:, _S_SEQ] == seq)
+            if not len(matches) or self._slot_ints[matches[0], _S_REFS] == 0:
+                return
+            slot = matches[0]
+            self._slot_ints[slot, _S_REFS] -= 1
+            if self._slot_ints[slot, _S_REFS] == 0:
+                # 처음 잡은 시각부터 마지막으로 놓을 때까지의 시간을 누적
+                held = time.monotonic() - self._slot_floats[slot, _S_ACQUIRED]
+                self._ints[_H_HELD_COUNT] += 1
+                self._floats[_F_HELD_TOTAL] += held
+                self._floats[_F_HELD_MAX] = max(self._floats[_F_HELD_MAX], held)
+
+    def is_current(self, frame):
+        """frame을 읽는 동안 슬롯이 덮어쓰이지 않았는지 확인 (잡지 않고 읽은 뷰의 검증용)."""
+        return frame.seq in self._slot_ints[:, _S_SEQ]
+
+    # ------------------------------------------------------------------
+
+    def stats(self):
+        """
+        쓴 프레임 수, 버린 프레임 수(빈 슬롯 없음), 읽히기 전에 덮어쓴 프레임 수,
+        이미 덮어쓰인 seq를 요청한 횟수(stale), 현재 잡힌 슬롯 수,
+        슬롯 점유 시간(쓰기 완료 ~ 덮어쓰기, ms), 읽는 쪽이 슬롯을 잡고 있던 시간(ms).
+        """
+        with self._lock:
+            count = int(self._ints[_H_OCCUPIED_COUNT])
+            total = float(self._floats[_F_OCCUPIED_TOTAL])
+            held_count = int(self._ints[_H_HELD_COUNT])
+            held_total = float(self._floats[_F_HELD_TOTAL])
+            return {
+                "written": int(self._ints[_H_WRITTEN]),
+                "dropped": int(self._ints[_H_DROPPED]),
+                "overwritten": int(self._ints[_H_OVERWRITTEN]),
+                "stale": int(self._ints[_H_STALE]),
+                "held": int(np.count_nonzero(self._slot_ints[:, _S_REFS])),
+                "occupancy_mean_ms": total / count * 1000.0 if count else 0.0,
+                "occupancy_max_ms": float(self._floats[_F_OCCUPIED_MAX]) * 1000.0,
+                "held_mean_ms": held_total / held_count * 1000.0 if held_count else 0.0,
+                "held_max_ms": float(self._floats[_F_HELD_MAX]) * 1000.0,
+            }
+
+    def close(self):
+        """뷰를 정리하고 공유 메모리 연결을 닫음. 소유 프로세스면 공유 메모리도 삭제."""
+        self._color = self._depth = None
+        self._ints = self._floats = self._slot_ints = self._slot_floats = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def format_ring_stats(stats):
+    """FrameRing.stats() 결과를 한 줄 문자열로 변환."""
+    return (f"ring written={stats['written']} dropped={stats['dropped']} overwritten={stats['overwritten']} "
+            f"stale={stats['stale']} held={stats['held']} "
+            f"occupancy mean={stats['occupancy_mean_ms']:.1f}ms max={stats['occupancy_max_ms']:.1f}ms "
+            f"held mean={stats['held_mean_ms']:.1f}ms max={stats['held_max_ms']:.1f}ms")
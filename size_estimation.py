@@ -0,0 +1,122 @@
+import numpy as np
+
+from depth_index import box_centers, pappus_sample_points
+
+
+def calculate_box_dimensions(x1, x2, y1, y2, depth, fx, fy):
+    """
+    Bounding Box의 실제 너비와 높이를 계산.
+    초점 거리를 이용해서 실제 거리를 구함. 스칼라와 배열 모두 지원.
+    """
+    pixel_width = x2 - x1
+    pixel_height = y2 - y1
+    real_width = (pixel_width * depth) / fx
+    real_height = (pixel_height * depth) / fy
+    return real_width, real_height
+
+
+def calculate_pappus_length(depth_a, depth_b, depth_center):
+    """
+    양 끝점과 중심점의 Depth로 파푸스 중선정리를 적용해 길이를 계산.
+    스칼라와 배열 모두 지원.
+
+    Args:
+    - depth_a, depth_b: 양 끝점의 Depth 값.
+    - depth_center: 중심점의 Depth 값.
+
+    Returns:
+    - 길이. 세 값 중 하나라도 0.0(유효하지 않음)이면 0.0.
+    """
+    valid = (depth_a != 0.0) & (depth_b != 0.0) & (depth_center != 0.0)
+    length = 2 * np.sqrt((depth_a**2 + depth_b**2) / 2 - depth_center**2)
+    return np.where(valid, length, 0.0)
+
+
+PINHOLE = "pinhole"
+PAPPUS = "pappus"
+POINT_CLOUD = "point_cloud"
+ESTIMATORS = (PINHOLE, PAPPUS, POINT_CLOUD)
+
+
+class SizeEstimator:
+    """
+    한 프레임의 모든 박스에 대해 여러 크기 추정 방식을 배열 연산으로 한 번에 계산.
+
+    - PINHOLE: 중심 Depth x 픽셀 크기 / 초점 거리.
+    - PAPPUS: 중심/좌/우/상/하 Depth에 파푸스 중선정리 적용.
+    - POINT_CLOUD: 포인트 클라우드의 좌상단/우하단 3D 좌표 차이.
+
+    중심 Depth처럼 여러 방식이 공유하는 값은 한 번만 조회하고(파푸스를 쓰면 5개 샘플 조회에 포함),
+    결과는 미리 할당한 버퍼에 쓰므로 박스가 많아도 프레임당 추가 할당이 거의 없음.
+
+    Args:
+    - fx, fy: 초점 거리 (픽셀).
+    - estimators: 계산할 방식 목록 (ESTIMATORS 중에서).
+    - capacity: 처음 할당할 박스 수 (넘으면 두 배씩 늘림).
+    """
+
+    def __init__(self, fx, fy, estimators=(PINHOLE,), capacity=64):
+        unknown = set(estimators) - set(ESTIMATORS)
+        if unknown:
+            raise ValueError(f"Unknown size estimators: {', '.join(sorted(unknown))}")
+        self.fx, self.fy = fx, fy
+        self.estimators = tuple(estimators)
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self._depths = np.zeros(capacity, dtype=np.float32)
+        self._sizes = np.zeros((capacity, len(self.estimators), 2), dtype=np.float32)
+        self._pixels = np.zeros((capacity, 2), dtype=np.float32)
+
+    def estimate(self, boxes, context=None, center_depths=None):
+        """
+        Args:
+        - boxes: 바운딩 박스 (N, 4) 정수 xyxy.
+        - context: measurement_context.FrameMeasurementContext. 중심 Depth를 조회하거나 PAPPUS, POINT_CLOUD를 쓸 때 필요.
+        - center_depths: 이미 측정한 중심 Depth (N,) (예: 마스크 내부 중앙값). 없으면 Depth 인덱스에서 조회.
+
+        Returns:
+        - (depths (N,), sizes (N, len(estimators), 2) 가로/세로 m). 유효하지 않으면 0.
+          내부 버퍼의 뷰이므로 다음 호출 전까지만 유효 (보관하려면 복사).
+        """
+        boxes = np.asarray(boxes).reshape(-1, 4).astype(np.int32, copy=False)
+        n = len(boxes)
+        if n > self.capacity:
+            self._allocate(max(n, 2 * self.capacity))
+        depths, sizes, pixels = self._depths[:n], self._sizes[:n], self._pixels[:n]
+        if n == 0:
+            return depths, sizes
+
+        samples = None
+        if PAPPUS in self.estimators:
+            samples = context.lookup_depths(pappus_sample_points(boxes), boxes)
+        if center_depths is not None:
+            depths[:] = center_depths
+        elif samples is not None:
+            depths[:] = samples[:, 0]
+        elif PINHOLE in self.estimators:
+            depths[:] = context.lookup_depths(box_centers(boxes), boxes)
+        else:
+            # 포인트 클라우드만 쓰면 Depth를 따로 가져오지 않고 중심점의 Z 값을 사용
+            # ZED 포인트 클라우드는 너무 가깝거나 먼 픽셀을 ±inf로 표시하므로 NaN과 함께 0으로 처리
+            center_z = context.get_3d_points(box_centers(boxes))[:, 2]
+            depths[:] = np.nan_to_num(center_z, nan=0.0, posinf=0.0, neginf=0.0)
+
+        np.subtract(boxes[:, 2:], boxes[:, :2], out=pixels, casting="unsafe")
+        for k, name in enumerate(self.estimators):
+            out = sizes[:, k]
+            if name == PINHOLE:
+                np.multiply(pixels, depths[:, None], out=out)
+                out /= (self.fx, self.fy)
+            elif name == PAPPUS:
+                _, left, right, top, bottom = samples.T
+                with np.errstate(invalid="ignore"):
+                    out[:, 0] = calculate_pappus_length(left, right, depths)
+                    out[:, 1] = calculate_pappus_length(top, bottom, depths)
+                np.nan_to_num(out, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+            else:
+                corners = context.get_3d_points(boxes.reshape(-1, 2, 2))
+                np.abs(corners[:, 1, :2] - corners[:, 0, :2], out=out, casting="unsafe")
+                np.nan_to_num(out, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        return depths, sizes
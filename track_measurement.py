@@ -0,0 +1,288 @@
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from inference_cache import Prediction
+from size_estimation import calculate_box_dimensions
+
+
+def _box_geometry(boxes):
+    """xyxy 박스의 중심 (N, 2), 대각선 길이 (N,), 넓이 (N,)."""
+    sizes = boxes[:, 2:] - boxes[:, :2]
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    return centers, np.hypot(sizes[:, 0], sizes[:, 1]), sizes[:, 0] * sizes[:, 1]
+
+
+class TrackMeasurements:
+    """
+    트랙 번호별 거리/크기 상태. 매 프레임 모든 박스를 다시 측정하는 대신,
+    박스가 마지막 측정 때보다 충분히 움직이거나 커졌을 때만 Depth를 다시 샘플하고
+    측정값은 (Depth, 가로, 세로) 성분별 1차원 칼만 필터로 누적해 프레임 사이 흔들림을 줄임.
+
+    크기 추정기(estimate_sizes)가 있으면 트랙이 처음 나타났을 때와 박스가 grow_threshold 이상 커졌을 때만
+    실행하므로, 파푸스 샘플링이나 포인트 클라우드처럼 비싼 추정기도 프레임마다가 아니라 객체마다 한 번 실행됨.
+
+    Args:
+    - move_threshold: 박스 중심이 마지막 샘플 위치에서 (박스 대각선 대비) 이 비율 이상 움직이면 다시 샘플.
+    - grow_threshold: 박스 넓이가 마지막 샘플 때보다 이 비율 이상 변하면 다시 샘플.
+    - refresh_every: 움직임이 없어도 이 프레임 수가 지나면 다시 샘플 (0이면 다시 샘플하지 않음).
+    - process_noise: 프레임당 상태 분산 증가량 (m^2). 클수록 새 측정을 빨리 따라감.
+    - measurement_noise: 측정 분산 (m^2).
+    - max_missed: 트랙이 보이지 않아도 상태를 유지할 프레임 수.
+    """
+
+    def __init__(self, move_threshold=0.1, grow_threshold=0.2, refresh_every=30, process_noise=1e-4,
+                 measurement_noise=4e-3, max_missed=30):
+        self.move_threshold = move_threshold
+        self.grow_threshold = grow_threshold
+        self.refresh_every = refresh_every
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.max_missed = max_missed
+        self.boxes = 0
+        self.depth_samples = 0
+        self.size_estimates = 0
+        self._rows = {}  # 트랙 번호 -> 상태 배열의 행
+        self._state = np.zeros((0, 3), dtype=np.float64)  # (Depth, 가로, 세로) m, 0이면 측정 전
+        self._var = np.zeros((0, 3), dtype=np.float64)
+        self._reference = np.zeros((0, 4), dtype=np.float32)  # 마지막으로 샘플한 박스
+        self._since = np.zeros(0, dtype=np.int64)  # 마지막 샘플 후 지난 프레임 수
+        self._missed = np.zeros(0, dtype=np.int64)
+
+    def _rows_for(self, track_ids, boxes):
+        """트랙 번호별 상태 행을 찾고, 처음 보는 트랙은 행을 추가. Returns: (행 (N,), 새 트랙 여부 (N,))."""
+        rows = np.array([self._rows.get(i, -1) for i in track_ids.tolist()], dtype=np.int64)
+        new = rows < 0
+        if new.any():
+            start, count = len(self._state), int(new.sum())
+            rows[new] = np.arange(start, start + count)
+            self._rows.update(zip(track_ids[new].tolist(), rows[new].tolist()))
+            self._state = np.concatenate([self._state, np.zeros((count, 3))])
+            self._var = np.concatenate([self._var, np.zeros((count, 3))])
+            self._reference = np.concatenate([self._reference, boxes[new]])
+            self._since = np.concatenate([self._since, np.zeros(count, dtype=np.int64)])
+            self._missed = np.concatenate([self._missed, np.zeros(count, dtype=np.int64)])
+        return rows, new
+
+    def _drop_missing(self, rows):
+        """이번 프레임에 없는 트랙의 missed를 늘리고 max_missed를 넘은 트랙의 상태를 삭제."""
+        seen = np.zeros(len(self._state), dtype=bool)
+        seen[rows] = True
+        self._missed = np.where(seen, 0, self._missed + 1)
+        keep = self._missed <= self.max_missed
+        if keep.all():
+            return
+        remap = np.cumsum(keep) - 1
+        self._rows = {i: int(remap[r]) for i, r in self._rows.items() if keep[r]}
+        self._state, self._var = self._state[keep], self._var[keep]
+        self._reference, self._since, self._missed = self._reference[keep], self._since[keep], self._missed[keep]
+
+    def _correct(self, rows, columns, measured):
+        """rows 행의 columns 성분에 측정값을 반영. 0 이하(유효하지 않음)인 측정은 무시."""
+        state, var = self._state[rows][:, columns], self._var[rows][:, columns]
+        valid = measured > 0
+        first = valid & (state <= 0)
+        gain = var / (var + self.measurement_noise)
+        state = np.where(first, measured, np.where(valid, state + gain * (measured - state), state))
+        var = np.where(first, self.measurement_noise, np.where(valid, (1 - gain) * var, var))
+        self._state[rows[:, None], columns] = state
+        self._var[rows[:, None], columns] = var
+
+    def update(self, track_ids, boxes, sample_depths, fx, fy, estimate_sizes=None):
+        """
+        이번 프레임의 트랙별 거리와 크기를 계산.
+
+        Args:
+        - track_ids: 트랙 번호 (N,) int64.
+        - boxes: xyxy 박스 (N, 4).
+        - sample_depths: 박스 인덱스 배열을 받아 그 박스들의 Depth (M,)를 반환하는 함수 (0이면 유효하지 않음).
+        - fx, fy: 초점 거리 (픽셀).
+        - estimate_sizes: (박스 인덱스 배열, 그 박스들의 Depth)를 받아 (M, 2) 가로/세로(m)를 반환하는 함수.
+          None이면 필터링된 Depth와 박스 크기로 핀홀 크기를 계산.
+
+        Returns:
+        - (depth_values (N,) float32, sizes (N, 2) float32). 유효한 측정이 아직 없으면 0.
+        """
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        rows, new = self._rows_for(track_ids, boxes)
+        self._drop_missing(rows)
+        rows = np.array([self._rows[i] for i in track_ids.tolist()], dtype=np.int64)
+        self._var[rows] += self.process_noise
+        self._since[rows] += 1
+        self.boxes += len(rows)
+
+        centers, diagonals, areas = _box_geometry(boxes)
+        ref_centers, _, ref_areas = _box_geometry(self._reference[rows])
+        moved = np.linalg.norm(centers - ref_centers, axis=1) > self.move_threshold * np.maximum(diagonals, 1.0)
+        grown = np.abs(areas - ref_areas) > self.grow_threshold * np.maximum(ref_areas, 1.0)
+        stale = self._since[rows] >= self.refresh_every if self.refresh_every else np.zeros(len(rows), dtype=bool)
+        unmeasured = self._state[rows, 0] <= 0
+        resample = new | moved | grown | stale | unmeasured
+
+        if resample.any():
+            index = np.flatnonzero(resample)
+            measured = np.asarray(sample_depths(index), dtype=np.float64)
+            self._correct(rows[index], [0], measured[:, None])
+            self._reference[rows[index]] = boxes[index]
+            self._since[rows[index]] = 0
+            self.depth_samples += len(index)
+
+            if estimate_sizes is not None:
+                # 비싼 추정기는 새 트랙과 크게 변한 박스만, 크기가 아직 없으면 다시 시도
+                size_index = np.flatnonzero(new | grown | (self._state[rows, 1] <= 0))
+                if len(size_index):
+                    sizes = np.asarray(estimate_sizes(size_index, self._state[rows[size_index], 0]), dtype=np.float64)
+                    self._correct(rows[size_index], [1, 2], sizes.reshape(-1, 2))
+                    self.size_estimates += len(size_index)
+            else:
+                widths, heights = calculate_box_dimensions(
+                    boxes[index, 0], boxes[index, 2], boxes[index, 1], boxes[index, 3],
+                    self._state[rows[index], 0], fx, fy)
+                self._correct(rows[index], [1, 2], np.stack([widths, heights], axis=1))
+
+        state = self._state[rows].astype(np.float32)
+        return state[:, 0], state[:, 1:]
+
+    def stats(self):
+        """처리한 박스 수, Depth를 다시 샘플한 박스 수와 비율, 크기 추정기 실행 수, 유지 중인 트랙 수."""
+        return {
+            "boxes": self.boxes,
+            "depth_samples": self.depth_samples,
+            "sample_ratio": self.depth_samples / self.boxes if self.boxes else 0.0,
+            "size_estimates": self.size_estimates,
+            "tracks": len(self._rows),
+        }
+
+
+def format_measurement_stats(stats):
+    """TrackMeasurements.stats() 결과를 한 줄 문자열로 변환."""
+    return (f"measurement: depth sampled {stats['depth_samples']}/{stats['boxes']} boxes "
+            f"({stats['sample_ratio'] * 100:.0f}%), size estimator {stats['size_estimates']} calls, "
+            f"{stats['tracks']} tracks")
+
+
+def _mean_or_none(chunks):
+    values = np.concatenate(chunks) if chunks else np.zeros(0)
+    return float(values.mean()) if len(values) else None
+
+
+def evaluate_jitter(frames, track_ids, boxes, calibration, estimator, truth=None):
+    """
+    같은 프레임과 트랙에 대해 매 프레임 측정과 트랙별 누적 측정의 비용, 흔들림, 정확도를 비교.
+
+    Args:
+    - frames: Frame 리스트 (Depth 사용).
+    - track_ids, boxes: 프레임별 트랙 번호 (N,)와 박스 (N, 4) int32 리스트.
+    - calibration: CameraCalibration.
+    - estimator: benchmark.MEASUREMENT_VARIANTS의 측정 함수 (depth, boxes, context, calibration) -> (Depth, 가로, 세로).
+    - truth: 프레임별 실제 가로/세로 (N, 2) 리스트 또는 None.
+
+    Returns:
+    - {"per_frame": {...}, "per_track": {...}}. 각각 ms_per_frame, 추정기에 넘긴 박스 수(estimator_boxes,
+      트랙별 모드는 Depth 샘플과 크기 추정을 모두 포함), 트랙별 프레임 간 가로/세로 변화량의 평균(jitter_m),
+      실제 크기 대비 평균 절대 오차(error_m, truth가 없으면 None).
+    """
+    from frame_source import depth_to_xyz
+    from measurement_context import FrameMeasurementContext
+
+    def jitter(history):
+        steps = [np.abs(np.diff(np.array(values), axis=0)) for values in history.values() if len(values) > 1]
+        return float(np.concatenate(steps).mean()) if steps else 0.0
+
+    report = {}
+    for mode in ("per_frame", "per_track"):
+        measurements = TrackMeasurements()
+        history, errors, calls, elapsed = {}, [], 0, 0.0
+        for k, (frame, ids, frame_boxes) in enumerate(zip(frames, track_ids, boxes)):
+            context = FrameMeasurementContext(lambda depth=frame.depth: depth,
+                                              lambda depth=frame.depth: depth_to_xyz(depth, calibration))
+            start = time.perf_counter()
+            if mode == "per_frame":
+                _, widths, heights = estimator(frame.depth, frame_boxes, context, calibration)
+                sizes = np.stack([widths, heights], axis=1)
+                calls += len(frame_boxes)
+            else:
+                def sample_depths(index):
+                    nonlocal calls
+                    calls += len(index)
+                    return estimator(frame.depth, frame_boxes[index], context, calibration)[0]
+
+                def estimate_sizes(index, _depths):
+                    nonlocal calls
+                    calls += len(index)
+                    _, widths, heights = estimator(frame.depth, frame_boxes[index], context, calibration)
+                    return np.stack([widths, heights], axis=1)
+
+                _, sizes = measurements.update(ids, frame_boxes, sample_depths, calibration.fx, calibration.fy,
+                                               estimate_sizes)
+            elapsed += time.perf_counter() - start
+            sizes = np.asarray(sizes, dtype=np.float64)
+            valid = (sizes > 0).all(axis=1)  # NaN(파푸스 실패)도 제외
+            for track_id, size in zip(ids[valid].tolist(), sizes[valid].tolist()):
+                history.setdefault(track_id, []).append(size)
+            if truth is not None:
+                errors.append(np.abs(sizes[valid] - truth[k][valid]).ravel())
+        report[mode] = {"ms_per_frame": elapsed * 1000.0 / len(frames), "estimator_boxes": calls,
+                        "jitter_m": jitter(history),
+                        "error_m": _mean_or_none(errors)}
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="매 프레임 측정과 트랙별 누적 측정의 비용/흔들림 비교")
+    parser.add_argument("--source", default="synthetic", help='"synthetic" 또는 녹화 폴더 경로')
+    parser.add_argument("--model", default="none", help='YOLO 모델 경로. "none"이면 합성 소스의 정답 박스 사용')
+    parser.add_argument("--frames", type=int, default=120, help="사용할 프레임 수")
+    parser.add_argument("--box-noise", type=float, default=2.0,
+                        help='"none"일 때 정답 박스에 더할 탐지 흔들림 (픽셀 표준편차)')
+    parser.add_argument("--variants", default="pinhole,pappus,point_cloud", help="비교할 측정 방식 (쉼표 구분)")
+    return parser.parse_args()
+
+
+def main():
+    from benchmark import MEASUREMENT_VARIANTS, make_detector
+    from frame_source import open_frame_source
+    from tracker import OpticalFlowTracker
+
+    args = parse_args()
+    frame_source = open_frame_source(args.source, realtime=False, loop=True)
+    detect, _ = make_detector(args.model, frame_source)
+    rng = np.random.default_rng(0)
+    tracker = OpticalFlowTracker()
+
+    # 프레임과 트랙 번호를 미리 만들어 두고 같은 입력으로 두 방식을 비교.
+    # 모델 없이 합성 소스를 쓰면 박스 순서가 정답과 같으므로 실제 크기도 함께 보관
+    use_truth = args.model == "none" and getattr(frame_source, "object_sizes", None) is not None
+    frames, track_ids, boxes, truth = [], [], [], []
+    for _ in range(args.frames):
+        frame = frame_source.read()
+        bgr = np.ascontiguousarray(frame.bgr)
+        frame_boxes, classes, _ = detect(bgr)
+        if args.model == "none":
+            frame_boxes = frame_boxes + rng.normal(0, args.box_noise, frame_boxes.shape)
+        frame_boxes = np.clip(frame_boxes, 0, [bgr.shape[1] - 1, bgr.shape[0] - 1] * 2).astype(np.int32)
+        prediction = Prediction(frame_boxes.astype(np.float32), np.asarray(classes, dtype=np.int32),
+                                np.ones(len(frame_boxes), dtype=np.float32), None, bgr.shape[:2])
+        frames.append(frame._replace(depth=np.array(frame.depth)))
+        track_ids.append(tracker.update(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), prediction))
+        boxes.append(frame_boxes)
+        if use_truth:
+            truth.append(frame_source.object_sizes.copy())
+    calibration = frame_source.calibration
+    frame_source.close()
+
+    print(f"{'variant':<13}{'mode':<11}{'ms/frame':>10}{'estimator boxes':>17}{'jitter (m)':>12}{'error (m)':>11}")
+    for name in [v for v in args.variants.split(",") if v]:
+        report = evaluate_jitter(frames, track_ids, boxes, calibration, MEASUREMENT_VARIANTS[name],
+                                 truth if use_truth else None)
+        for mode, row in report.items():
+            error = f"{row['error_m']:.4f}" if row["error_m"] is not None else "-"
+            print(f"{name:<13}{mode:<11}{row['ms_per_frame']:>10.2f}{row['estimator_boxes']:>17}"
+                  f"{row['jitter_m']:>12.4f}{error:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+import argparse
+import itertools
+import time
+
+import cv2
+import numpy as np
+
+from inference_cache import Prediction
+from metrics import box_iou_matrix, greedy_match
+
+# 피라미드 Lucas-Kanade 파라미터
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+
+class Track:
+    """
+    추적 중인 객체 하나.
+
+    - id: 고유 번호 (탐지 사이에서도 유지).
+    - cls, conf: 마지막 탐지의 클래스와 신뢰도.
+    - box: xyxy 박스 (float32, 원본 영상 좌표).
+    - mask: 추론 해상도(레터박스) 마스크 또는 None.
+    - points: 박스 안에서 추적하는 특징점 (K, 1, 2) float32.
+    - quality: 직전 추적에서 성공한 특징점 비율 (0 ~ 1).
+    - depth: 마지막으로 측정한 거리 (m). 측정 전이면 0.
+    - depth_box: depth를 측정할 때의 박스 (재측정 여부 판단에 사용).
+    """
+
+    __slots__ = ("id", "cls", "conf", "box", "mask", "points", "quality", "missed", "depth", "depth_box")
+
+    def __init__(self, track_id, cls, conf, box, mask):
+        self.id = track_id
+        self.cls = cls
+        self.conf = conf
+        self.box = box
+        self.mask = mask
+        self.points = np.zeros((0, 1, 2), dtype=np.float32)
+        self.quality = 1.0
+        self.missed = 0
+        self.depth = 0.0
+        self.depth_box = None
+
+
+class OpticalFlowTracker:
+    """
+    탐지 결과를 IoU로 기존 트랙에 연결하고, 탐지 사이 프레임에서는 희소 광류(Lucas-Kanade)로
+    박스와 마스크를 이동시키는 CPU 추적기.
+
+    Args:
+    - iou_threshold: 탐지와 트랙을 같은 객체로 보는 최소 IoU.
+    - max_points: 트랙당 추적할 최대 특징점 수.
+    - max_missed: 탐지에서 연속으로 빠져도 유지할 횟수.
+    - fb_threshold: 정방향/역방향 추적 오차(픽셀)가 이보다 큰 점은 실패로 처리.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_points=24, max_missed=1, fb_threshold=1.5):
+        self.iou_threshold = iou_threshold
+        self.max_points = max_points
+        self.max_missed = max_missed
+        self.fb_threshold = fb_threshold
+        self.tracks = []
+        self.orig_shape = None
+        self._ids = itertools.count(1)
+        self._gray = None
+        self.depth_reused = 0
+        self.depth_measured = 0
+
+    def _sample_points(self, gray, track):
+        h, w = gray.shape
+        x1, y1, x2, y2 = np.clip(np.round(track.box).astype(int), 0, [w - 1, h - 1, w - 1, h - 1])
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            track.points = np.zeros((0, 1, 2), dtype=np.float32)
+            return
+        corners = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.max_points, 0.01, 5)
+        if corners is None or len(corners) < 4:
+            # 특징이 없는 영역은 박스 안 격자점으로 대체
+            xs, ys = np.meshgrid(np.linspace(0.2, 0.8, 4) * (x2 - x1), np.linspace(0.2, 0.8, 4) * (y2 - y1))
+            corners = np.stack([xs.ravel(), ys.ravel()], axis=1).reshape(-1, 1, 2)
+        track.points = (corners + np.array([x1, y1])).astype(np.float32)
+
+    def update(self, gray, prediction):
+        """
+        새 탐지 결과로 트랙을 갱신. 같은 클래스끼리 IoU로 연결하고, 연결되지 않은 탐지는 새 트랙,
+        max_missed번 넘게 연결되지 않은 트랙은 삭제.
+
+        Returns:
+        - 탐지 순서대로의 트랙 번호 (N,) int64.
+        """
+        self.orig_shape = tuple(prediction.orig_shape)
+        boxes = prediction.boxes.astype(np.float32)
+        previous = np.array([t.box for t in self.tracks], dtype=np.float32).reshape(-1, 4)
+        iou = box_iou_matrix(previous, boxes)
+        if len(self.tracks):
+            same_class = np.array([t.cls for t in self.tracks])[:, None] == prediction.classes[None, :]
+            iou = np.where(same_class, iou, 0.0)
+
+        assigned = {j: self.tracks[i] for i, j in greedy_match(iou, self.iou_threshold)}
+        matched = set(map(id, assigned.values()))
+        tracks = []
+        for track in self.tracks:
+            if id(track) not in matched:
+                track.missed += 1
+                if track.missed <= self.max_missed:
+                    # 이전 프레임의 특징점은 새 프레임 기준이 아니므로 현재 박스에서 다시 뽑음
+                    self._sample_points(gray, track)
+                    tracks.append(track)
+
+        ids = np.empty(len(boxes), dtype=np.int64)
+        for j in range(len(boxes)):
+            mask = prediction.masks[j] if prediction.masks is not None else None
+            track = assigned.get(j)
+            if track is None:
+                track = Track(next(self._ids), int(prediction.classes[j]), float(prediction.confs[j]), boxes[j], mask)
+            else:
+                track.cls, track.conf, track.box, track.mask = (int(prediction.classes[j]),
+                                                                float(prediction.confs[j]), boxes[j], mask)
+                track.missed = 0
+            track.quality = 1.0
+            self._sample_points(gray, track)
+            tracks.append(track)
+            ids[j] = track.id
+        self.tracks = tracks
+        self._gray = gray
+        return ids
+
+    def propagate(self, gray):
+        """
+        이전 프레임에서 현재 프레임까지 모든 트랙의 특징점을 한 번에 추적해 박스/마스크를 이동.
+
+        Returns:
+        - 트랙 품질(성공한 특징점 비율)의 최솟값. 트랙이 없으면 1.0.
+        """
+        counts = [len(t.points) for t in self.tracks]
+        if self._gray is None or not sum(counts):
+            self._gray = gray
+            return 1.0
+
+        points = np.concatenate([t.points for t in self.tracks])
+        forward, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, points, None, **LK_PARAMS)
+        backward, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, forward, None, **LK_PARAMS)
+        fb_error = np.linalg.norm((points - backward).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (fb_error < self.fb_threshold)
+        self._gray = gray
+
+        offsets = np.cumsum([0] + counts)
+        for track, start, end in zip(self.tracks, offsets[:-1], offsets[1:]):
+            if end == start:
+                track.quality = 0.0
+                continue
+            ok = good[start:end]
+            track.quality = float(ok.mean())
+            if ok.sum() < 3:
+                # 박스는 그대로 두고, 이전 프레임 좌표의 특징점 대신 현재 프레임에서 다시 뽑음
+                self._sample_points(gray, track)
+                continue
+            old, new = points[start:end][ok].reshape(-1, 2), forward[start:end][ok].reshape(-1, 2)
+            shift = np.median(new - old, axis=0)
+            # 점들 사이 거리 비율의 중앙값으로 크기 변화 추정
+            old_spread = np.linalg.norm(old - old.mean(axis=0), axis=1)
+            new_spread = np.linalg.norm(new - new.mean(axis=0), axis=1)
+            valid = old_spread > 1.0
+            scale = float(np.median(new_spread[valid] / old_spread[valid])) if valid.sum() >= 2 else 1.0
+            self._move(track, shift, scale)
+            track.points = forward[start:end][ok]
+        return min(t.quality for t in self.tracks)
+
+    def _move(self, track, shift, scale):
+        cx, cy = (track.box[0] + track.box[2]) / 2, (track.box[1] + track.box[3]) / 2
+        half_w, half_h = (track.box[2] - track.box[0]) / 2 * scale, (track.box[3] - track.box[1]) / 2 * scale
+        ncx, ncy = cx + shift[0], cy + shift[1]
+        track.box = np.array([ncx - half_w, ncy - half_h, ncx + half_w, ncy + half_h], dtype=np.float32)
+
+        if track.mask is not None:
+            # 원본 좌표 이동량을 레터박스 마스크 좌표로 변환해 같은 변환을 적용
+            oh, ow = self.orig_shape
+            mh, mw = track.mask.shape
+            gain = min(mh / oh, mw / ow)
+            pad_x, pad_y = (mw - ow * gain) / 2, (mh - oh * gain) / 2
+            mcx, mcy = cx * gain + pad_x, cy * gain + pad_y
+            matrix = np.float32([[scale, 0, (1 - scale) * mcx + shift[0] * gain],
+                                 [0, scale, (1 - scale) * mcy + shift[1] * gain]])
+            track.mask = cv2.warpAffine(track.mask.view(np.uint8), matrix, (mw, mh),
+                                        flags=cv2.INTER_NEAREST).view(bool)
+
+    def reusable_depths(self, track_ids, boxes, move_threshold=0.1, grow_threshold=0.2):
+        """
+        트랙별 마지막 측정 거리 중 다시 측정하지 않고 쓸 수 있는 값.
+        측정한 적이 없거나, 박스 중심이 측정 때보다 (박스 대각선 대비) move_threshold 이상 움직였거나
+        넓이가 grow_threshold 이상 변한 트랙은 0 (다시 측정 필요).
+
+        Args:
+        - track_ids: 트랙 번호 (N,).
+        - boxes: 이번 프레임의 xyxy 박스 (N, 4).
+
+        Returns:
+        - (N,) float32.
+        """
+        by_id = {t.id: t for t in self.tracks}
+        tracks = [by_id.get(i) for i in np.asarray(track_ids).tolist()]
+        depths = np.array([t.depth if t is not None and t.depth_box is not None else 0.0 for t in tracks],
+                          dtype=np.float32)
+        known = depths > 0
+        if not known.any():
+            return depths
+
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)[known]
+        reference = np.array([t.depth_box for t, k in zip(tracks, known) if k], dtype=np.float32)
+        sizes, ref_sizes = boxes[:, 2:] - boxes[:, :2], reference[:, 2:] - reference[:, :2]
+        shift = np.linalg.norm((boxes[:, :2] + boxes[:, 2:]) / 2 - (reference[:, :2] + reference[:, 2:]) / 2, axis=1)
+        areas, ref_areas = sizes.prod(axis=1), np.maximum(ref_sizes.prod(axis=1), 1.0)
+        stale = ((shift > move_threshold * np.maximum(np.hypot(sizes[:, 0], sizes[:, 1]), 1.0))
+                 | (np.abs(areas - ref_areas) > grow_threshold * ref_areas))
+        depths[np.flatnonzero(known)[stale]] = 0.0
+        self.depth_reused += int(known.sum() - stale.sum())
+        return depths
+
+    def record_depths(self, track_ids, boxes, depths):
+        """측정한 거리와 그때의 박스를 트랙에 기록. 0 이하(유효하지 않음)와 이미 사라진 트랙은 무시."""
+        by_id = {t.id: t for t in self.tracks}
+        for track_id, box, depth in zip(np.asarray(track_ids).tolist(), np.asarray(boxes, dtype=np.float32),
+                                        np.asarray(depths).tolist()):
+            track = by_id.get(track_id)
+            if track is not None and depth > 0:
+                track.depth, track.depth_box = float(depth), box.copy()
+        self.depth_measured += len(depths)
+
+    def prediction(self):
+        """
+        현재 트랙들을 Prediction으로 반환.
+
+        Returns:
+        - (Prediction, 트랙 번호 (N,) int64).
+        """
+        tracks = self.tracks
+        boxes = np.array([t.box for t in tracks], dtype=np.float32).reshape(-1, 4)
+        h, w = self.orig_shape
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h)
+        masks = None
+        if tracks and all(t.mask is not None for t in tracks):
+            masks = np.stack([t.mask for t in tracks])
+        prediction = Prediction(boxes, np.array([t.cls for t in tracks], dtype=np.int32),
+                                np.array([t.conf for t in tracks], dtype=np.float32), masks, self.orig_shape)
+        return prediction, np.array([t.id for t in tracks], dtype=np.int64)
+
+
+class TrackingDetector:
+    """
+    K 프레임마다(또는 추적 품질이 떨어지면) 탐지기를 실행하고, 그 사이에는 OpticalFlowTracker로 결과를 이어가는 탐지기.
+
+    Args:
+    - detect: BGR 영상을 받아 Prediction을 반환하는 함수.
+    - every: 탐지기 실행 간격 (프레임). 1이면 매 프레임 탐지.
+    - min_quality: 트랙 품질의 최솟값이 이보다 낮아지면 다음 프레임에서 바로 탐지.
+    - tracker: OpticalFlowTracker (None이면 기본값으로 생성).
+    """
+
+    def __init__(self, detect, every=5, min_quality=0.5, tracker=None):
+        self.detect = detect
+        self.every = every
+        self.min_quality = min_quality
+        self.tracker = tracker or OpticalFlowTracker()
+        self.frames = 0
+        self.detections = 0
+        self.forced = 0
+        self.age = None  # 마지막 탐지 후 지난 프레임 수
+        self._quality = 1.0
+
+    def __call__(self, bgr):
+        """
+        Returns:
+        - (Prediction, 트랙 번호 (N,) int64, 이번 프레임에 탐지기를 실행했는지 여부).
+        """
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        self.frames += 1
+        due = self.age is None or self.age + 1 >= self.every
+        if due or self._quality < self.min_quality:
+            if not due:
+                self.forced += 1
+            prediction = self.detect(bgr)
+            track_ids = self.tracker.update(gray, prediction)
+            self.detections += 1
+            self.age = 0
+            self._quality = 1.0
+            return prediction, track_ids, True
+
+        self._quality = self.tracker.propagate(gray)
+        self.age += 1
+        prediction, track_ids = self.tracker.prediction()
+        return prediction, track_ids, False
+
+    def stats(self):
+        """
+        처리 프레임 수, 탐지기 실행 수(품질 저하로 앞당긴 횟수 포함), 탐지기 실행 비율,
+        트랙의 마지막 거리를 재사용한 박스 수와 다시 측정한 박스 수.
+        """
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "forced": self.forced,
+            "detect_ratio": self.detections / self.frames if self.frames else 0.0,
+            "depth_reused": self.tracker.depth_reused,
+            "depth_measured": self.tracker.depth_measured,
+        }
+
+
+def format_tracking_stats(stats):
+    """TrackingDetector.stats() 결과를 한 줄 문자열로 변환."""
+    return (f"tracking: detector {stats['detections']}/{stats['frames']} frames "
+            f"({stats['detect_ratio'] * 100:.0f}%, {stats['forced']} forced by low track quality), "
+            f"depth reused {stats['depth_reused']} / measured {stats['depth_measured']} boxes")
+
+
+def evaluate_tracking(frames, detect, intervals, min_quality=0.5):
+    """
+    매 프레임 탐지한 결과를 기준으로, 탐지 간격 K별 처리 속도와 박스 IoU 변화를 측정.
+
+    Args:
+    - frames: BGR 영상 리스트 (모두 메모리에 올려 소스 읽기 시간을 제외).
+    - detect: BGR 영상을 받아 Prediction을 반환하는 함수.
+    - intervals: 비교할 K 목록.
+
+    Returns:
+    - K별 {"every", "detections", "ms_per_frame", "fps", "speedup", "matched", "box_iou"} 리스트.
+      matched와 box_iou는 매 프레임 탐지 결과 대비 (runtime_backend.compare_predictions).
+    """
+    from runtime_backend import compare_predictions
+
+    start = time.perf_counter()
+    reference = [detect(bgr) for bgr in frames]
+    baseline_s = (time.perf_counter() - start) / len(frames)
+
+    report = []
+    for every in intervals:
+        tracking = TrackingDetector(detect, every, min_quality)
+        start = time.perf_counter()
+        outputs = [tracking(bgr)[0] for bgr in frames]
+        per_frame_s = (time.perf_counter() - start) / len(frames)
+        agreements = [compare_predictions(ref, out) for ref, out in zip(reference, outputs)]
+        report.append({
+            "every": every,
+            "detections": tracking.detections,
+            "ms_per_frame": per_frame_s * 1000.0,
+            "fps": 1.0 / per_frame_s,
+            "speedup": baseline_s / per_frame_s,
+            "matched": float(np.mean([a["matched"] for a in agreements])),
+            "box_iou": float(np.mean([a["box_iou"] for a in agreements])),
+        })
+    return report, baseline_s * 1000.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="탐지 간격 K별 처리 속도와 박스 IoU 비교 (매 프레임 탐지 기준)")
+    parser.add_argument("--source", default="synthetic", help='"synthetic" 또는 녹화 폴더 경로')
+    parser.add_argument("--model", default="none", help='YOLO 모델 경로. "none"이면 합성 소스의 정답 박스 사용')
+    parser.add_argument("--frames", type=int, default=120, help="사용할 프레임 수")
+    parser.add_argument("--every", type=int, nargs="+", default=[1, 2, 3, 5, 8], help="비교할 탐지 간격 K")
+    parser.add_argument("--min-quality", type=float, default=0.5, help="탐지를 앞당기는 트랙 품질 기준")
+    parser.add_argument("--detect-ms", type=float, default=30.0,
+                        help='"none"일 때 탐지 한 번에 더할 모의 추론 시간 (ms). 정답 박스는 비용이 0이므로 속도 비교용')
+    return parser.parse_args()
+
+
+def main():
+    from benchmark import make_detector
+    from frame_source import open_frame_source
+    from inference_cache import prediction_from_result
+
+    args = parse_args()
+    frame_source = open_frame_source(args.source, realtime=False, loop=True)
+    detect_raw, _ = make_detector(args.model, frame_source)
+
+    # 프레임을 미리 읽어 둠. 모델 없이 실행할 때는 프레임별 정답 박스도 함께 보관
+    frames, truth = [], {}
+    for _ in range(args.frames):
+        frame = frame_source.read()
+        bgr = np.ascontiguousarray(frame.bgr)
+        frames.append(bgr)
+        if getattr(frame_source, "objects", None) is not None:
+            truth[id(bgr)] = frame_source.objects.copy()
+    frame_source.close()
+
+    def detect(bgr):
+        if args.model == "none":
+            time.sleep(args.detect_ms / 1000.0)
+            boxes = truth[id(bgr)].astype(np.float32)
+            return Prediction(boxes, np.zeros(len(boxes), dtype=np.int32), np.ones(len(boxes), dtype=np.float32),
+                              None, bgr.shape[:2])
+        _, _, results = detect_raw(bgr)
+        return prediction_from_result(results[0])
+
+    report, baseline_ms = evaluate_tracking(frames, detect, args.every, args.min_quality)
+    simulated = f" (simulated detector {args.detect_ms:.1f} ms)" if args.model == "none" else ""
+    print(f"every-frame detection: {baseline_ms:.2f} ms/frame{simulated}")
+    print(f"{'K':>4}{'detections':>12}{'ms/frame':>10}{'fps':>8}{'speedup':>9}{'matched':>9}{'box IoU':>9}")
+    for row in report:
+        print(f"{row['every']:>4}{row['detections']:>12}{row['ms_per_frame']:>10.2f}{row['fps']:>8.1f}"
+              f"{row['speedup']:>8.2f}x{row['matched']:>9.3f}{row['box_iou']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,9 @@ import numpy as np
 import pyzed.sl as sl
 from ultralytics import YOLO
 
+from detection_frame import detections_from_result, filter_detections
+from frame_buffers import FrameBuffers
+
 # YOLO 모델 불러오기
 model = YOLO('runs/segment/train2/weights/best.pt')  # 훈련된 YOLO 모델 경로
 
@@ -27,6 +30,7 @@ def main():
     # 이미지와 Depth 데이터를 저장할 객체 생성
     image = sl.Mat()
     depth_image = sl.Mat()
+    buffers = FrameBuffers()  # 색 변환 결과(모델 입력 겸 주석 캔버스)를 매 프레임 같은 버퍼에 씀
 
     print("Press 'q' to quit.")
 
@@ -35,39 +39,37 @@ def main():
         if zed.grab(runtime_params) == sl.ERROR_CODE.SUCCESS:
             # RGB 이미지 가져오기
             zed.retrieve_image(image, sl.VIEW.LEFT)
-            rgb_frame = image.get_data()
+            # LEFT 뷰는 BGRA 순서. 미리 할당한 버퍼에 BGR로 변환
+            bgr_frame = buffers.color(image.get_data())
 
             # YOLO 모델로 객체 탐지 수행
-            results = model(rgb_frame)  # YOLO 모델로 탐지 수행
-            result_frame = rgb_frame.copy()  # 결과를 표시할 프레임 복사
+            results = model(bgr_frame)  # YOLO 모델로 탐지 수행
+            result_frame = bgr_frame  # 추론이 끝난 입력 버퍼에 바로 결과를 그림 (복사 없음)
 
             # Depth 데이터 가져오기
             zed.retrieve_measure(depth_image, sl.MEASURE.DEPTH)
             depth_np = depth_image.get_data()
 
+            # 신뢰도 임계값을 넘는 탐지만 배열 단위로 남기고, 중심 좌표의 Depth 값을 한 번에 가져오기
+            detections = filter_detections(detections_from_result(results[0]), min_conf=0.35)
+            center_depths = depth_np[detections.centers[:, 1], detections.centers[:, 0]]
+
             # 탐지 결과 처리
-            for box in results[0].boxes:
-                if box.conf > 0.35:  # 신뢰도 임계값
-                    # 경계 상자 정보 가져오기
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])  # 좌표 변환
-                    label = f"{box.cls}: {box.conf:.2f}"
-
-                    # 객체의 중심 좌표 계산
-                    center_x, center_y = (x1 + x2) // 2, (y1 + y2) // 2
-
-                    # 중심 좌표의 Depth 값 가져오기
-                    depth_value = depth_np[center_y, center_x]
-
-                    # 유효한 Depth 값 확인
-                    if np.isfinite(depth_value):
-                        depth_text = f"{depth_value:.2f}m"
-                    else:
-                        depth_text = "Invalid"
-
-                    # 경계 상자와 텍스트 표시
-                    cv2.rectangle(result_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)  # 경계 상자
-                    cv2.putText(result_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                    cv2.putText(result_frame, depth_text, (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+            for (x1, y1, x2, y2), cls, conf, depth_value in zip(
+                    detections.boxes.tolist(), detections.classes.tolist(), detections.confs.tolist(),
+                    center_depths.tolist()):
+                label = f"{cls}: {conf:.2f}"
+
+                # 유효한 Depth 값 확인
+                if np.isfinite(depth_value):
+                    depth_text = f"{depth_value:.2f}m"
+                else:
+                    depth_text = "Invalid"
+
+                # 경계 상자와 텍스트 표시
+                cv2.rectangle(result_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)  # 경계 상자
+                cv2.putText(result_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+                cv2.putText(result_frame, depth_text, (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
 
             # OpenCV 창에 결과 표시
             cv2.imshow("YOLO + ZED", result_frame)
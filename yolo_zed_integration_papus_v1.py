@@ -1,17 +1,15 @@
 import cv2
-import numpy as np
 import pyzed.sl as sl
 from ultralytics import YOLO
 
+from depth_stats import box_depth_stats, build_depth_integrals
+from detection_frame import class_mask, detections_from_result, filter_detections
+from frame_buffers import FrameBuffers
+from size_estimation import PINHOLE, SizeEstimator
+
 # YOLO 모델 불러오기
 model = YOLO('runs/segment/train2/weights/best.pt')  # 훈련된 YOLO 모델 경로
 
-def calculate_real_size(pixel_width, pixel_height, depth, fx, fy):
-    """Papus 정리를 사용하여 실제 크기 계산"""
-    real_width = (pixel_width * depth) / fx  # 실제 너비 계산
-    real_height = (pixel_height * depth) / fy  # 실제 높이 계산
-    return real_width, real_height
-
 def main():
     # ZED 카메라 초기화
     zed = sl.Camera()
@@ -33,11 +31,13 @@ def main():
     # 이미지와 Depth 데이터를 저장할 객체 생성
     image = sl.Mat()
     depth_image = sl.Mat()
+    buffers = FrameBuffers()  # 색 변환 결과(모델 입력 겸 주석 캔버스)를 매 프레임 같은 버퍼에 씀
 
     # 카메라 파라미터 가져오기
     calibration_params = zed.get_camera_information().calibration_parameters
     fx = calibration_params.left_cam.fx  # 초점 거리 (가로)
     fy = calibration_params.left_cam.fy  # 초점 거리 (세로)
+    estimator = SizeEstimator(fx, fy, (PINHOLE,))  # 출력 버퍼를 한 번만 할당해 재사용
 
     print("Press 'q' to quit.")
 
@@ -46,63 +46,55 @@ def main():
         if zed.grab(runtime_params) == sl.ERROR_CODE.SUCCESS:
             # RGB 이미지 가져오기
             zed.retrieve_image(image, sl.VIEW.LEFT)
-            rgb_frame = image.get_data()
+            # LEFT 뷰는 BGRA 순서. 미리 할당한 버퍼에 BGR로 변환
+            bgr_frame = buffers.color(image.get_data())
 
             # YOLO 모델로 객체 탐지 수행
-            results = model(rgb_frame)  # YOLO 모델로 탐지 수행
-            result_frame = rgb_frame.copy()  # 결과를 표시할 프레임 복사
+            results = model(bgr_frame)  # YOLO 모델로 탐지 수행
+            result_frame = bgr_frame  # 추론이 끝난 입력 버퍼에 바로 결과를 그림 (복사 없음)
 
             # Depth 데이터 가져오기
             zed.retrieve_measure(depth_image, sl.MEASURE.DEPTH)
             depth_np = depth_image.get_data()
 
+            # 신뢰도 임계값을 넘는 탐지만 배열 단위로 남김
+            detections = filter_detections(detections_from_result(results[0]), min_conf=0.35)
+            boxes_xyxy = detections.boxes
+
+            # 프레임당 한 번 적분 영상을 만들고, 모든 박스의 평균 Depth를 한 번에 계산
+            depth_integrals = build_depth_integrals(depth_np)
+            box_means, _, box_counts = box_depth_stats(depth_integrals, boxes_xyxy)
+
+            # 박스 평균 Depth로 실제 크기도 모든 박스에 대해 한 번에 계산 (stone 클래스만 표시)
+            _, real_sizes = estimator.estimate(boxes_xyxy, center_depths=box_means)
+            real_widths, real_heights = real_sizes[:, 0].T
+            is_stone = class_mask(detections, model.names, ("stone",))
+
             # 탐지 결과 처리
-            for box in results[0].boxes:
-                if box.conf > 0.35:  # 신뢰도 임계값
-                    # 경계 상자 정보 가져오기
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])  # 좌표 변환
-                    label = f"{box.cls}: {box.conf:.2f}"
-                    object_class = box.cls  # 탐지된 객체 클래스 (예: stone, sand 등)
-
-                    # 객체의 중심 좌표 계산
-                    center_x, center_y = (x1 + x2) // 2, (y1 + y2) // 2
-
-                    # Bounding Box 내 평균 Depth 계산
-                    depth_values = []
-                    for y in range(y1, y2):
-                        for x in range(x1, x2):
-                            depth_value = depth_np[y, x]
-                            if np.isfinite(depth_value) and depth_value > 0:
-                                depth_values.append(depth_value)
-
-                    if depth_values:
-                        average_depth = sum(depth_values) / len(depth_values)
-                        depth_text = f"Depth: {average_depth:.2f}m"
-                    else:
-                        depth_text = "Depth: Invalid"
-
-                    # 특정 클래스에 따른 처리
-                    if object_class == 'stone':
-                        # Papus 정리를 사용한 실제 크기 계산
-                        pixel_width = x2 - x1
-                        pixel_height = y2 - y1
-                        if depth_values:  # 평균 Depth가 유효할 경우
-                            real_width, real_height = calculate_real_size(pixel_width, pixel_height, average_depth, fx, fy)
-                            real_size_text = f"Size: {real_width:.2f}m x {real_height:.2f}m"
-                        else:
-                            real_size_text = "Size: N/A"
-
-                        # 결과 텍스트 표시
-                        cv2.putText(result_frame, depth_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
-                        cv2.putText(result_frame, real_size_text, (x1, y1 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
-
-                    else:
-                        # stone 외 객체는 Depth 정보만 표시
-                        cv2.putText(result_frame, f"{label}", (x1, y1 - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                        cv2.putText(result_frame, depth_text, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
-
-                    # 경계 상자 그리기
-                    cv2.rectangle(result_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            for (x1, y1, x2, y2), cls, conf, average_depth, count, real_width, real_height, stone in zip(
+                    boxes_xyxy.tolist(), detections.classes.tolist(), detections.confs.tolist(), box_means.tolist(),
+                    box_counts.tolist(), real_widths.tolist(), real_heights.tolist(), is_stone.tolist()):
+                label = f"{cls}: {conf:.2f}"
+
+                # Bounding Box 내 평균 Depth (적분 영상에서 네 번의 조회로 계산됨)
+                depth_valid = count > 0
+                depth_text = f"Depth: {average_depth:.2f}m" if depth_valid else "Depth: Invalid"
+
+                # 특정 클래스에 따른 처리
+                if stone:
+                    real_size_text = f"Size: {real_width:.2f}m x {real_height:.2f}m" if depth_valid else "Size: N/A"
+
+                    # 결과 텍스트 표시
+                    cv2.putText(result_frame, depth_text, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+                    cv2.putText(result_frame, real_size_text, (x1, y1 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+
+                else:
+                    # stone 외 객체는 Depth 정보만 표시
+                    cv2.putText(result_frame, f"{label}", (x1, y1 - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+                    cv2.putText(result_frame, depth_text, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+
+                # 경계 상자 그리기
+                cv2.rectangle(result_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
 
             # OpenCV 창에 결과 표시
             cv2.imshow("YOLO + ZED", result_frame)
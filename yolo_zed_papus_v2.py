@@ -3,20 +3,18 @@ import numpy as np
 import pyzed.sl as sl
 from ultralytics import YOLO
 
-model = YOLO('runs/segment/train2/weights/best.pt')
+from detection_frame import detections_from_result, filter_detections
+from frame_buffers import FrameBuffers
+from measurement_context import zed_measurement_context
+from object_extent import ObjectExtentEstimator, format_extent_stats
+from size_estimation import POINT_CLOUD, SizeEstimator
 
-def get_3d_point(zed, x, y):
-    point_cloud = sl.Mat()
-    zed.retrieve_measure(point_cloud, sl.MEASURE.XYZRGBA)
-    point3D = point_cloud.get_value(x, y)
-    return sl.Vector3(point3D[0], point3D[1], point3D[2])
+model = YOLO('runs/segment/train2/weights/best.pt')
+STATS_EVERY = 30  # 측정 통계 출력 간격 (프레임). 종료할 때도 한 번 출력
 
-def calculate_real_size(zed, x1, y1, x2, y2):
-    point1 = get_3d_point(zed, x1, y1)
-    point2 = get_3d_point(zed, x2, y2)
-    width = abs(point2.x - point1.x)
-    height = abs(point2.y - point1.y)
-    return width, height
+def print_retrieve_stats(measurements):
+    stats = measurements.frame_stats()
+    print(f"Point cloud retrieves: {stats['retrieves']}/{stats['requests']} (saved {stats['saved']})")
 
 def main():
     zed = sl.Camera()
@@ -31,32 +29,56 @@ def main():
 
     runtime_params = sl.RuntimeParameters()
     image = sl.Mat()
+    buffers = FrameBuffers()  # 색 변환 결과(모델 입력 겸 주석 캔버스)를 매 프레임 같은 버퍼에 씀
+    measurements = zed_measurement_context(zed)  # 버퍼를 한 번만 할당해 재사용
+    calibration_params = zed.get_camera_information().camera_configuration.calibration_parameters
+    # 마스크 아래 3D 점들의 PCA 방향 박스로 길이/너비/높이를 계산 (프레임당 10ms 예산)
+    extent_estimator = ObjectExtentEstimator(calibration_params.left_cam.fx, calibration_params.left_cam.fy,
+                                             max_points=256, voxel_size=0.01, budget_ms=10.0)
+    # 마스크가 없거나 예산을 넘긴 객체는 포인트 클라우드 모서리 좌표 차이로 대체
+    estimator = SizeEstimator(1.0, 1.0, (POINT_CLOUD,))
 
     while True:
         if zed.grab(runtime_params) == sl.ERROR_CODE.SUCCESS:
+            measurements.new_frame()
             zed.retrieve_image(image, sl.VIEW.LEFT)
-            frame = image.get_data()
+            # LEFT 뷰는 BGRA 순서. 미리 할당한 버퍼에 BGR로 변환
+            frame = buffers.color(image.get_data())
 
             results = model(frame)
-            result_frame = frame.copy()
+            result_frame = frame  # 추론이 끝난 입력 버퍼에 바로 결과를 그림 (복사 없음)
 
-            for box in results[0].boxes:
-                if box.conf > 0.35:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                    label = f"{box.cls}: {box.conf:.2f}"
+            # 신뢰도 임계값을 넘는 탐지만 배열 단위로 남김
+            detections = filter_detections(detections_from_result(results[0]), min_conf=0.35)
+            _, extents = estimator.estimate(detections.boxes, measurements)
+            oriented = extent_estimator.estimate(detections.masks, detections.orig_shape, measurements,
+                                                 order=np.argsort(-detections.confs))
+            has_extent = oriented.counts > 0
 
-                    real_width, real_height = calculate_real_size(zed, x1, y1, x2, y2)
+            for (x1, y1, x2, y2), cls, conf, (real_width, real_height), (length, width, height), area, valid in zip(
+                    detections.boxes.tolist(), detections.classes.tolist(), detections.confs.tolist(),
+                    extents[:, 0].tolist(), oriented.dims.tolist(), oriented.areas.tolist(), has_extent.tolist()):
+                label = f"{cls}: {conf:.2f}"
+                if valid:
+                    size_text = f"Size: {length:.2f}m x {width:.2f}m x {height:.2f}m, Area: {area:.3f}m2"
+                else:
                     size_text = f"Size: {real_width:.2f}m x {real_height:.2f}m"
 
-                    cv2.rectangle(result_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                    cv2.putText(result_frame, label, (x1, y1 - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                    cv2.putText(result_frame, size_text, (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+                cv2.rectangle(result_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(result_frame, label, (x1, y1 - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+                cv2.putText(result_frame, size_text, (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+
+            if measurements.frame_count % STATS_EVERY == 0:
+                print_retrieve_stats(measurements)
+                print(format_extent_stats(extent_estimator.stats()))
 
             cv2.imshow("YOLO + ZED", result_frame)
 
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
+    print_retrieve_stats(measurements)
+    print(format_extent_stats(extent_estimator.stats()))
     zed.close()
     cv2.destroyAllWindows()
 
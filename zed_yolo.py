@@ -1,54 +1,22 @@
 import cv2
-import numpy as np
 import pyzed.sl as sl
 from ultralytics import YOLO
 
+from detection_frame import detections_from_result, measure_detections
+from frame_buffers import FrameBuffers
+from overlay import OverlayRenderer
 
-def get_valid_depth_in_bbox(depth_np, cx, cy, x1, x2, y1, y2, step=2, max_attempts=10):
-    """
-    유효한 Depth 값을 탐색하여 반환.
-    중심점(cx, cy)을 기준으로 주변 픽셀을 탐색하며 범위를 점차 늘림.
-    탐색 범위를 바운딩 박스 내부로 제한.
-    """
-    h, w = depth_np.shape
-    search_range = step
-
-    for attempt in range(max_attempts):
-        for dy in range(-search_range, search_range + 1):
-            for dx in range(-search_range, search_range + 1):
-                nx, ny = cx + dx, cy + dy
-                if x1 <= nx <= x2 and y1 <= ny <= y2 and 0 <= ny < h and 0 <= nx < w:
-                    depth_value = depth_np[ny, nx]
-                    if np.isfinite(depth_value):
-                        return depth_value
-        search_range += step
-
-    return 0.0
 
-
-def calculate_box_dimensions(x1, x2, y1, y2, depth, fx, fy):
-    """Bounding Box의 실제 너비와 높이를 계산."""
-    pixel_width = x2 - x1
-    pixel_height = y2 - y1
-    real_width = (pixel_width * depth) / fx
-    real_height = (pixel_height * depth) / fy
-    return real_width, real_height
-
-
-def process_detection_results(results, depth_np, fx, fy, annotated_frame, model_names):
+def process_detection_results(detections):
     """
-    YOLO 탐지 결과를 처리하고, 거리 및 크기 정보를 표시.
+    측정값을 채운 DetectionFrame에서 박스마다 표시할 거리 및 크기 텍스트를 생성.
+
+    Returns:
+    - 박스별 [(문자열, BGR 색상), ...] 리스트 (OverlayRenderer.render의 texts).
     """
-    for box in results[0].boxes:
-        x1, y1, x2, y2 = map(int, box.xyxy[0])  # 바운딩 박스 좌표
-        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2  # 중심점 계산
-        class_name = model_names[int(box.cls[0])]  # 클래스 이름
-        conf = float(box.conf[0])  # 신뢰도
-
-        # 중심 픽셀의 깊이 값 가져오기
-        depth_value = get_valid_depth_in_bbox(depth_np, cx, cy, x1, x2, y1, y2)
+    texts = []
+    for depth_value, (real_width, real_height) in zip(detections.depths.tolist(), detections.sizes.tolist()):
         if depth_value > 0:
-            real_width, real_height = calculate_box_dimensions(x1, x2, y1, y2, depth_value, fx, fy)
             width_text = f"Width: {real_width:.2f}m"
             height_text = f"Height: {real_height:.2f}m"
             depth_text = f"Depth: {depth_value:.2f}m"
@@ -57,13 +25,8 @@ def process_detection_results(results, depth_np, fx, fy, annotated_frame, model_
             height_text = f"Height: N/A"
             depth_text = "Depth: Invalid"
 
-        # 텍스트 표시
-        cv2.putText(annotated_frame, width_text, (cx - 40, cy - 20),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-        cv2.putText(annotated_frame, height_text, (cx - 40, cy),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
-        cv2.putText(annotated_frame, depth_text, (cx - 40, cy + 20),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        texts.append([(width_text, (255, 0, 0)), (height_text, (255, 0, 0)), (depth_text, (0, 255, 0))])
+    return texts
 
 
 def initialize_zed_camera():
@@ -93,28 +56,32 @@ def main():
 
     # YOLO 모델 로드
     model = YOLO("yolov8s-seg.pt")
+    renderer = OverlayRenderer(model.names, text_offset=(-40, -20), text_scale=0.6)
     print("Press 'q' to quit.")
 
     image = sl.Mat()
     depth_image = sl.Mat()
+    buffers = FrameBuffers()  # 색 변환 결과(모델 입력 겸 주석 캔버스)를 매 프레임 같은 버퍼에 씀
 
     while True:
         if zed.grab(runtime_params) == sl.ERROR_CODE.SUCCESS:
             # 이미지 가져오기
             zed.retrieve_image(image, sl.VIEW.LEFT)
-            rgba_frame = image.get_data()
-            rgb_frame = cv2.cvtColor(rgba_frame, cv2.COLOR_RGBA2RGB)
+            # LEFT 뷰는 BGRA 순서. 미리 할당한 버퍼에 BGR로 변환
+            bgr_frame = buffers.color(image.get_data())
 
             # 깊이 데이터 가져오기
             zed.retrieve_measure(depth_image, sl.MEASURE.DEPTH)
             depth_np = depth_image.get_data()
 
-            # YOLO 탐지 수행
-            results = model(rgb_frame)
-            annotated_frame = results[0].plot()  # YOLO 기본 바운딩 박스 표시
+            # YOLO 탐지 수행 후 결과를 배열 컨테이너로 한 번만 변환
+            detections = detections_from_result(model(bgr_frame)[0])
+            # 마스크 내부 중앙값 Depth (마스크가 없으면 중심점 Depth)와 크기를 모든 박스에 대해 한 번에 계산
+            detections = measure_detections(detections, depth_np, fx, fy)
 
-            # 탐지 결과 추가 처리
-            process_detection_results(results, depth_np, fx, fy, annotated_frame, model.names)
+            # 탐지 결과 추가 처리 후 박스, 마스크, 텍스트를 한 번에 그림
+            texts = process_detection_results(detections)
+            annotated_frame = renderer.render_detections(bgr_frame, detections, texts, out=bgr_frame)
 
             # 결과 표시
             cv2.imshow("YOLO + ZED", annotated_frame)
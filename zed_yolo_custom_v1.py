@@ -1,156 +1,43 @@
 import pyzed.sl as sl
 import cv2
-import numpy as np
 from ultralytics import YOLO
 
-def get_valid_depth_in_bbox(depth_np, cx, cy, x1, x2, y1, y2, step=2, max_attempts=10):
-    """
-    유효한 Depth 값을 탐색하여 반환.
-    중심점(cx, cy)을 기준으로 주변 픽셀을 탐색하며 범위를 점차 늘림.
-    탐색 범위를 바운딩 박스 내부로 제한.
-
-    Args:
-    - depth_np: Depth 데이터 배열.
-    - cx, cy: 중심점 좌표.
-    - x1, x2, y1, y2: 바운딩 박스의 좌우 및 위아래 경계.
-    - step: 탐색 범위를 늘리는 단계 (픽셀 단위).
-    - max_attempts: 최대 탐색 시도 횟수.
+from detection_frame import MEASURED_CLASSES, class_mask, detections_from_result, measure_depths, with_measurements
+from frame_buffers import FrameBuffers
+from measurement_context import zed_measurement_context
+from overlay import OverlayRenderer
+from size_estimation import PAPPUS, SizeEstimator
 
-    Returns:
-    - 유효한 Depth 값(float). 유효한 값이 없으면 0.0 반환.
-    """
-    h, w = depth_np.shape
-    search_range = step
-
-    for attempt in range(max_attempts):
-        for dy in range(-search_range, search_range + 1):
-            for dx in range(-search_range, search_range + 1):
-                nx, ny = cx + dx, cy + dy
-                if x1 <= nx <= x2 and y1 <= ny <= y2 and 0 <= ny < h and 0 <= nx < w:
-                    depth_value = depth_np[ny, nx]
-                    if np.isfinite(depth_value):
-                        return depth_value
-        search_range += step  # 탐색 범위 확장
-
-    return 0.0
-
-def calculate_box_width(x1, x2, cx, cy, y1, y2, depth_np):
+def process_detection_results(detections, context, model_names, estimator):
     """
-    바운딩 박스의 가로 길이를 파푸스 중선정리를 이용하여 계산.
+    탐지 결과를 처리하고, 박스마다 표시할 거리 및 추가 정보 텍스트를 생성.
+    모든 박스의 좌/우/상/하 Depth를 프레임 단위 인덱스에서 한 번에 조회해 파푸스 중선정리로 크기를 계산.
 
     Args:
-    - x1, x2: 바운딩 박스의 좌우 x 좌표.
-    - cx, cy: 바운딩 박스 중심점 좌표.
-    - y1, y2: 바운딩 박스의 위쪽과 아래쪽 y 좌표.
-    - depth_np: Depth 데이터 배열.
-
-    Returns:
-    - 가로 길이(float).
-    """
-    depth_left = get_valid_depth_in_bbox(depth_np, x1, cy, x1, x2, y1, y2)
-    depth_right = get_valid_depth_in_bbox(depth_np, x2, cy, x1, x2, y1, y2)
-    depth_center = get_valid_depth_in_bbox(depth_np, cx, cy, x1, x2, y1, y2)
-
-    if depth_left == 0.0 or depth_right == 0.0 or depth_center == 0.0:
-        return 0.0  # 유효하지 않은 경우 0 반환
-
-    box_width = 2 * np.sqrt((depth_left**2 + depth_right**2) / 2 - depth_center**2)
-    return box_width
-
-def calculate_box_height(y1, y2, cx, cy, x1, x2, depth_np):
-    """
-    바운딩 박스의 세로 길이를 파푸스 중선정리를 이용하여 계산.
-
-    Args:
-    - y1, y2: 바운딩 박스의 위쪽과 아래쪽 y 좌표.
-    - cx, cy: 바운딩 박스 중심점 좌표.
-    - x1, x2: 바운딩 박스의 좌우 x 좌표.
-    - depth_np: Depth 데이터 배열.
-
-    Returns:
-    - 세로 길이(float).
-    """
-    depth_top = get_valid_depth_in_bbox(depth_np, cx, y1, x1, x2, y1, y2)
-    depth_bottom = get_valid_depth_in_bbox(depth_np, cx, y2, x1, x2, y1, y2)
-    depth_center = get_valid_depth_in_bbox(depth_np, cx, cy, x1, x2, y1, y2)
-
-    if depth_top == 0.0 or depth_bottom == 0.0 or depth_center == 0.0:
-        return 0.0  # 유효하지 않은 경우 0 반환
-
-    box_height = 2 * np.sqrt((depth_top**2 + depth_bottom**2) / 2 - depth_center**2)
-    return box_height
-
-def calculate_box_area(x1, x2, y1, y2, cx, cy, depth_np):
-    """
-    바운딩 박스의 넓이를 가로와 세로 길이를 이용해 계산.
-
-    Args:
-    - x1, x2, y1, y2: 바운딩 박스의 좌표.
-    - cx, cy: 바운딩 박스 중심점 좌표.
-    - depth_np: Depth 데이터 배열.
-
-    Returns:
-    - 넓이(float).
-    """
-    box_width = calculate_box_width(x1, x2, cx, cy, y1, y2, depth_np)
-    box_height = calculate_box_height(y1, y2, cx, cy, x1, x2, depth_np)
-
-    return box_width * box_height
-
-def process_detection_results(results, depth_np, annotated_frame, model_names):
-    """
-    YOLO 탐지 결과를 처리하고, 거리 및 추가 정보를 표시.
-
-    Args:
-    - results: YOLO 탐지 결과 객체.
-    - depth_np: Depth 데이터 배열.
-    - annotated_frame: YOLO 탐지 결과를 시각화한 프레임.
+    - detections: 거리를 측정한 DetectionFrame (measure_depths 결과를 채운 것, 마스크가 있으면 마스크 내부 중앙값).
+    - context: 현재 프레임의 FrameMeasurementContext.
     - model_names: 클래스 이름 리스트.
+    - estimator: PAPPUS 방식의 SizeEstimator.
 
     Returns:
-    - 처리된 annotated_frame.
+    - 박스별 [(문자열, BGR 색상), ...] 리스트 (OverlayRenderer.render의 texts).
     """
-    for box in results[0].boxes:
-        x1, y1, x2, y2 = map(int, box.xyxy[0])  # 바운딩 박스 좌표
-        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2  # 중심점 계산
-        class_name = model_names[int(box.cls[0])]  # 클래스 이름
-
-        # Depth 값 가져오기
-        depth_value = depth_np[cy, cx]
-        if not np.isfinite(depth_value):  # 유효하지 않은 경우 주변 탐색
-            depth_value = get_valid_depth_in_bbox(depth_np, cx, cy, x1, x2, y1, y2)
-
-        # 거리값 텍스트 생성
-        depth_text = f"Distance: {depth_value:.2f}m"
-
-        # 클래스가 rocks, stone일 경우 가로, 세로, 넓이 추가
-        additional_text1 = None
-        additional_text2 = None
-        additional_text3 = None
-        if class_name in ["rocks", "stone", "cement"]:
-            box_width = calculate_box_width(x1, x2, cx, cy, y1, y2, depth_np)
-            box_height = calculate_box_height(y1, y2, cx, cy, x1, x2, depth_np)
-            box_area = calculate_box_area(x1, x2, y1, y2, cx, cy, depth_np)
-            additional_text1 = f"Width: {box_width:.2f}m"
-            additional_text2 = f"Height: {box_height:.2f}m"
-            additional_text3 = f"Area: {box_area:.2f}m^2"
-        # 바운딩 박스 중심에 텍스트 표시
-        text_position_x = cx - 70  # 바운딩 박스 중심 x 좌표
-        text_position_y = cy  # 바운딩 박스 중심 y 좌표
-
-        # 거리값 텍스트 표시
-        cv2.putText(annotated_frame, depth_text, (text_position_x, text_position_y - 30), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-
-        # 추가 정보 텍스트 표시 (한 줄씩 아래로 배치)
-        if additional_text1:
-            cv2.putText(annotated_frame, additional_text1, (text_position_x, text_position_y - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-            cv2.putText(annotated_frame, additional_text2, (text_position_x, text_position_y + 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-            cv2.putText(annotated_frame, additional_text3, (text_position_x, text_position_y + 30), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-    return annotated_frame
+    _, box_sizes = estimator.estimate(detections.boxes, context, center_depths=detections.depths)
+    detections = with_measurements(detections, detections.depths, box_sizes[:, 0])
+    measured = class_mask(detections, model_names, MEASURED_CLASSES)  # rocks, stone, cement
+
+    texts = []
+    for depth_value, (box_width, box_height), box_area, show_size in zip(
+            detections.depths.tolist(), detections.sizes.tolist(), detections.areas.tolist(), measured.tolist()):
+        # 거리값 텍스트 생성 (중심이 유효하지 않으면 인덱스가 주변 유효값을 반환)
+        lines = [f"Distance: {depth_value:.2f}m"]
+
+        # 측정 대상 클래스일 경우 가로, 세로, 넓이 추가 (넓이는 이미 계산한 가로/세로로 계산)
+        if show_size:
+            lines += [f"Width: {box_width:.2f}m", f"Height: {box_height:.2f}m", f"Area: {box_area:.2f}m^2"]
+        # 바운딩 박스 중심에 거리값과 추가 정보를 한 줄씩 아래로 배치
+        texts.append([(text, (0, 255, 255)) for text in lines])
+    return texts
 
 def initialize_zed_camera():
     zed = sl.Camera()
@@ -171,26 +58,35 @@ def main():
     if not zed:
         return
 
+    calibration_params = zed.get_camera_information().camera_configuration.calibration_parameters
+    fx, fy = calibration_params.left_cam.fx, calibration_params.left_cam.fy
+
     model = YOLO("customtrain.pt")
+    renderer = OverlayRenderer(model.names, text_offset=(-70, -30), text_scale=0.6)
+    estimator = SizeEstimator(fx, fy, (PAPPUS,))
     print("Press 'q' to quit.")
 
     image = sl.Mat()
-    depth_image = sl.Mat()
+    context = zed_measurement_context(zed)  # Depth 버퍼와 인덱스를 프레임당 한 번만 생성
+    buffers = FrameBuffers()  # 색 변환 결과(모델 입력 겸 주석 캔버스)를 매 프레임 같은 버퍼에 씀
 
     while True:
         if zed.grab(runtime_params) == sl.ERROR_CODE.SUCCESS:
             zed.retrieve_image(image, sl.VIEW.LEFT)
-            rgba_frame = image.get_data()
-
-            zed.retrieve_measure(depth_image, sl.MEASURE.DEPTH)
-            depth_np = depth_image.get_data()
+            context.new_frame()
+            depth_np = context.depth()
 
-            rgb_frame = cv2.cvtColor(rgba_frame, cv2.COLOR_RGBA2RGB)
+            # LEFT 뷰는 BGRA 순서. 미리 할당한 버퍼에 BGR로 변환
+            bgr_frame = buffers.color(image.get_data())
 
-            results = model(rgb_frame)
+            # 결과를 배열 컨테이너로 한 번만 변환하고 중심 Depth(마스크가 있으면 마스크 내부 중앙값)를 측정
+            detections = detections_from_result(model(bgr_frame)[0])
+            # 크기는 process_detection_results에서 파푸스 방식으로 계산하므로 거리만 채움
+            detections = with_measurements(
+                detections, measure_depths(detections, depth_np, grid=context.grid))
 
-            annotated_frame = results[0].plot()
-            annotated_frame = process_detection_results(results, depth_np, annotated_frame, model.names)
+            texts = process_detection_results(detections, context, model.names, estimator)
+            annotated_frame = renderer.render_detections(bgr_frame, detections, texts, out=bgr_frame)
 
             cv2.imshow("ZED 2.0i + YOLO + RGB + Depth Overlay", annotated_frame)
 
@@ -0,0 +1,207 @@
+import argparse
+import multiprocessing as mp
+import queue
+import signal
+import time
+
+from detection_frame import detections_from_prediction, measure_detections
+from detection_stream import BINARY, NDJSON, DetectionPublisher, format_publisher_stats, open_stream_sink
+from frame_source import open_frame_source
+from shm_ring import FrameRing, format_ring_stats
+
+
+def _put_until_stopped(q, item, stop, timeout=0.1):
+    """
+    큐가 비기를 기다리며 넣되, stop이 설정되면 포기 (받는 프로세스가 죽어도 막히지 않도록).
+
+    Returns:
+    - 넣었으면 True.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _ignore_sigint():
+    """Ctrl+C는 부모 프로세스만 받아 stop과 종료 순서(측정/추론 -> 캡처)를 정하도록 자식에서는 무시."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def capture_main(source_spec, realtime, slots, lock, stop, consumers_done, info_queue):
+    """
+    캡처 프로세스: 프레임 소스에서 grab한 컬러/Depth를 공유 메모리 링에 씀.
+    링은 이 프로세스가 만들고 소유하며, 링 이름과 내부 파라미터를 info_queue로 알림.
+    종료할 때는 링을 읽는 프로세스가 모두 끝났다고 부모가 consumers_done으로 알린 뒤에 링을 삭제.
+    """
+    _ignore_sigint()
+    frame_source = open_frame_source(source_spec, realtime=realtime)
+    grabbed_at = time.monotonic()
+    frame = frame_source.read()
+    if frame is None:
+        info_queue.put(None)
+        frame_source.close()
+        return
+
+    ring = FrameRing.create(lock, slots, frame.depth.shape, channels=frame.bgr.shape[2])
+    info_queue.put((ring.name, tuple(frame_source.calibration)))
+    try:
+        while frame is not None and not stop.is_set():
+            # ZED BGRA 버퍼에서 링 슬롯으로 한 번만 복사 (알파 채널은 복사하면서 제외)
+            ring.write(frame.frame_id, frame.timestamp, frame.bgr, frame.depth, grabbed_at)
+            grabbed_at = time.monotonic()
+            frame = frame_source.read()
+    finally:
+        stop.set()
+        frame_source.close()
+        consumers_done.wait(timeout=60.0)  # 부모가 없어졌을 때를 대비한 상한
+        ring.close()
+
+
+def inference_main(ring_name, lock, stop, model_path, detection_queue):
+    """
+    추론 프로세스: 링의 최신 프레임을 zero-copy 뷰로 읽어 추론하고, 결과를 측정 프로세스로 넘김.
+    슬롯은 잡은 채로 넘기며 측정 프로세스가 놓아줌.
+    """
+    from inference_cache import prediction_from_result
+    from runtime_backend import load_model
+
+    _ignore_sigint()
+    ring = FrameRing.attach(ring_name, lock)
+    model = load_model(model_path)
+    _put_until_stopped(detection_queue, ("names", model.names), stop)
+
+    last_seq = -1
+    try:
+        while not stop.is_set():
+            frame = ring.wait(last_seq, timeout=0.1)
+            if frame is None:
+                continue
+            last_seq = frame.seq
+            results = model(frame.color, verbose=False)
+            if not _put_until_stopped(detection_queue, (frame.seq, prediction_from_result(results[0])), stop):
+                ring.release(frame.seq)  # 측정 프로세스로 넘기지 못한 슬롯은 직접 놓아줌
+            del frame
+    finally:
+        ring.close()
+
+
+def measure_prediction(prediction, depth_np, fx, fy):
+    """
+    추론 결과(Prediction)와 같은 프레임의 Depth로 박스별 거리와 실제 크기를 계산.
+
+    Returns:
+    - (boxes (N, 4) int32, depth_values (N,), sizes (N, 2) 가로/세로 m).
+    """
+    detections = measure_detections(detections_from_prediction(prediction), depth_np, fx, fy)
+    return detections.boxes, detections.depths, detections.sizes
+
+
+def measurement_main(ring_name, lock, stop, detection_queue, fx, fy, publish, fmt, stats_every):
+    """
+    측정 프로세스: 추론 결과와 같은 seq의 Depth를 링에서 읽어 거리/크기를 계산하고 스트림으로 출력.
+    """
+    _ignore_sigint()
+    ring = FrameRing.attach(ring_name, lock)
+    _, names = detection_queue.get()
+    publisher = DetectionPublisher(open_stream_sink(publish), names, fmt)
+
+    try:
+        while not stop.is_set():
+            try:
+                seq, prediction = detection_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            frame = ring.get(seq)
+            if frame is None:  # 이미 덮어쓰인 슬롯 (stale로 집계됨)
+                continue
+
+            boxes, depth_values, sizes = measure_prediction(prediction, frame.depth, fx, fy)
+
+            # grab 시각(monotonic)을 이 프로세스의 perf_counter 기준으로 변환
+            grab_time = time.perf_counter() - (time.monotonic() - frame.grabbed_at)
+            publisher.publish(frame.frame_id, frame.timestamp, grab_time, boxes, prediction.classes,
+                              prediction.confs, depth_values, sizes)
+            del frame
+            ring.release(seq)
+
+            if stats_every and publisher.published % stats_every == 0:
+                print(format_publisher_stats(publisher.stats()), flush=True)
+    finally:
+        publisher.close()
+        ring.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="캡처 / 추론 / 측정을 별도 프로세스로 실행 (공유 메모리 링)")
+    parser.add_argument("--model", default="customtrain.pt", help="YOLO 모델 경로")
+    parser.add_argument("--source", default="zed", help='"zed", "synthetic" 또는 녹화 폴더 경로')
+    parser.add_argument("--fast", action="store_true", help="녹화를 원래 속도 대신 최대 속도로 재생")
+    parser.add_argument("--slots", type=int, default=4, help="공유 메모리 링 슬롯 수")
+    parser.add_argument("--publish", default="detections.ndjson",
+                        help='출력: "udp://host:port", "unix:///path", 파일 경로 또는 "-"')
+    parser.add_argument("--format", choices=[NDJSON, BINARY], default=NDJSON, help="출력 형식")
+    parser.add_argument("--stats-every", type=int, default=30, help="측정 통계 출력 간격 (프레임)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    ctx = mp.get_context("spawn")
+    lock, stop = ctx.Lock(), ctx.Event()
+    consumers_done = ctx.Event()  # 추론/측정 프로세스가 모두 끝나 캡처가 링을 삭제해도 됨
+    info_queue = ctx.Queue()
+    # 추론은 측정보다 한 프레임까지만 앞서 나감 (잡힌 슬롯: 추론 1 + 대기 1 + 측정 1)
+    detection_queue = ctx.Queue(maxsize=1)
+
+    capture = ctx.Process(target=capture_main, name="capture",
+                          args=(args.source, not args.fast, args.slots, lock, stop, consumers_done, info_queue))
+    capture.start()
+    info = info_queue.get(timeout=60)
+    if info is None:
+        print("Frame source produced no frames.")
+        capture.join()
+        return
+    ring_name, (fx, fy, _, _) = info
+
+    workers = [
+        ctx.Process(target=inference_main, name="inference",
+                    args=(ring_name, lock, stop, args.model, detection_queue)),
+        ctx.Process(target=measurement_main, name="measurement",
+                    args=(ring_name, lock, stop, detection_queue, fx, fy, args.publish, args.format,
+                          args.stats_every)),
+    ]
+    for worker in workers:
+        worker.start()
+
+    ring = FrameRing.attach(ring_name, lock)
+    print(f"Capture, inference and measurement running in separate processes "
+          f"(ring {ring.slots} slots, {FrameRing.nbytes(ring.slots, ring.shape, ring.channels) / 2**20:.0f} MiB). "
+          f"Press Ctrl+C to quit.")
+    try:
+        while not stop.is_set() and all(p.is_alive() for p in [capture] + workers):
+            time.sleep(1.0)
+            print(format_ring_stats(ring.stats()), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        print(format_ring_stats(ring.stats()))
+        ring.close()
+        # 링을 읽는 프로세스를 먼저 끝낸 뒤에 캡처 프로세스가 링을 삭제하도록 알림
+        for process in workers:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        consumers_done.set()
+        capture.join(timeout=5.0)
+        if capture.is_alive():
+            capture.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import argparse
+import sys
+
+import cv2
+import numpy as np
+
+from detection_frame import (class_mask, detections_from_prediction, measure_depths, measure_detections,
+                             pinhole_sizes, select, with_measurements)
+from detection_stream import BINARY, NDJSON, DetectionPublisher, format_publisher_stats, open_stream_sink
+from frame_buffers import FrameBufferPool
+from frame_source import open_frame_source
+from inference_cache import prediction_from_result
+from motion_gate import MotionGate, format_gate_stats
+from overlay import OverlayRenderer
+from pipeline import BLOCK, DROP_OLDEST, Pipeline, format_stats, max_in_flight
+from runtime_backend import load_model
+from track_measurement import TrackMeasurements, format_measurement_stats
+from tracker import TrackingDetector, format_tracking_stats
+
+# 가로/세로를 함께 표시하는 클래스
+SIZE_CLASSES = ("rocks", "stone")
+
+
+def make_source_stage(frame_source, pool):
+    """
+    FrameSource에서 프레임을 읽는 파이프라인 소스 생성.
+    ZED sl.Mat 버퍼와 녹화 메모리 맵은 다음 read()에서 바뀌므로 다음 단계로 넘기기 전에 복사.
+    복사는 pool(FrameBufferPool)에서 빌린 슬롯에 하며, BGRA 뷰는 cv2.cvtColor 한 번으로 연속 버퍼에 변환.
+    bgr 버퍼는 모델 입력과 주석 캔버스로 함께 사용. 슬롯은 make_release_packet으로 돌려줌.
+    """
+    def source():
+        frame = frame_source.read()
+        if frame is None:
+            return None
+        buffers = pool.acquire()
+        return {
+            "source_frame_id": frame.frame_id,
+            "source_timestamp": frame.timestamp,
+            "buffers": buffers,
+            "bgr": buffers.color(frame.bgr),
+            "depth": buffers.depth(frame.depth),
+        }
+
+    return source
+
+
+def make_release_packet(pool):
+    """패킷이 파이프라인을 떠날 때(버려짐 또는 처리 끝) 소스가 빌린 슬롯을 pool에 돌려주는 함수."""
+    def release(packet):
+        pool.release(packet.data.pop("buffers", None))
+    return release
+
+
+def make_inference_stage(detect, gate=None, tracking=None):
+    """
+    추론 단계 생성. detect는 BGR 영상을 받아 Prediction을 반환하는 함수.
+
+    - gate(MotionGate)가 있으면 장면이 변하지 않은 프레임은 추론을 건너뛰고 이전 탐지 결과를 재사용.
+    - tracking(TrackingDetector)이 있으면 K 프레임마다 탐지하고 그 사이에는 광류 추적 결과를 사용 (gate보다 우선).
+    두 경우 모두 Depth 측정은 새 프레임으로 다시 수행.
+    """
+    previous = None
+
+    def inference(packet):
+        nonlocal previous
+        bgr = packet.data["bgr"]
+        if tracking is not None:
+            packet.data["prediction"], packet.data["track_ids"], _ = tracking(bgr)
+            packet.data["detection_age"] = tracking.age
+            return packet
+        if gate is None or gate.should_infer(bgr) or previous is None:
+            previous = detect(bgr)
+        packet.data["prediction"] = previous
+        packet.data["detection_age"] = gate.age if gate is not None else 0
+        return packet
+    return inference
+
+
+def make_measurement_stage(fx, fy, measurements=None, grid=None, tracker=None):
+    """
+    측정 단계 생성. 추론 결과를 DetectionFrame으로 한 번 변환한 뒤 모든 박스를 한 번에 측정.
+    measurements(TrackMeasurements)가 있고 패킷에 트랙 번호가 있으면
+    움직이거나 커진 박스만 다시 측정하고 트랙별로 누적한 거리/크기를 사용.
+    그렇지 않고 tracker(OpticalFlowTracker)가 있으면 트랙에 기록된 마지막 거리를 재사용하고
+    움직이거나 커진 박스만 다시 측정해 트랙에 기록.
+    grid(DepthGrid)가 있으면 축소된 해상도의 Depth를 영상 좌표로 조회.
+    다시 측정하는 박스는 박스 내부 창 탐색으로만 조회하므로, 몇 개만 움직인 프레임에서
+    프레임 전체 Depth 인덱스(약 20ms)를 만들지 않음.
+    """
+    def measurement(packet):
+        depth_np = packet.data["depth"]
+        detections = detections_from_prediction(packet.data["prediction"])
+        track_ids = packet.data.get("track_ids")
+
+        def sample_depths(index):
+            # 선택한 박스만 측정 (인덱스는 없으므로 중심 픽셀 + 창 탐색)
+            return measure_depths(select(detections, index), depth_np, grid=grid)
+
+        if track_ids is None or (measurements is None and tracker is None):
+            detections = measure_detections(detections, depth_np, fx, fy, grid=grid)
+        elif measurements is None:
+            depth_values = tracker.reusable_depths(track_ids, detections.boxes)
+            stale = np.flatnonzero(depth_values <= 0)
+            if len(stale):
+                depth_values[stale] = sample_depths(stale)
+                tracker.record_depths(track_ids[stale], detections.boxes[stale], depth_values[stale])
+            detections = with_measurements(detections, depth_values,
+                                           pinhole_sizes(detections.boxes, depth_values, fx, fy))
+        else:
+            depth_values, sizes = measurements.update(track_ids, detections.boxes, sample_depths, fx, fy)
+            detections = with_measurements(detections, depth_values, sizes)
+        packet.data["detections"] = detections
+        return packet
+    return measurement
+
+
+def make_annotation_stage(model_names):
+    renderer = OverlayRenderer(model_names)
+
+    def annotation(packet):
+        detections = packet.data["detections"]
+        track_ids = packet.data.get("track_ids")
+        measured = class_mask(detections, model_names, SIZE_CLASSES)
+        texts = []
+        for i, (depth_value, (real_width, real_height), show_size) in enumerate(zip(
+                detections.depths.tolist(), detections.sizes.tolist(), measured.tolist())):
+            lines = [(f"ID: {track_ids[i]}", (255, 255, 0))] if track_ids is not None else []
+            if depth_value <= 0:
+                texts.append(lines + [("Depth: Invalid", (255, 0, 0))])
+                continue
+            lines.append((f"Depth: {depth_value:.2f}m", (255, 0, 0)))
+            if show_size:
+                lines += [(f"Width: {real_width:.2f}m", (0, 255, 0)), (f"Height: {real_height:.2f}m", (0, 0, 255))]
+            texts.append(lines)
+
+        # 패킷이 소유한 bgr 복사본 위에 바로 그림 (추가 버퍼 없음)
+        packet.data["annotated"] = renderer.render_detections(packet.data["bgr"], detections, texts,
+                                                             out=packet.data["bgr"])
+        return packet
+    return annotation
+
+
+def make_publish_stage(publisher):
+    """헤드리스 모드: 주석 표시 대신 프레임별 탐지/측정 결과를 스트림으로 출력."""
+    def publish(packet):
+        data = packet.data
+        detections = data["detections"]
+        publisher.publish(data["source_frame_id"], data["source_timestamp"], packet.timestamp, detections.boxes,
+                          detections.classes, detections.confs, detections.depths, detections.sizes)
+        # 다음 단계가 없으므로 영상 버퍼와 마스크는 바로 놓아줌
+        for key in ("bgr", "depth", "prediction", "detections"):
+            data.pop(key, None)
+        return packet
+    return publish
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ZED + YOLO 파이프라인 실행")
+    parser.add_argument("--model", default="customtrain.pt", help="YOLO 모델 경로")
+    parser.add_argument("--backend", choices=["auto", "torch", "onnx", "openvino"], default="auto",
+                        help="추론 백엔드 (auto: runtime_backend.py 벤치마크로 선택된 백엔드)")
+    parser.add_argument("--source", default="zed", help='"zed", "synthetic" 또는 녹화 폴더 경로')
+    parser.add_argument("--fast", action="store_true", help="녹화를 원래 속도 대신 최대 속도로 재생")
+    parser.add_argument("--depth-scale", type=float, default=1.0,
+                        help="Depth 해상도 배율 (예: 0.5이면 가로/세로 절반 해상도로 가져와 조회)")
+    parser.add_argument("--queue-size", type=int, default=2, help="단계 사이 큐 길이")
+    parser.add_argument("--policy", choices=[DROP_OLDEST, BLOCK], default=DROP_OLDEST,
+                        help="큐가 가득 찼을 때의 정책")
+    parser.add_argument("--stats-every", type=int, default=30, help="통계 출력 간격 (프레임)")
+    parser.add_argument("--headless", action="store_true", help="화면 표시와 주석 없이 탐지 결과만 출력")
+    parser.add_argument("--publish", default="detections.ndjson",
+                        help='헤드리스 출력: "udp://host:port", "unix:///path", 파일 경로 또는 "-"')
+    parser.add_argument("--format", choices=[NDJSON, BINARY], default=NDJSON, help="헤드리스 출력 형식")
+    parser.add_argument("--motion-gate", action="store_true", help="장면이 변하지 않으면 추론을 건너뛰고 이전 결과 재사용")
+    parser.add_argument("--motion-threshold", type=float, default=0.02,
+                        help="추론을 다시 실행할 변한 블록 비율 (0 ~ 1)")
+    parser.add_argument("--max-stale", type=int, default=15, help="이전 탐지 결과를 재사용할 최대 프레임 수")
+    parser.add_argument("--track-every", type=int, default=1,
+                        help="K 프레임마다 탐지하고 그 사이에는 광류로 추적 (1이면 매 프레임 탐지)")
+    parser.add_argument("--min-quality", type=float, default=0.5,
+                        help="추적 품질(성공한 특징점 비율)이 이보다 낮으면 다음 프레임에서 바로 탐지")
+    parser.add_argument("--smooth-measurements", action="store_true",
+                        help="트랙별로 거리/크기를 누적하고 박스가 움직이거나 커졌을 때만 다시 측정")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    frame_source = open_frame_source(args.source, realtime=not args.fast, depth_scale=args.depth_scale)
+    fx, fy = frame_source.calibration.fx, frame_source.calibration.fy
+
+    model = load_model(args.model, args.backend)
+    gate = MotionGate(changed_fraction=args.motion_threshold, max_stale=args.max_stale) if args.motion_gate else None
+
+    def detect(bgr):
+        return prediction_from_result(model(bgr, verbose=False)[0])
+
+    # 트랙별 측정에는 트랙 번호가 필요하므로 매 프레임 탐지할 때도 추적기로 번호를 붙임
+    tracking = None
+    if args.track_every > 1 or args.smooth_measurements:
+        tracking = TrackingDetector(detect, args.track_every, args.min_quality)
+    measurements = TrackMeasurements() if args.smooth_measurements else None
+    inference = make_inference_stage(detect, gate, tracking)
+    measurement = make_measurement_stage(fx, fy, measurements, frame_source.grid,
+                                         tracking.tracker if tracking is not None else None)
+    if args.headless:
+        run_headless(args, frame_source, model, inference, measurement, gate, tracking, measurements)
+        return
+    print("Press 'q' to quit.")
+
+    pool = FrameBufferPool(max_in_flight(3, args.queue_size))
+    pipeline = Pipeline(
+        make_source_stage(frame_source, pool),
+        [
+            ("inference", inference),
+            ("measurement", measurement),
+            ("annotation", make_annotation_stage(model.names)),
+        ],
+        queue_size=args.queue_size,
+        policy=args.policy,
+        release=make_release_packet(pool),
+    ).start()
+
+    # 표시 단계는 메인 스레드에서 실행
+    try:
+        for packet in pipeline.results():
+            cv2.imshow("ZED + YOLO (pipeline)", packet.data["annotated"])
+            if args.stats_every and packet.frame_id % args.stats_every == 0:
+                print(format_stats(pipeline.stats()))
+                print_detection_stats(gate, tracking, measurements)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        pipeline.stop()
+        frame_source.close()
+        cv2.destroyAllWindows()
+
+
+def print_detection_stats(gate, tracking, measurements, file=None):
+    """추론 생략(motion gate), 추적, 트랙별 측정 통계 출력. file이 None이면 표준 출력."""
+    if gate is not None:
+        print(format_gate_stats(gate.stats()), file=file)
+    if tracking is not None:
+        print(format_tracking_stats(tracking.stats()), file=file)
+    if measurements is not None:
+        print(format_measurement_stats(measurements.stats()), file=file)
+
+
+def run_headless(args, frame_source, model, inference, measurement, gate=None, tracking=None, measurements=None):
+    """
+    주석 표시와 cv2.imshow 없이 탐지 결과를 스트림으로 출력. Ctrl+C로 종료.
+    --publish -이면 표준 출력이 탐지 스트림이므로 안내와 통계는 모두 표준 에러로 출력.
+    """
+    publisher = DetectionPublisher(open_stream_sink(args.publish), model.names, args.format)
+    log = sys.stderr
+    print(f"Headless: publishing {args.format} to {args.publish}. Press Ctrl+C to quit.", file=log)
+
+    pool = FrameBufferPool(max_in_flight(3, args.queue_size))
+    pipeline = Pipeline(
+        make_source_stage(frame_source, pool),
+        [
+            ("inference", inference),
+            ("measurement", measurement),
+            ("publish", make_publish_stage(publisher)),
+        ],
+        queue_size=args.queue_size,
+        policy=args.policy,
+        release=make_release_packet(pool),
+    ).start()
+
+    try:
+        for packet in pipeline.results():
+            if args.stats_every and packet.frame_id % args.stats_every == 0:
+                print(f"{format_stats(pipeline.stats())} | {format_publisher_stats(publisher.stats())}", file=log)
+                print_detection_stats(gate, tracking, measurements, file=log)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        frame_source.close()
+        publisher.close()
+        print(format_publisher_stats(publisher.stats()), file=log)
+        print_detection_stats(gate, tracking, measurements, file=log)
+
+
+if __name__ == "__main__":
+    main()